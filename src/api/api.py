@@ -1,14 +1,18 @@
+import hashlib
 import logging
 import os
-import threading
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from urllib.parse import urlsplit
 
-import requests
-from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 
-from scraper.web_scraper import WebScraper
+from api import worker
+from api.scheduler import DuplicateJob, JobScheduler, SchedulerFull
+from scraper.checkpoint import CheckpointStore
+from scraper.metrics import render_prometheus
 
 
 class InputParams(BaseModel):
@@ -19,68 +23,75 @@ class InputParams(BaseModel):
     model: str = Field(..., alias="model")
     max_time_per_file: int = Field(..., alias="maxTimePerFile")
     max_total_time: int = Field(..., alias="maxTotalTime")
+    audio_profile: Literal["mp3", "native", "model"] = Field(
+        "mp3", alias="audioProfile"
+    )
+    sample_rate: int = Field(16000, alias="sampleRate", gt=0)
 
 
 class ScrapingParams(BaseModel):
     analysis_id: str = Field(..., alias="analysisId")
     input_params: InputParams = Field(..., alias="inputParams")
+    # Records a Chrome trace-event timeline of the analysis.
+    trace: bool = Field(False, alias="trace")
 
 
-app = FastAPI()
-
-scraping_results: Dict[str, Dict[str, Any]] = {}
+scheduler: Optional[JobScheduler] = None
 
-executor = ThreadPoolExecutor(max_workers=1)
-executor_lock = threading.Lock()
 
-
-def perform_scraping(analysis_id: str, params: InputParams, bearer_token: str):
-    scraper = WebScraper(
-        starting_point=params.starting_point,
-        max_depth=params.max_depth,
-        max_files=params.max_files,
-        max_pages=params.max_pages,
-        model=params.model,
-        max_time_per_file=params.max_time_per_file,
-        max_total_time=params.max_total_time,
-        download_dir="./downloads",
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global scheduler
+    scheduler = JobScheduler.from_env(
+        worker.run_job,
+        initializer=worker.initialize,
+        shutdown=worker.shutdown,
+        metrics=worker.metrics_snapshot,
+        on_timeout=worker.discard_checkpoint,
     )
+    scheduler.start()
+    resume_checkpoints()
+    yield
+    scheduler.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def resume_checkpoints():
+    # Analyses interrupted by a restart continue from their last checkpoint.
+    checkpoints = CheckpointStore.from_env()
+    if checkpoints is None or os.getenv("CHECKPOINT_RESUME", "true").lower() != "true":
+        return
+    for job in checkpoints.unfinished():
+        params = job["inputParams"]
+        try:
+            scheduler.submit(
+                job["analysisId"],
+                tenant=tenant_id(job["bearerToken"], job.get("tenant")),
+                host=urlsplit(params["starting_point"]).netloc,
+                payload=job,
+                time_limit=params["max_total_time"],
+            )
+        except (DuplicateJob, SchedulerFull) as e:
+            logging.warning(f"Could not resume analysis {job['analysisId']}: {e}")
+            continue
+        logging.info(f"Resuming analysis {job['analysisId']} from its checkpoint")
 
-    headers = {"Authorization": f"Bearer {bearer_token}"}
-
-    files_scraped = scraper.scrape(headers, analysis_id)
-
-    try:
-        body = {"analysisId": analysis_id, "files": files_scraped}
-        logging.info(body)
-        connector_address = os.getenv("CONNECTOR_ADDRESS")
-        connector_port = os.getenv("CONNECTOR_PORT")
-
-        response = requests.post(
-            f"http://{connector_address}:{connector_port}/scraper/report",
-            json=body,
-            headers=headers,
-            timeout=100,
-        )
 
-        if response.status_code == 200:
-            logging.info("Successfully sent report data")
-        else:
-            logging.error(
-                f"Error response: {response.status_code}, Body: {response.text}"
-            )
-    except requests.RequestException as exc:
-        logging.error(f"Request failed: {exc}")
-    finally:
-        with executor_lock:
-            scraping_results[analysis_id]["status"] = "completed"
+def tenant_id(token: str, tenant: Optional[str]) -> str:
+    if tenant:
+        return tenant
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
 
 
 @app.post("/scraping/start")
 async def start_scraping(
-    scraping_params: ScrapingParams, authorization: Optional[str] = Header(None)
+    scraping_params: ScrapingParams,
+    authorization: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None),
 ):
-    if scraping_params.analysis_id in scraping_results:
+    if scheduler.status(scraping_params.analysis_id) is not None:
         raise HTTPException(status_code=400, detail="Analysis ID already in use")
 
     if authorization is None:
@@ -93,16 +104,70 @@ async def start_scraping(
             status_code=401, detail="Invalid Authorization header format"
         )
 
-    scraping_results[scraping_params.analysis_id] = {"status": "in_progress"}
-
-    executor.submit(
-        perform_scraping,
-        scraping_params.analysis_id,
-        scraping_params.input_params,
-        bearer_token,
-    )
+    params = scraping_params.input_params
+    try:
+        job = scheduler.submit(
+            scraping_params.analysis_id,
+            tenant=tenant_id(bearer_token, x_tenant_id),
+            host=urlsplit(params.starting_point).netloc,
+            payload={
+                "analysisId": scraping_params.analysis_id,
+                "inputParams": params.model_dump(),
+                "bearerToken": bearer_token,
+                "trace": scraping_params.trace,
+                "tenant": x_tenant_id,
+            },
+            time_limit=params.max_total_time,
+        )
+    except DuplicateJob:
+        raise HTTPException(status_code=400, detail="Analysis ID already in use")
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
     return {
         "analysisId": scraping_params.analysis_id,
         "message": "Scraping task submitted",
+        "queuePosition": job.get("queuePosition", 0),
+        "etaSeconds": job.get("etaSeconds", 0.0),
     }
+
+
+@app.get("/scraping/{analysis_id}")
+async def get_scraping_status(analysis_id: str):
+    status = scheduler.status(analysis_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return status
+
+
+@app.get("/scraping/{analysis_id}/trace")
+async def get_scraping_trace(analysis_id: str):
+    status = scheduler.status(analysis_id)
+    trace = ((status or {}).get("result") or {}).get("trace")
+    if trace is None or not os.path.exists(trace):
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return FileResponse(
+        trace, media_type="application/json", filename=f"{analysis_id}.trace.json"
+    )
+
+
+@app.get("/scraping")
+async def get_scheduler_stats():
+    return scheduler.stats()
+
+
+@app.get("/browser-pool/stats")
+async def get_browser_pool_stats():
+    return {
+        "enabled": int(os.getenv("BROWSER_POOL_SIZE", "1")) > 0,
+        "workers": scheduler.worker_reports(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Worker metrics are as fresh as their last snapshot, see METRICS_INTERVAL.
+    return PlainTextResponse(
+        render_prometheus(scheduler.metrics_snapshot()),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -0,0 +1,509 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+from scraper.metrics import merge_snapshots
+
+
+class SchedulerFull(Exception):
+    pass
+
+
+class DuplicateJob(Exception):
+    pass
+
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def default_concurrency(cpus_per_job=1.0, memory_per_job_mb=1024):
+    by_cpu = int((os.cpu_count() or 1) // cpus_per_job)
+    memory = available_memory_mb()
+    by_memory = memory // memory_per_job_mb if memory is not None else by_cpu
+    return max(1, min(by_cpu, by_memory))
+
+
+class Job:
+    def __init__(self, analysis_id, tenant, host, payload, time_limit):
+        self.analysis_id = analysis_id
+        self.tenant = tenant
+        self.host = host
+        self.payload = payload
+        self.time_limit = time_limit
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+
+class FairQueue:
+    # Round-robin over tenants; within a tenant jobs keep their FIFO order.
+    def __init__(self):
+        self._tenants = OrderedDict()
+
+    def push(self, job):
+        self._tenants.setdefault(job.tenant, deque()).append(job)
+
+    def pop_eligible(self, can_run):
+        for tenant, jobs in self._tenants.items():
+            for job in jobs:
+                if can_run(job):
+                    jobs.remove(job)
+                    if jobs:
+                        self._tenants.move_to_end(tenant)
+                    else:
+                        del self._tenants[tenant]
+                    return job
+        return None
+
+    def count(self, tenant=None):
+        if tenant is not None:
+            return len(self._tenants.get(tenant, ()))
+        return sum(len(jobs) for jobs in self._tenants.values())
+
+    def order(self):
+        # Expected dispatch order when no per-host limit gets in the way.
+        queues = [list(jobs) for jobs in self._tenants.values()]
+        ordered = []
+        for index in range(max((len(jobs) for jobs in queues), default=0)):
+            ordered.extend(jobs[index] for jobs in queues if index < len(jobs))
+        return ordered
+
+    def __len__(self):
+        return self.count()
+
+
+def _send_metrics(send, metrics, running, interval):
+    # Sends metrics snapshots while a job runs. The dispatcher only reads
+    # from busy workers, so idle workers must not fill their pipe.
+    while True:
+        running.wait()
+        time.sleep(interval)
+        if not running.is_set():
+            continue
+        try:
+            send(("metrics", metrics()))
+        except (OSError, ValueError):
+            return
+
+
+def _worker_main(connection, target, initializer, shutdown, metrics, interval):
+    # The worker leads its own process group, so killing it also kills the
+    # pooled browsers, chromedrivers and download processes it started.
+    os.setsid()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            connection.send(message)
+
+    running = threading.Event()
+    if metrics is not None:
+        threading.Thread(
+            target=_send_metrics,
+            args=(send, metrics, running, interval),
+            name="worker-metrics",
+            daemon=True,
+        ).start()
+
+    if initializer is not None:
+        initializer()
+    try:
+        while True:
+            try:
+                job = connection.recv()
+            except EOFError:
+                return
+            if job is None:
+                return
+            running.set()
+            try:
+                result = ("completed", target(job))
+            except Exception as e:
+                logging.error(f"Job {job.get('analysisId')} failed: {e}")
+                result = ("failed", f"{type(e).__name__}: {e}")
+            finally:
+                running.clear()
+            if metrics is not None:
+                send(("metrics", metrics()))
+            send(result)
+    finally:
+        if shutdown is not None:
+            shutdown()
+
+
+class _Worker:
+    def __init__(self, context, target, initializer, shutdown, metrics, interval):
+        self.connection, child_connection = context.Pipe()
+        # Not a daemon: jobs start their own download worker processes.
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, target, initializer, shutdown, metrics, interval),
+            name="scraper-job-worker",
+        )
+        self.process.start()
+        child_connection.close()
+        self.job = None
+        self.deadline = None
+        self.report = None
+        self.metrics = None
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Killed before it started its own group.
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(30)
+        if self.process.is_alive():
+            self.kill()
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        target,
+        initializer=None,
+        shutdown=None,
+        max_concurrency=1,
+        max_queued=100,
+        max_queued_per_tenant=20,
+        tenant_concurrency=1,
+        host_concurrency=1,
+        min_free_memory_mb=0,
+        timeout_grace=300,
+        record_ttl=3600,
+        start_method="spawn",
+        metrics=None,
+        metrics_interval=5.0,
+        on_timeout=None,
+    ):
+        # target(payload) runs one job inside an isolated worker process and
+        # returns a picklable result. metrics() returns the worker's metrics
+        # snapshot, sent every metrics_interval seconds while a job runs.
+        # on_timeout(payload) cleans up after a job killed on its time limit.
+        self.target = target
+        self.initializer = initializer
+        self.shutdown = shutdown
+        self.metrics = metrics
+        self.metrics_interval = metrics_interval
+        self.on_timeout = on_timeout
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.tenant_concurrency = tenant_concurrency
+        self.host_concurrency = host_concurrency
+        self.min_free_memory_mb = min_free_memory_mb
+        self.timeout_grace = timeout_grace
+        self.record_ttl = record_ttl
+
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.RLock()
+        self._queue = FairQueue()
+        self._jobs = {}
+        self._workers = []
+        self._average_duration = None
+        # Counters and histograms of replaced workers, so totals never drop.
+        self._retired_metrics = None
+        self._closed = False
+        self._dispatcher = threading.Thread(
+            target=self._run, name="job-scheduler", daemon=True
+        )
+        self.worker_restarts = 0
+
+    @classmethod
+    def from_env(
+        cls, target, initializer=None, shutdown=None, metrics=None, on_timeout=None
+    ):
+        max_concurrency = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "0"))
+        if max_concurrency <= 0:
+            max_concurrency = default_concurrency(
+                cpus_per_job=float(os.getenv("SCHEDULER_CPUS_PER_JOB", "1")),
+                memory_per_job_mb=int(os.getenv("SCHEDULER_MEMORY_PER_JOB_MB", "1536")),
+            )
+        return cls(
+            target,
+            initializer=initializer,
+            shutdown=shutdown,
+            max_concurrency=max_concurrency,
+            max_queued=int(os.getenv("SCHEDULER_MAX_QUEUED", "100")),
+            max_queued_per_tenant=int(
+                os.getenv("SCHEDULER_MAX_QUEUED_PER_TENANT", "20")
+            ),
+            tenant_concurrency=int(os.getenv("SCHEDULER_TENANT_CONCURRENCY", "1")),
+            host_concurrency=int(os.getenv("SCHEDULER_HOST_CONCURRENCY", "1")),
+            min_free_memory_mb=int(os.getenv("SCHEDULER_MIN_FREE_MEMORY_MB", "512")),
+            timeout_grace=int(os.getenv("SCHEDULER_TIMEOUT_GRACE", "300")),
+            record_ttl=int(os.getenv("SCHEDULER_RECORD_TTL", "3600")),
+            metrics=metrics,
+            metrics_interval=float(os.getenv("METRICS_INTERVAL", "5")),
+            on_timeout=on_timeout,
+        )
+
+    def start(self):
+        logging.info(f"Starting {self.max_concurrency} scraping workers.")
+        with self._lock:
+            for _ in range(self.max_concurrency):
+                self._workers.append(self._spawn_worker())
+        self._dispatcher.start()
+
+    def submit(self, analysis_id, tenant, host, payload, time_limit):
+        with self._lock:
+            if analysis_id in self._jobs:
+                raise DuplicateJob(analysis_id)
+            if len(self._queue) >= self.max_queued:
+                raise SchedulerFull("Scraping queue is full")
+            if self._queue.count(tenant) >= self.max_queued_per_tenant:
+                raise SchedulerFull("Too many queued analyses for this tenant")
+
+            job = Job(analysis_id, tenant, host, payload, time_limit)
+            self._jobs[analysis_id] = job
+            self._queue.push(job)
+            self._dispatch()
+            return self._describe(job)
+
+    def status(self, analysis_id):
+        with self._lock:
+            job = self._jobs.get(analysis_id)
+            return self._describe(job) if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for worker in self._workers if worker.job is not None)
+            return {
+                "maxConcurrency": self.max_concurrency,
+                "running": running,
+                "queued": len(self._queue),
+                "records": len(self._jobs),
+                "workerRestarts": self.worker_restarts,
+                "averageDurationSeconds": self._average_duration,
+            }
+
+    def worker_reports(self):
+        with self._lock:
+            return [
+                {
+                    "pid": worker.process.pid,
+                    "busy": worker.job is not None,
+                    **(worker.report or {}),
+                }
+                for worker in self._workers
+            ]
+
+    def metrics_snapshot(self):
+        # Metrics of every worker, merged, plus the scheduler's own.
+        with self._lock:
+            snapshot = merge_snapshots(
+                [self._retired_metrics] + [worker.metrics for worker in self._workers]
+            )
+            running = sum(1 for worker in self._workers if worker.job is not None)
+            gauges, counters = snapshot["gauges"], snapshot["counters"]
+            gauges[("scraper_active_jobs", ())] = running
+            gauges[("scraper_queued_jobs", ())] = len(self._queue)
+            counters[("scraper_worker_restarts_total", ())] = self.worker_restarts
+            return snapshot
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        if self._dispatcher.is_alive():
+            self._dispatcher.join()
+        for worker in workers:
+            if worker.job is not None:
+                worker.kill()
+            else:
+                worker.stop()
+
+    def _spawn_worker(self):
+        return _Worker(
+            self._context,
+            self.target,
+            self.initializer,
+            self.shutdown,
+            self.metrics,
+            self.metrics_interval,
+        )
+
+    def _replace_worker(self, worker):
+        if worker.metrics is not None:
+            retired = merge_snapshots([self._retired_metrics, worker.metrics])
+            retired["gauges"] = {}
+            self._retired_metrics = retired
+        self.worker_restarts += 1
+        return self._spawn_worker()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._dispatch()
+                self._evict()
+                waitables = [worker.process.sentinel for worker in self._workers]
+                waitables += [
+                    worker.connection for worker in self._workers if worker.job
+                ]
+
+            wait(waitables, timeout=0.5)
+
+            with self._lock:
+                for index, worker in enumerate(self._workers):
+                    self._workers[index] = self._check_worker(worker)
+
+    def _check_worker(self, worker):
+        while worker.connection.poll():
+            try:
+                status, value = worker.connection.recv()
+            except (EOFError, OSError):
+                break
+            if status == "metrics":
+                worker.metrics = value
+                continue
+            if worker.job is not None:
+                if status == "completed" and isinstance(value, dict):
+                    # Results may carry a report about the worker itself.
+                    worker.report = value.pop("worker", worker.report)
+                self._finish(worker.job, status, value)
+                worker.job = None
+                return worker
+
+        if not worker.process.is_alive():
+            if worker.job is not None:
+                self._finish(worker.job, "failed", "Worker process died")
+            logging.error(f"Scraping worker {worker.process.pid} died, restarting.")
+            worker.connection.close()
+            return self._replace_worker(worker)
+
+        if worker.job is not None and time.monotonic() >= worker.deadline:
+            self._finish(worker.job, "failed", "Job exceeded its time limit")
+            logging.error(f"Killing scraping worker {worker.process.pid}.")
+            worker.kill()
+            if self.on_timeout is not None:
+                try:
+                    self.on_timeout(worker.job.payload)
+                except Exception as e:
+                    logging.error(
+                        f"Cleanup of analysis {worker.job.analysis_id} failed: {e}"
+                    )
+            return self._replace_worker(worker)
+
+        return worker
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if worker.job is not None or not worker.process.is_alive():
+                continue
+            if self.min_free_memory_mb and (
+                (available_memory_mb() or self.min_free_memory_mb)
+                < self.min_free_memory_mb
+            ):
+                logging.info("Not enough free memory to start another job.")
+                return
+
+            job = self._queue.pop_eligible(self._can_run)
+            if job is None:
+                return
+
+            job.status = "in_progress"
+            job.started_at = time.time()
+            worker.job = job
+            worker.deadline = time.monotonic() + job.time_limit + self.timeout_grace
+            try:
+                worker.connection.send(job.payload)
+            except OSError as e:
+                # The dead worker is replaced on the next check.
+                self._finish(job, "failed", f"Could not start job: {e}")
+                worker.job = None
+
+    def _can_run(self, job):
+        running = [worker.job for worker in self._workers if worker.job is not None]
+        tenant_jobs = sum(1 for other in running if other.tenant == job.tenant)
+        host_jobs = sum(1 for other in running if other.host == job.host)
+        return (
+            tenant_jobs < self.tenant_concurrency and host_jobs < self.host_concurrency
+        )
+
+    def _finish(self, job, status, value):
+        job.status = status
+        job.finished_at = time.time()
+        if status == "completed":
+            job.result = value
+            duration = job.finished_at - job.started_at
+            if self._average_duration is None:
+                self._average_duration = duration
+            else:
+                self._average_duration += 0.2 * (duration - self._average_duration)
+        else:
+            job.error = value
+        logging.info(f"Analysis {job.analysis_id} finished with status {status}.")
+
+    def _evict(self):
+        cutoff = time.time() - self.record_ttl
+        expired = [
+            analysis_id
+            for analysis_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for analysis_id in expired:
+            del self._jobs[analysis_id]
+
+    def _describe(self, job):
+        description = {
+            "analysisId": job.analysis_id,
+            "status": job.status,
+            "submittedAt": job.submitted_at,
+            "startedAt": job.started_at,
+            "finishedAt": job.finished_at,
+        }
+        if job.status == "queued":
+            position = self._queue.order().index(job)
+            description["queuePosition"] = position + 1
+            description["etaSeconds"] = self._eta(job, position)
+        elif job.status == "completed":
+            description["result"] = job.result
+        elif job.status == "failed":
+            description["error"] = job.error
+        return description
+
+    def _eta(self, job, position):
+        duration = self._average_duration or job.time_limit
+        running = [worker for worker in self._workers if worker.job is not None]
+        free_slots = len(self._workers) - len(running)
+        if position < free_slots:
+            return 0.0
+        # Slots free up as running jobs finish, each after about one duration.
+        remaining = sorted(
+            max(0.0, duration - (time.time() - worker.job.started_at))
+            for worker in running
+        )
+        waves, slot = divmod(position - free_slots, max(1, len(self._workers)))
+        first_free = remaining[slot] if slot < len(remaining) else 0.0
+        return first_free + waves * duration
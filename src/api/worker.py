@@ -0,0 +1,209 @@
+import logging
+import os
+import re
+from typing import Optional
+
+from scraper.browser_pool import BrowserPool
+from scraper.browser_session import chrome_processes
+from scraper.checkpoint import CheckpointStore
+from scraper.connector_client import ConnectorClient
+from scraper.crawl_state import SqliteCrawlState
+from scraper.download_engine import ProcessDownloadEngine
+from scraper.media_cache import MediaCache
+from scraper.metrics import metrics
+from scraper.tab_pool import TabPool
+from scraper.tracing import Tracer
+from scraper.web_scraper import WebScraper
+
+# Resources live for the lifetime of one scheduler worker process and are
+# shared by the jobs it runs one after another.
+browser_pool: Optional[BrowserPool] = None
+checkpoints: Optional[CheckpointStore] = None
+connector: Optional[ConnectorClient] = None
+download_engine: Optional[ProcessDownloadEngine] = None
+media_cache: Optional[MediaCache] = None
+tab_pool: Optional[TabPool] = None
+
+
+def create_browser_pool() -> Optional[BrowserPool]:
+    size = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+    if size <= 0:
+        return None
+    return BrowserPool(
+        size=size,
+        max_pages_per_browser=int(os.getenv("BROWSER_POOL_MAX_PAGES", "200")),
+        max_memory_mb=int(os.getenv("BROWSER_POOL_MAX_MEMORY_MB", "1536")),
+        lease_timeout=int(os.getenv("BROWSER_POOL_LEASE_TIMEOUT", "600")),
+    )
+
+
+def initialize():
+    global browser_pool, checkpoints, connector, download_engine, media_cache
+    global tab_pool
+    checkpoints = CheckpointStore.from_env()
+    connector = ConnectorClient.from_env()
+    media_cache = MediaCache.from_env()
+    download_engine = ProcessDownloadEngine(
+        workers=int(os.getenv("SCRAPER_DOWNLOAD_WORKERS", "2"))
+    )
+    # With several tabs per browser, one browser renders all pages.
+    tab_pool = TabPool.from_env()
+    if tab_pool is None:
+        browser_pool = create_browser_pool()
+    if browser_pool is not None:
+        browser_pool.start()
+
+
+def shutdown():
+    if browser_pool is not None:
+        browser_pool.close()
+    if tab_pool is not None:
+        tab_pool.close()
+    if download_engine is not None:
+        download_engine.close()
+    if connector is not None:
+        connector.close()
+
+
+def metrics_snapshot():
+    metrics.set("scraper_chrome_processes", chrome_processes())
+    return metrics.snapshot()
+
+
+def run_job(job):
+    metrics.set("scraper_active_jobs", 1)
+    try:
+        return _run_job(job)
+    finally:
+        metrics.set("scraper_active_jobs", 0)
+
+
+def discard_checkpoint(job):
+    # Runs in the API process once a job was killed on its time limit: the
+    # analysis has failed and must not be resumed on the next start.
+    store = CheckpointStore.from_env()
+    if store is not None:
+        store.checkpoint(job["analysisId"], job).remove()
+
+
+def finish_shared_crawl(crawl_state, analysis_id, files, stream_results, headers):
+    # Every worker of a shared crawl reports its own files; the last one to
+    # leave completes the analysis with the total of all workers. Only the
+    # files the connector received count towards that total.
+    if not stream_results:
+        connector.stream_files(analysis_id, files, headers)
+    lost = connector.send_undelivered(analysis_id, headers)
+    total_files = crawl_state.leave(len(files) - lost)
+    if total_files is None:
+        logging.info(f"Analysis {analysis_id} is completed by another worker")
+        return
+    connector.complete_report(analysis_id, total_files, headers)
+    crawl_state.finish()
+
+
+def abandon_shared_crawl(crawl_state, analysis_id, reported_files, headers):
+    # A failing worker still leaves the crawl, so its heartbeat stops and the
+    # others do not wait for it; if it was the last one, it completes the
+    # analysis with what has been reported.
+    try:
+        lost = connector.send_undelivered(analysis_id, headers)
+        total_files = crawl_state.leave(max(0, reported_files - lost))
+        if total_files is not None:
+            connector.complete_report(analysis_id, total_files, headers)
+            crawl_state.finish()
+    except Exception as e:
+        logging.error(f"Could not leave the crawl of analysis {analysis_id}: {e}")
+
+
+def _run_job(job):
+    analysis_id = job["analysisId"]
+    params = job["inputParams"]
+    stream_results = os.getenv("SCRAPER_STREAM_RESULTS", "true").lower() == "true"
+    max_filesize_mb = int(os.getenv("MEDIA_MAX_FILESIZE_MB", "0"))
+    tracer = Tracer() if job.get("trace") else None
+    crawl_state = SqliteCrawlState.from_env(
+        analysis_id, params["max_pages"], params["max_files"]
+    )
+    # A shared crawl state already outlives the worker.
+    checkpoint = None
+    if checkpoints is not None and crawl_state is None:
+        checkpoint = checkpoints.checkpoint(analysis_id, job)
+    scraper = WebScraper(
+        starting_point=params["starting_point"],
+        max_depth=params["max_depth"],
+        max_files=params["max_files"],
+        max_pages=params["max_pages"],
+        model=params["model"],
+        max_time_per_file=params["max_time_per_file"],
+        max_total_time=params["max_total_time"],
+        download_dir="./downloads",
+        browser_pool=browser_pool,
+        lookup_batch_size=int(os.getenv("LOOKUP_BATCH_SIZE", "50")),
+        lookup_flush_interval=float(os.getenv("LOOKUP_FLUSH_INTERVAL", "2.0")),
+        connector=connector,
+        render_workers=int(os.getenv("SCRAPER_RENDER_WORKERS", "1")),
+        download_workers=int(os.getenv("SCRAPER_DOWNLOAD_WORKERS", "2")),
+        media_prefilter=os.getenv("MEDIA_PREFILTER", "true").lower() == "true",
+        download_engine=download_engine,
+        stream_results=stream_results,
+        media_cache=media_cache,
+        audio_profile=params["audio_profile"],
+        sample_rate=params["sample_rate"],
+        clip_seconds=int(os.getenv("CLIP_SECONDS", "0")) or None,
+        clip_start=int(os.getenv("CLIP_START", "0")),
+        tab_pool=tab_pool,
+        max_media_duration=int(os.getenv("MEDIA_MAX_DURATION", "0")) or None,
+        max_media_filesize=max_filesize_mb * 1024**2 or None,
+        crawl_order=os.getenv("SCRAPER_CRAWL_ORDER", "priority"),
+        tracer=tracer,
+        crawl_state=crawl_state,
+        checkpoint=checkpoint,
+    )
+
+    headers = {"Authorization": f"Bearer {job['bearerToken']}"}
+
+    if crawl_state is not None:
+        crawl_state.join()
+    # Only an analysis whose worker crashed is resumed from its checkpoint;
+    # one that was reported or failed is over.
+    try:
+        files_scraped = scraper.scrape(headers, analysis_id)
+
+        logging.info({"analysisId": analysis_id, "files": files_scraped})
+        with metrics.timer("scraper_stage_seconds", stage="report"):
+            with scraper.tracer.span("upload", "job", final=True):
+                if crawl_state is not None:
+                    finish_shared_crawl(
+                        crawl_state, analysis_id, files_scraped, stream_results, headers
+                    )
+                elif stream_results:
+                    # Files were already reported while the crawl was running.
+                    connector.complete_report(analysis_id, len(files_scraped), headers)
+                else:
+                    connector.send_report(analysis_id, files_scraped, headers)
+    except Exception:
+        if crawl_state is not None:
+            # Streamed files were reported as they were found.
+            reported_files = scraper.file_counter if stream_results else 0
+            abandon_shared_crawl(crawl_state, analysis_id, reported_files, headers)
+        raise
+    finally:
+        if checkpoint is not None:
+            checkpoint.remove()
+
+    trace = None
+    if tracer is not None:
+        trace_dir = os.getenv("TRACE_DIR", "./traces")
+        name = re.sub(r"[^\w.-]", "_", analysis_id)
+        trace = tracer.write(os.path.join(trace_dir, f"{name}.json"))
+
+    return {
+        "files": len(files_scraped),
+        "pages": scraper.page_counter,
+        "trace": trace,
+        "worker": {
+            "browserPool": browser_pool.stats() if browser_pool is not None else None,
+            "tabPool": tab_pool.stats() if tab_pool is not None else None,
+            "mediaCache": media_cache.stats() if media_cache is not None else None,
+        },
+    }
@@ -0,0 +1,123 @@
+"""CPU-seconds and output bytes per file for each AudioDownloader profile.
+
+Run from ``src``: ``python -m benchmarks.audio_profile_benchmark [MEDIA ...]``.
+MEDIA are URLs or local files; local files are served from a localhost HTTP
+server. Without arguments a 5 minute AAC test tone is generated with ffmpeg.
+CPU time includes the ffmpeg processes started by yt-dlp.
+"""
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+
+from scraper.audio_downloader import AUDIO_PROFILES, AudioDownloader
+
+
+def cpu_seconds():
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def serve(directory):
+    handler = functools.partial(
+        http.server.SimpleHTTPRequestHandler, directory=directory
+    )
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def generate_tone(directory):
+    path = os.path.join(directory, "tone.m4a")
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=440:duration=300:sample_rate=44100",
+            "-ac",
+            "2",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "128k",
+            path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def run(profile, urls, sample_rate, directory):
+    download_dir = os.path.join(directory, profile)
+    downloader = AudioDownloader(
+        download_dir, timeout=600, profile=profile, sample_rate=sample_rate
+    )
+
+    files = 0
+    size = 0
+    started_cpu = cpu_seconds()
+    started = time.perf_counter()
+    for url in urls:
+        path = downloader.download_audio(url)
+        if path is not None:
+            files += 1
+            size += os.path.getsize(os.path.join(download_dir, path))
+    wall_seconds = time.perf_counter() - started
+    used_cpu = cpu_seconds() - started_cpu
+
+    return {
+        "profile": downloader.profile_key,
+        "files": files,
+        "cpu_seconds_per_file": used_cpu / files if files else None,
+        "wall_seconds_per_file": wall_seconds / files if files else None,
+        "bytes_per_file": size / files if files else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("media", nargs="*", help="URLs or local media files")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        media_dir = os.path.join(directory, "media")
+        os.makedirs(media_dir)
+        media = args.media or [generate_tone(media_dir)]
+
+        server = serve(media_dir)
+        urls = []
+        for item in media:
+            if os.path.exists(item):
+                name = os.path.basename(item)
+                if os.path.dirname(os.path.abspath(item)) != media_dir:
+                    os.symlink(os.path.abspath(item), os.path.join(media_dir, name))
+                item = f"http://127.0.0.1:{server.server_port}/{name}"
+            urls.append(item)
+
+        try:
+            results = [
+                run(profile, urls, args.sample_rate, directory)
+                for profile in AUDIO_PROFILES
+            ]
+        finally:
+            server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
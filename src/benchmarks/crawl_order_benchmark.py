@@ -0,0 +1,160 @@
+"""Files found per page visited with BFS and priority crawl order.
+
+Run from ``src``: ``python -m benchmarks.crawl_order_benchmark [--sites N]``.
+Crawls synthetic site graphs through WebScraper's frontier logic without a
+browser or downloads. Every page carries the site navigation (about, legal,
+login, news, shop) before its content; media pages are podcast episodes,
+videos and articles with embedded players, not all of them under media-like
+URLs.
+"""
+
+import argparse
+import json
+import queue
+import random
+import statistics
+import tempfile
+
+from scraper.link_extractor import PageLinks
+from scraper.web_scraper import WebScraper
+
+HOME = "https://site.example/"
+NAVIGATION = {
+    "about": "About us",
+    "privacy": "Privacy policy",
+    "terms": "Terms of use",
+    "contact": "Contact",
+    "careers": "Careers",
+    "login": "Log in",
+    "faq": "FAQ",
+    "press": "Press",
+    "news": "News",
+    "shop": "Shop",
+    "podcasts": "Podcasts",
+    "videos": "Videos",
+}
+
+
+class OfflineConnector:
+    # The crawl loop never looks up predictions.
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def build_site(rng, shows=4, episodes=12, videos=15, articles=40, products=30):
+    # Maps each URL to (links, anchor text, media URLs of the page).
+    pages = {}
+    navigation = {HOME + name: text for name, text in NAVIGATION.items()}
+
+    def add(url, content=None, media=()):
+        anchors = dict(navigation)
+        anchors.update(content or {})
+        links = list(anchors)
+        pages[url] = (links, anchors, set(media))
+
+    add(HOME, {HOME + f"news/{i}": f"Headline {i}" for i in range(6)})
+    for name in ("about", "privacy", "terms", "contact", "careers", "login"):
+        add(HOME + name)
+    add(HOME + "faq", {HOME + "help/" + str(i): f"Question {i}" for i in range(10)})
+    add(HOME + "press", {HOME + f"news/{i}": f"Release {i}" for i in range(5, 15)})
+    for i in range(10):
+        add(HOME + f"help/{i}")
+
+    add(HOME + "news", {HOME + f"news/{i}": f"Headline {i}" for i in range(articles)})
+    for i in range(articles):
+        # Some articles embed a player, most do not.
+        media = [HOME + f"media/news-{i}.mp3"] if rng.random() < 0.15 else []
+        related = rng.sample(range(articles), 3)
+        add(
+            HOME + f"news/{i}",
+            {HOME + f"news/{j}": f"Related: headline {j}" for j in related},
+            media,
+        )
+
+    add(HOME + "shop", {HOME + f"shop/{i}": f"Product {i}" for i in range(products)})
+    for i in range(products):
+        add(HOME + f"shop/{i}", {HOME + "shop": "Back to shop"})
+
+    add(HOME + "podcasts", {HOME + f"shows/{s}": f"Show {s}" for s in range(shows)})
+    for show in range(shows):
+        # Episode pages have opaque URLs; only the show page, which plays
+        # the latest episode, and the anchor text hint at media.
+        episode_urls = {
+            HOME + f"p/{show * 1000 + e}": f"Episode {e}: {rng.random():.3f}"
+            for e in range(episodes)
+        }
+        add(HOME + f"shows/{show}", episode_urls, [HOME + f"media/show-{show}.mp3"])
+        for url in episode_urls:
+            add(url, {HOME + f"shows/{show}": f"Show {show}"}, [url + ".mp3"])
+
+    add(HOME + "videos", {HOME + f"video/{v}": f"Clip {v}" for v in range(videos)})
+    for video in range(videos):
+        add(HOME + f"video/{video}", {}, [HOME + f"media/{video}.mp4"])
+    return pages
+
+
+def crawl(pages, crawl_order, max_pages, max_depth, download_dir):
+    scraper = WebScraper(
+        starting_point=HOME,
+        max_depth=max_depth,
+        max_files=max_pages,
+        max_pages=max_pages,
+        model="benchmark",
+        max_time_per_file=1,
+        max_total_time=3600,
+        download_dir=download_dir,
+        static_fetch=False,
+        connector=OfflineConnector(),
+        media_prefilter=False,
+        isolate_downloads=False,
+        crawl_order=crawl_order,
+    )
+    lookup_queue = queue.Queue()
+    files = 0
+    while True:
+        page = scraper._claim_page()
+        if page is None:
+            break
+        links, anchors, media = pages.get(page.url, ([], {}, set()))
+        page.page_links = PageLinks(links=links, anchor_text=anchors, media=media)
+        if media:
+            files += 1
+        scraper._commit_page(page, lookup_queue)
+    scraper.frontier.close()
+    return scraper.page_counter, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--max-depth", type=int, default=4)
+    args = parser.parse_args()
+
+    sites = [build_site(random.Random(seed)) for seed in range(args.sites)]
+    results = []
+    with tempfile.TemporaryDirectory() as download_dir:
+        for max_pages in (20, 50):
+            for crawl_order in ("bfs", "priority"):
+                runs = [
+                    crawl(pages, crawl_order, max_pages, args.max_depth, download_dir)
+                    for pages in sites
+                ]
+                results.append(
+                    {
+                        "crawl_order": crawl_order,
+                        "max_pages": max_pages,
+                        "pages": statistics.mean(pages for pages, _ in runs),
+                        "files": statistics.mean(files for _, files in runs),
+                        "files_per_page": statistics.mean(
+                            files / pages for pages, files in runs
+                        ),
+                    }
+                )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""End-to-end throughput of WebScraper.scrape against a synthetic local site.
+
+Run from ``src``: ``python -m benchmarks.e2e_benchmark [--pages N] ...``.
+A site graph with the given number of pages, fan-out, share of pages rendered
+by JavaScript and share of pages embedding an audio file is served from a
+localhost HTTP server, next to a stand-in connector with injectable latency.
+Each run is a full scrape job with the real browser, yt-dlp and ffmpeg, so
+Chrome and ffmpeg must be installed. Results are printed as JSON so runs can
+be compared.
+"""
+
+import argparse
+import functools
+import http.server
+import io
+import json
+import math
+import random
+import re
+import resource
+import struct
+import threading
+import time
+import wave
+from collections import Counter, defaultdict
+from tempfile import TemporaryDirectory
+
+from scraper.connector_client import ConnectorClient
+from scraper.web_scraper import WebScraper
+
+STATIC_PAGE = """<!DOCTYPE html>
+<html><head><title>Page {index}</title></head>
+<body><h1>Page {index}</h1><p>{text}</p>{links}{audio}</body></html>
+"""
+# Links only exist once the script has run, so the static fetcher escalates
+# these pages to the browser.
+SCRIPT_PAGE = """<!DOCTYPE html>
+<html><head><title>Page {index}</title></head>
+<body><div id="root"></div><script>
+var root = document.getElementById("root");
+root.innerHTML = {content};
+</script></body></html>
+"""
+
+
+def wav_tone(seconds=2, rate=8000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(rate)
+        file.writeframes(
+            b"".join(
+                struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate)))
+                for i in range(seconds * rate)
+            )
+        )
+    return buffer.getvalue()
+
+
+class SyntheticSite:
+    # Page i links to its fan_out children in a tree plus one random page,
+    # so the crawl meets duplicates as real sites do.
+    def __init__(self, pages, fan_out, script_share, audio_share, seed=0):
+        rng = random.Random(seed)
+        self.pages = pages
+        self.links = {
+            index: [
+                child
+                for child in range(index * fan_out + 1, index * fan_out + fan_out + 1)
+                if child < pages
+            ]
+            + [rng.randrange(pages)]
+            for index in range(pages)
+        }
+        self.scripted = {index for index in range(pages) if rng.random() < script_share}
+        self.audio = {index for index in range(pages) if rng.random() < audio_share}
+        self.tone = wav_tone()
+
+    def html(self, index):
+        links = "".join(
+            f'<a href="/page/{link}">Page {link}</a> ' for link in self.links[index]
+        )
+        audio = (
+            f'<audio controls src="/media/{index}.wav"></audio>'
+            if index in self.audio
+            else ""
+        )
+        if index in self.scripted:
+            return SCRIPT_PAGE.format(
+                index=index, content=json.dumps(links + audio)
+            ).encode()
+        text = "Server rendered paragraph. " * 20
+        return STATIC_PAGE.format(
+            index=index, text=text, links=links, audio=audio
+        ).encode()
+
+
+class SiteHandler(http.server.BaseHTTPRequestHandler):
+    def __init__(self, *args, site, **kwargs):
+        self.site = site
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        page = re.fullmatch(r"/page/(\d+)", self.path)
+        media = re.fullmatch(r"/media/(\d+)\.wav", self.path)
+        if page and int(page.group(1)) < self.site.pages:
+            self._send(200, "text/html; charset=utf-8", self.site.html(int(page[1])))
+        elif media and int(media.group(1)) in self.site.audio:
+            self._send(200, "audio/wav", self.site.tone)
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeConnector:
+    # Stands in for the connector service. Links of known_share of the pages
+    # already have a prediction; every response is delayed by latency seconds.
+    def __init__(self, latency, known_share, seed=0):
+        self.latency = latency
+        self.known_share = known_share
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.reported_files = 0
+        self.known = {}
+
+    def predictions(self, links):
+        with self.lock:
+            for link in links:
+                if link not in self.known:
+                    self.known[link] = self.rng.random() < self.known_share
+            return [
+                {"link": link, "prediction": "benchmark"}
+                for link in links
+                if self.known[link]
+            ]
+
+
+class ConnectorHandler(http.server.BaseHTTPRequestHandler):
+    def __init__(self, *args, connector, **kwargs):
+        self.connector = connector
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        body = self._read()
+        if re.fullmatch(r"/predictions/model/[^/]+", self.path):
+            self._respond("predictions", self.connector.predictions(body["links"]))
+        else:
+            self._respond("unknown", None, status=404)
+
+    def do_PUT(self):
+        self._read()
+        if re.fullmatch(r"/analyses/[^/]+/predictions", self.path):
+            self._respond("update_predictions", {})
+        else:
+            self._respond("unknown", None, status=404)
+
+    def do_POST(self):
+        body = self._read()
+        if self.path == "/scraper/report":
+            with self.connector.lock:
+                self.connector.reported_files += len(body.get("files", []))
+            self._respond("report", {})
+        else:
+            self._respond("unknown", None, status=404)
+
+    def _read(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _respond(self, name, body, status=200):
+        with self.connector.lock:
+            self.connector.requests[name] += 1
+        time.sleep(self.connector.latency)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(handler, **kwargs):
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(handler, **kwargs)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(target, name, samples):
+    # Records the duration of every call of target.name into samples.
+    method = getattr(target, name)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+
+    setattr(target, name, wrapper)
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(q):
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": rank(0.5) * 1000,
+        "p90_ms": rank(0.9) * 1000,
+        "p99_ms": rank(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux; children are Chrome, chromedriver
+    # and the download processes that have already exited.
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def run(args, site_url, connector_url, download_dir, run_index):
+    connector = ConnectorClient(connector_url, write_interval=0.2)
+    scraper = WebScraper(
+        starting_point=f"{site_url}/page/0",
+        max_depth=args.max_depth,
+        max_files=args.max_files,
+        max_pages=args.pages,
+        model="benchmark",
+        max_time_per_file=60,
+        max_total_time=args.max_total_time,
+        download_dir=download_dir,
+        connector=connector,
+        render_workers=args.render_workers,
+        download_workers=args.download_workers,
+        media_cache=None,
+        audio_profile=args.audio_profile,
+        crawl_order=args.crawl_order,
+    )
+    stages = defaultdict(list)
+    timed(scraper, "fetch_page", stages["render"])
+    timed(scraper.predictions, "lookup", stages["lookup"])
+    timed(scraper, "download_media", stages["download"])
+    timed(scraper, "report_file", stages["report"])
+
+    headers = {"Authorization": "Bearer benchmark"}
+    analysis_id = f"benchmark-{run_index}"
+    started = time.perf_counter()
+    files = scraper.scrape(headers, analysis_id)
+    connector.complete_report(analysis_id, len(files), headers)
+    seconds = time.perf_counter() - started
+    connector.close()
+
+    return {
+        "pages": scraper.page_counter,
+        "rendered_pages": scraper.rendered_pages,
+        "files": len(files),
+        "known_predictions": scraper.file_counter - len(files),
+        "seconds": seconds,
+        "pages_per_second": scraper.page_counter / seconds,
+        "files_per_second": len(files) / seconds,
+        "stages": {name: percentiles(samples) for name, samples in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--fan-out", type=int, default=4)
+    parser.add_argument("--script-share", type=float, default=0.2)
+    parser.add_argument("--audio-share", type=float, default=0.1)
+    parser.add_argument("--known-share", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-depth", type=int, default=10)
+    parser.add_argument("--max-files", type=int, default=1000)
+    parser.add_argument("--max-total-time", type=int, default=1800)
+    parser.add_argument("--render-workers", type=int, default=1)
+    parser.add_argument("--download-workers", type=int, default=2)
+    parser.add_argument("--audio-profile", default="mp3")
+    parser.add_argument("--crawl-order", default="bfs")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    site = SyntheticSite(
+        args.pages, args.fan_out, args.script_share, args.audio_share, args.seed
+    )
+    fake_connector = FakeConnector(args.latency, args.known_share, args.seed)
+    site_server = serve(SiteHandler, site=site)
+    connector_server = serve(ConnectorHandler, connector=fake_connector)
+    site_url = f"http://127.0.0.1:{site_server.server_port}"
+    connector_url = f"http://127.0.0.1:{connector_server.server_port}"
+
+    runs = []
+    try:
+        for run_index in range(args.repeat):
+            with TemporaryDirectory() as download_dir:
+                runs.append(run(args, site_url, connector_url, download_dir, run_index))
+    finally:
+        site_server.shutdown()
+        connector_server.shutdown()
+
+    print(
+        json.dumps(
+            {
+                "config": vars(args),
+                "site": {
+                    "pages": site.pages,
+                    "scripted_pages": len(site.scripted),
+                    "audio_pages": len(site.audio),
+                },
+                "runs": runs,
+                "connector_requests": dict(fake_connector.requests),
+                "reported_files": fake_connector.reported_files,
+                "peak_rss_mb": peak_rss_mb(),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Per-operation cost of CrawlFrontier from 1k to 1M URLs.
+
+Run from ``src``: ``python -m benchmarks.frontier_benchmark [--spill]``.
+Every URL is pushed twice so half of the pushes exercise the dedupe path.
+"""
+
+import argparse
+import json
+import time
+
+from scraper.frontier import CrawlFrontier
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+def run(size, memory_budget):
+    urls = [f"https://example.com/section/{i % 97}/page-{i}" for i in range(size)]
+    frontier = CrawlFrontier(memory_budget=memory_budget)
+
+    started = time.perf_counter()
+    for url in urls:
+        frontier.push(url, 1)
+    for url in urls:
+        frontier.push(url, 2)
+    push_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    while frontier:
+        frontier.pop()
+    pop_seconds = time.perf_counter() - started
+    frontier.close()
+
+    return {
+        "urls": size,
+        "push_ns_per_op": push_seconds / (2 * size) * 1e9,
+        "pop_ns_per_op": pop_seconds / size * 1e9,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--spill",
+        action="store_true",
+        help="use a 10k URL memory budget so large runs spill to disk",
+    )
+    args = parser.parse_args()
+    memory_budget = 10_000 if args.spill else max(SIZES)
+
+    results = [run(size, memory_budget) for size in SIZES]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,373 @@
 import concurrent.futures
+import glob
+import itertools
 import logging
 import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 
 import yt_dlp
+from yt_dlp.postprocessor.ffmpeg import FFmpegExtractAudioPP
+
+from .download_engine import DownloadTimeout
+from .media_cache import media_key
+from .metrics import metrics
+from .tracing import NULL_TRACER
+
+AUDIO_PROFILES = ("mp3", "native", "model")
 
 
 class TimeoutException(Exception):
     pass
 
 
+def _media_entry(info):
+    if info and info.get("_type") in ("playlist", "multi_video"):
+        entries = info.get("entries") or [None]
+        return entries[0]
+    return info
+
+
+def _estimated_size(info):
+    size = info.get("filesize") or info.get("filesize_approx")
+    if size:
+        return size
+    # Unprocessed results list every format; bestaudio is the largest
+    # audio-only one.
+    audio_sizes = [
+        fmt.get("filesize") or fmt.get("filesize_approx") or 0
+        for fmt in info.get("formats") or []
+        if fmt.get("vcodec") == "none"
+    ]
+    return max(audio_sizes, default=0) or None
+
+
+class ModelAudioPP(FFmpegExtractAudioPP):
+    # FFmpegExtractAudio copies FLAC sources instead of converting them, or
+    # leaves a .flac file alone, so the downmix and resampling arguments
+    # would be dropped or clash with the stream copy. Passing the source
+    # codec off as another one always re-encodes to FLAC.
+    @classmethod
+    def pp_key(cls):
+        # Keeps ExtractAudio's postprocessor_args key and progress hook name.
+        return "ExtractAudio"
+
+    def get_audio_codec(self, path):
+        codec = super().get_audio_codec(path)
+        return "flac-source" if codec == "flac" else codec
+
+
+# Postprocessors yt-dlp cannot look up by key.
+_POSTPROCESSORS = {"ModelAudio": ModelAudioPP}
+
+
+def _youtube_dl(ydl_opts):
+    # Ours are added to the instance, so ydl_opts stay picklable for the
+    # download engine's worker processes.
+    builtin = []
+    custom = []
+    for postprocessor in ydl_opts.get("postprocessors", []):
+        if postprocessor["key"] in _POSTPROCESSORS:
+            custom.append(dict(postprocessor))
+        else:
+            builtin.append(postprocessor)
+    ydl = yt_dlp.YoutubeDL({**ydl_opts, "postprocessors": builtin})
+    for postprocessor in custom:
+        cls = _POSTPROCESSORS[postprocessor.pop("key")]
+        ydl.add_post_processor(cls(ydl, **postprocessor), when="post_process")
+    return ydl
+
+
+def _profile_options(profile, sample_rate):
+    # mp3: 192 kbps MP3, as before.
+    # native: the source audio stream, copied without re-encoding when ffmpeg
+    # can remux it.
+    # model: mono FLAC at the model's sample rate, in a single ffmpeg pass,
+    # re-encoded even when the source already is FLAC.
+    key = "FFmpegExtractAudio"
+    if profile == "mp3":
+        extract_audio = {"preferredcodec": "mp3", "preferredquality": "192"}
+    elif profile == "native":
+        extract_audio = {"preferredcodec": "best"}
+    elif profile == "model":
+        key = "ModelAudio"
+        extract_audio = {"preferredcodec": "flac"}
+    else:
+        raise ValueError(f"Unknown audio profile: {profile}")
+
+    options = {
+        "postprocessors": [{"key": key, **extract_audio}],
+    }
+    if profile == "model":
+        options["postprocessor_args"] = {
+            "extractaudio+ffmpeg_o": ["-ac", "1", "-ar", str(sample_rate)]
+        }
+    return options
+
+
+def _download(url, ydl_opts):
+    try:
+        with _youtube_dl(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            if "requested_downloads" in info:
+                for download_info in info["requested_downloads"]:
+                    if "filepath" in download_info:
+                        file_path = download_info["filepath"]
+                        if os.path.exists(file_path):
+                            return os.path.basename(file_path)
+    except yt_dlp.utils.DownloadError as e:
+        logging.error(f"Failed to download {url}: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"An error occurred while processing {url}: {e}")
+        return None
+
+
+def _traced_download(url, ydl_opts):
+    # Like _download, but also returns the download and transcode spans,
+    # told apart by yt-dlp's postprocessor hooks.
+    transcode = {}
+
+    def on_postprocess(progress):
+        if progress.get("postprocessor") == "ExtractAudio":
+            transcode[progress["status"]] = time.monotonic()
+
+    started = time.monotonic()
+    path = _download(url, {**ydl_opts, "postprocessor_hooks": [on_postprocess]})
+    finished = time.monotonic()
+
+    spans = [("download", started, transcode.get("started", finished))]
+    if "started" in transcode:
+        spans.append(
+            ("transcode", transcode["started"], transcode.get("finished", finished))
+        )
+    return path, spans
+
+
+def _probe(url, ydl_opts):
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            if info is not None and "entries" in info:
+                # Playlists are lazy; keep only the entry that would be
+                # downloaded so the result can be sent between processes.
+                info["entries"] = list(itertools.islice(info["entries"] or [], 1))
+            return info
+    except yt_dlp.utils.DownloadError as e:
+        logging.info(f"No media found at {url}: {e}")
+    except Exception as e:
+        logging.error(f"An error occurred while probing {url}: {e}")
+    return None
+
+
 class AudioDownloader:
-    def __init__(self, download_dir="./downloads", timeout=30):
+    def __init__(
+        self,
+        download_dir="./downloads",
+        timeout=30,
+        engine=None,
+        cache=None,
+        profile="mp3",
+        sample_rate=16000,
+        clip_seconds=None,
+        clip_start=0,
+        max_duration=None,
+        max_filesize=None,
+        tracer=None,
+    ):
+        # With a ProcessDownloadEngine, yt-dlp runs in killable worker
+        # processes; otherwise it runs in a thread that cannot be stopped.
         self.download_dir = download_dir
         self.timeout = timeout
+        self.engine = engine
+        self.cache = cache
+        self.profile = profile
+        self.sample_rate = sample_rate
+        self._profile_options = _profile_options(profile, sample_rate)
+        # Clip mode downloads and decodes only clip_seconds from clip_start.
+        # Media longer than max_duration seconds or larger than max_filesize
+        # bytes is skipped before downloading.
+        self.clip_seconds = clip_seconds
+        self.clip_start = clip_start
+        self.max_duration = max_duration
+        self.max_filesize = max_filesize
+        self.tracer = tracer or NULL_TRACER
+        self._lock = threading.Lock()
+        self._probes = OrderedDict()
+        self._key_locks = {}
         os.makedirs(download_dir, exist_ok=True)
 
-    def download_audio(self, url):
+    def probe(self, url, deadline=None):
+        # Recent results are kept, so the prefilter and the cache lookup of
+        # the same URL share one request.
+        with self._lock:
+            if url in self._probes:
+                return self._probes[url]
+
+        ydl_opts = {
+            "quiet": True,
+            "playlist_items": "1",
+            "socket_timeout": self.timeout,
+        }
+        info = self._run(_probe, url, ydl_opts, deadline=deadline)
+        with self._lock:
+            self._probes[url] = info
+            if len(self._probes) > 128:
+                self._probes.popitem(last=False)
+        return info
+
+    def download_audio(self, url, deadline=None):
+        # The probe and the download share one timeout per file, or the
+        # caller's deadline when several URLs stand for the same file.
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+        info = None
+        if (
+            self.cache is not None
+            or self.clip_seconds
+            or self.max_duration
+            or self.max_filesize
+        ):
+            with self.tracer.span("probe", url=url):
+                info = _media_entry(self.probe(url, deadline=deadline))
+        if info and self._exceeds_limits(url, info):
+            return None
+        clip = self._clip_range(info)
+
+        key = media_key(info) if self.cache is not None else None
+        if key is None:
+            return self._download_audio(url, clip, deadline=deadline)
+
+        key = f"{key}/{self.profile_key}"
+        # The same media embedded on several pages is only downloaded once.
+        with self._key_lock(key):
+            cached_path = self.cache.lookup(key)
+            if cached_path is not None:
+                logging.info(f"Media cache hit for {url}: {key}")
+                return self.cache.publish(cached_path, self.download_dir)
+
+            path = self._download_audio(url, clip, deadline=deadline)
+            if path is not None:
+                try:
+                    self.cache.store(key, os.path.join(self.download_dir, path))
+                except OSError as e:
+                    logging.warning(f"Could not cache {path}: {e}")
+            return path
+
+    @contextmanager
+    def _key_lock(self, key):
+        # Each lock counts the downloads holding or waiting for it and is
+        # dropped with the last one, so keys do not pile up.
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    @property
+    def profile_key(self):
+        key = self.profile
+        if self.profile == "model":
+            key = f"model-{self.sample_rate}"
+        if self.clip_seconds:
+            key = f"{key}-clip-{self.clip_start}-{self.clip_seconds}"
+        return key
+
+    def _exceeds_limits(self, url, info):
+        duration = info.get("duration")
+        if self.max_duration and duration and duration > self.max_duration:
+            logging.info(f"Skipping {url}: duration {duration}s above the cap")
+            return True
+        size = _estimated_size(info)
+        if self.max_filesize and size and size > self.max_filesize:
+            logging.info(f"Skipping {url}: {size} bytes above the cap")
+            return True
+        return False
+
+    def _clip_range(self, info):
+        if not self.clip_seconds:
+            return None
+        start = self.clip_start
+        duration = (info or {}).get("duration")
+        if duration:
+            if duration <= self.clip_seconds:
+                return None
+            # Keep the window inside the media.
+            start = max(0, min(start, duration - self.clip_seconds))
+        return start, start + self.clip_seconds
+
+    def _download_audio(self, url, clip=None, deadline=None):
         unique_id = str(uuid.uuid4())
         ydl_opts = {
             "format": "bestaudio/best",
             "outtmpl": os.path.join(self.download_dir, f"{unique_id}.%(ext)s"),
-            "postprocessors": [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                }
-            ],
+            **self._profile_options,
             "quiet": True,
             "ffmpeg_location": "/usr/bin/ffmpeg",
             "playlist_items": "1",
         }
+        if clip is not None:
+            # ffmpeg seeks into the stream, so only the window is fetched.
+            ydl_opts["download_ranges"] = yt_dlp.utils.download_range_func(None, [clip])
 
-        def download():
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    if "requested_downloads" in info:
-                        for download_info in info["requested_downloads"]:
-                            if "filepath" in download_info:
-                                file_path = download_info["filepath"]
-                                if os.path.exists(file_path):
-                                    return os.path.basename(file_path)
-            except yt_dlp.utils.DownloadError as e:
-                logging.error(f"Failed to download {url}: {e}")
-                return None
-            except Exception as e:
-                logging.error(f"An error occurred while processing {url}: {e}")
+        if self.tracer.enabled:
+            result = self._run(_traced_download, url, ydl_opts, deadline=deadline)
+            path, spans = result if result is not None else (None, [])
+            for name, started, finished in spans:
+                self.tracer.add(name, started, finished, url=url)
+        else:
+            path = self._run(_download, url, ydl_opts, deadline=deadline)
+        if path is None:
+            self._remove_partial_files(unique_id)
+        return path
+
+    def _run(self, function, url, ydl_opts, deadline=None):
+        timeout = self.timeout
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                logging.info(f"No time left for {url}.")
+                metrics.inc("scraper_timeouts_total", stage="download")
                 return None
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(download)
+        if self.engine is not None:
             try:
-                return future.result(timeout=self.timeout)
-            except concurrent.futures.TimeoutError:
+                return self.engine.run(function, (url, ydl_opts), timeout)
+            except DownloadTimeout:
                 logging.info(f"Download operation timed out for {url}.")
+                metrics.inc("scraper_timeouts_total", stage="download")
             except Exception as e:
                 logging.error(f"An unexpected error occurred: {e}")
+            return None
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(function, url, ydl_opts)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            logging.info(f"Download operation timed out for {url}.")
+            metrics.inc("scraper_timeouts_total", stage="download")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred: {e}")
+        finally:
+            # Do not wait for a timed-out thread; it is abandoned.
+            executor.shutdown(wait=False)
 
         return None
+
+    def _remove_partial_files(self, unique_id):
+        for path in glob.glob(os.path.join(self.download_dir, f"{unique_id}*")):
+            try:
+                os.remove(path)
+                logging.info(f"Removed partial download {path}")
+            except OSError as e:
+                logging.warning(f"Could not remove {path}: {e}")
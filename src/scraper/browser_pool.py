@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from .browser_session import BrowserSession
+from .page_readiness import PageReadiness
+
+
+class BrowserPoolTimeout(Exception):
+    pass
+
+
+class _Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "avg_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+        }
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        size=2,
+        max_pages_per_browser=200,
+        max_memory_mb=1536,
+        lease_timeout=600,
+        session_factory=None,
+    ):
+        self.size = size
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.lease_timeout = lease_timeout
+        # Pooled browsers share learned per-domain settle times, and each
+        # needs its own DevTools port, so let Chrome pick one.
+        self.readiness = PageReadiness.from_env()
+        self._session_factory = session_factory or (
+            lambda: BrowserSession(remote_debugging_port=0, readiness=self.readiness)
+        )
+
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._leased = set()
+        self._launching = 0
+        self._closed = False
+
+        self.lease_wait = _Timing()
+        self.launch_time = _Timing()
+        self.recycled = 0
+        self.launch_failures = 0
+
+    def start(self):
+        for _ in range(self.size):
+            with self._condition:
+                self._launching += 1
+            threading.Thread(target=self._launch_into_pool, daemon=True).start()
+
+    def acquire(self, timeout=None):
+        timeout = self.lease_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        session = None
+        while session is None:
+            session = self._take_idle(deadline, timeout)
+            if not session.is_healthy():
+                logging.info("Leased browser failed health check, replacing it.")
+                session = self._replace(session)
+
+        with self._condition:
+            self.lease_wait.observe(time.monotonic() - started)
+        return session
+
+    def _take_idle(self, deadline, timeout):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise BrowserPoolTimeout("Browser pool is closed")
+                if self._idle:
+                    session = self._idle.popleft()
+                    self._leased.add(session)
+                    return session
+                if self._total() < self.size:
+                    # A slot was freed by a failed launch; refill it.
+                    self._launching += 1
+                    threading.Thread(target=self._launch_into_pool, daemon=True).start()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BrowserPoolTimeout(
+                        f"No browser available after {timeout} seconds"
+                    )
+                self._condition.wait(remaining)
+
+    def release(self, session):
+        with self._condition:
+            if session not in self._leased:
+                return
+        if self._needs_recycling(session):
+            session = self._replace(session)
+        else:
+            try:
+                session.reset()
+            except Exception as e:
+                logging.warning(f"Failed to reset browser, recycling it: {e}")
+                session = self._replace(session)
+        if session is None:
+            return
+
+        with self._condition:
+            self._leased.discard(session)
+            if self._closed:
+                session.close()
+                return
+            self._idle.append(session)
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "launching": self._launching,
+                "recycled": self.recycled,
+                "launch_failures": self.launch_failures,
+                "lease_wait": self.lease_wait.as_dict(),
+                "launch_time": self.launch_time.as_dict(),
+            }
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        for session in idle:
+            session.close()
+
+    def _total(self):
+        return len(self._idle) + len(self._leased) + self._launching
+
+    def _needs_recycling(self, session):
+        if session.pages_visited >= self.max_pages_per_browser:
+            logging.info(f"Recycling browser after {session.pages_visited} pages.")
+            return True
+        memory = session.memory_usage()
+        if memory >= self.max_memory_bytes:
+            logging.info(f"Recycling browser using {memory} bytes of memory.")
+            return True
+        return False
+
+    def _launch(self):
+        started = time.monotonic()
+        session = self._session_factory()
+        with self._condition:
+            self.launch_time.observe(time.monotonic() - started)
+        return session
+
+    def _launch_into_pool(self):
+        try:
+            session = self._launch()
+        except Exception as e:
+            logging.error(f"Failed to launch pooled browser: {e}")
+            with self._condition:
+                self._launching -= 1
+                self.launch_failures += 1
+                self._condition.notify_all()
+            return
+
+        with self._condition:
+            self._launching -= 1
+            if self._closed:
+                session.close()
+                return
+            self._idle.append(session)
+            self._condition.notify()
+
+    def _replace(self, session):
+        try:
+            session.close()
+        except Exception as e:
+            logging.warning(f"Error closing recycled browser: {e}")
+        with self._condition:
+            self._leased.discard(session)
+            self.recycled += 1
+
+        try:
+            replacement = self._launch()
+        except Exception as e:
+            logging.error(f"Failed to launch replacement browser: {e}")
+            with self._condition:
+                self.launch_failures += 1
+                self._condition.notify_all()
+            return None
+
+        with self._condition:
+            self._leased.add(replacement)
+        return replacement
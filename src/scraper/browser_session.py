@@ -1,16 +1,78 @@
 import logging
+import os
 import time
+from collections import Counter
+from urllib.parse import urlsplit
 
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from .load_profile import LoadProfile
+from .metrics import metrics
+from .network_log import (
+    blocked_requests,
+    document_status,
+    media_urls,
+    read_network_events,
+    transferred_bytes,
+    video_urls,
+)
+from .page_readiness import PageReadiness
+
+# Navigation errors caused by the page itself; retrying or restarting the
+# browser cannot fix them.
+NON_RETRYABLE_ERRORS = (
+    "ERR_NAME_NOT_RESOLVED",
+    "ERR_NAME_RESOLUTION_FAILED",
+    "ERR_INVALID_URL",
+    "ERR_UNKNOWN_URL_SCHEME",
+    "ERR_DISALLOWED_URL_SCHEME",
+    "ERR_CERT_",
+    "ERR_SSL_PROTOCOL_ERROR",
+    "ERR_TOO_MANY_REDIRECTS",
+    "ERR_BLOCKED_BY_CLIENT",
+    "ERR_BLOCKED_BY_RESPONSE",
+)
+RETRYABLE_STATUSES = {408, 429}
+
+
+class NavigationError(Exception):
+    pass
+
+
+def check_navigation(url, error=None, status=None):
+    # Raises NavigationError when the page cannot be loaded by trying again.
+    if error is not None:
+        message = str(error)
+        if any(code in message for code in NON_RETRYABLE_ERRORS):
+            raise NavigationError(f"{url}: {message.strip()}") from error
+    elif status and 400 <= status < 500 and status not in RETRYABLE_STATUSES:
+        raise NavigationError(f"{url}: HTTP {status}")
+
+
+def target_id(handle):
+    # Older chromedrivers prefix window handles; CDP target ids are bare.
+    return handle.replace("CDwindow-", "")
+
 
 class BrowserSession:
-    def __init__(self):
+    def __init__(self, remote_debugging_port=9222, readiness=None, load_profile=None):
+        self.remote_debugging_port = remote_debugging_port
+        self.readiness = readiness or PageReadiness.from_env()
+        self.load_profile = load_profile or LoadProfile.from_env()
+        self.last_wait_time = None
+        self.last_page_bytes = 0
+        self.last_blocked_requests = 0
+        self.last_media_urls = []
+        self.last_video_urls = []
+        self.last_status = None
+        self.recoveries = Counter()
+        self._failures = 0
+        self._browser_context = None
         self._initialize_browser()
 
     def _initialize_browser(self):
@@ -20,7 +82,9 @@ class BrowserSession:
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--window-size=1920x1080")
-        chrome_options.add_argument("--remote-debugging-port=9222")
+        chrome_options.add_argument(
+            f"--remote-debugging-port={self.remote_debugging_port}"
+        )
         chrome_options.add_argument("--disable-background-networking")
         chrome_options.add_argument("--disable-background-timer-throttling")
         chrome_options.add_argument("--disable-default-apps")
@@ -29,45 +93,241 @@ class BrowserSession:
         chrome_options.add_argument("--disable-translate")
         chrome_options.add_argument("--metrics-recording-only")
         chrome_options.add_argument("--no-first-run")
+        # Network events are logged to measure the bytes each page transfers
+        # and to find media the page loads through XHR, MSE or HLS.
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.add_experimental_option(
+            "perfLoggingPrefs", {"enableNetwork": True, "enablePage": False}
+        )
+        self.load_profile.configure(chrome_options)
         self.driver = webdriver.Chrome(options=chrome_options)
+        self.load_profile.apply(self.driver)
+        self.pages_visited = 0
+        self.visited_origins = set()
 
-    def visit(self, url, retries=3):
+    def visit(self, url, retries=3, backoff=0.5):
         for attempt in range(retries):
             try:
-                start_time = time.time()
-                self.driver.get(url)
+                # Drop events of earlier pages.
+                read_network_events(self.driver)
+                try:
+                    self.driver.get(url)
+                except WebDriverException as e:
+                    check_navigation(url, error=e)
+                    raise
+                self.pages_visited += 1
+                self._remember_origin(url)
+
+                events = read_network_events(self.driver)
+                self.last_status = document_status(events)
+                check_navigation(url, status=self.last_status)
 
                 WebDriverWait(self.driver, 10).until(
                     EC.presence_of_element_located((By.TAG_NAME, "body"))
                 )
 
-                WebDriverWait(self.driver, 5).until(
-                    lambda driver: (time.time() - start_time) >= 5
+                self.last_wait_time = self.readiness.wait(
+                    self.driver.execute_script, url
+                )
+                events += read_network_events(self.driver)
+                self.last_page_bytes = transferred_bytes(events)
+                self.last_blocked_requests = blocked_requests(events)
+                self.last_media_urls = media_urls(events)
+                self.last_video_urls = video_urls(events)
+                logging.info(
+                    f"Page {url} ready after {self.last_wait_time:.2f}s, "
+                    f"{self.last_page_bytes} bytes transferred, "
+                    f"{self.last_blocked_requests} requests blocked, "
+                    f"{len(self.last_media_urls)} media responses"
                 )
 
+                self._failures = 0
                 return
+            except NavigationError:
+                raise
             except Exception as e:
-                logging.error(
-                    f"Attempt {attempt + 1} failed visiting {url}: {e}"
-                )
+                logging.error(f"Attempt {attempt + 1} failed visiting {url}: {e}")
+                if isinstance(e, TimeoutException):
+                    metrics.inc("scraper_timeouts_total", stage="visit")
                 if attempt < retries - 1:
+                    self.recoveries["retry"] += 1
+                    metrics.inc("scraper_retries_total")
+                    time.sleep(backoff * 2**attempt)
                     continue
-                self.restart_browser()
+                self.recover()
                 raise
 
+    def _remember_origin(self, url):
+        parts = urlsplit(url)
+        if parts.scheme in ("http", "https") and parts.netloc:
+            self.visited_origins.add(f"{parts.scheme}://{parts.netloc}")
+
     def get_elements(self, by, value):
         try:
             return self.driver.find_elements(by, value)
         except WebDriverException as e:
             logging.error(f"Error retrieving elements: {e}")
-            self.restart_browser()
+            self.recover()
             return []
 
+    def execute_script(self, script, *args):
+        return self.driver.execute_script(script, *args)
+
+    def is_healthy(self):
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except WebDriverException as e:
+            logging.warning(f"Browser health check failed: {e}")
+            return False
+
+    def reset(self):
+        # Leave a single blank tab and drop cookies and storage of every
+        # origin this session has seen, so the next lease starts clean.
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+        self.driver.get("about:blank")
+        self.driver.delete_all_cookies()
+        for origin in self.visited_origins:
+            self.driver.execute_cdp_cmd(
+                "Storage.clearDataForOrigin",
+                {"origin": origin, "storageTypes": "all"},
+            )
+        self.visited_origins.clear()
+
+    def memory_usage(self):
+        # Resident memory of chromedriver and every Chrome process it spawned.
+        try:
+            root_pid = self.driver.service.process.pid
+        except AttributeError:
+            return 0
+
+        total = 0
+        pending = [root_pid]
+        while pending:
+            pid = pending.pop()
+            total += _process_rss(pid)
+            pending.extend(_child_pids(pid))
+        return total
+
     def close(self):
         if self.driver:
             self.driver.quit()
 
+    def recover(self):
+        # Each consecutive failure climbs one step: a fresh tab, then a fresh
+        # browser context. Chrome itself is only restarted when it fails its
+        # health check or the cheaper steps do not work.
+        self._failures += 1
+        if not self._process_alive():
+            self.restart_browser()
+            return
+        try:
+            if self._failures == 1:
+                self._open_fresh_tab()
+                action = "new_tab"
+            else:
+                self._open_fresh_context()
+                action = "new_context"
+            self.recoveries[action] += 1
+            metrics.inc("scraper_browser_recoveries_total", action=action)
+        except (WebDriverException, KeyError, StopIteration) as e:
+            logging.warning(f"Browser recovery failed, restarting: {e}")
+            self.restart_browser()
+
+    def _process_alive(self):
+        # Unlike is_healthy, this does not depend on the current tab.
+        try:
+            self.driver.window_handles
+            return True
+        except WebDriverException as e:
+            logging.warning(f"Browser process health check failed: {e}")
+            return False
+
+    def _open_fresh_tab(self):
+        logging.info("Opening a fresh browser tab...")
+        old_handles = self.driver.window_handles
+        self.driver.switch_to.new_window("tab")
+        self._close_targets(old_handles)
+        self.load_profile.apply(self.driver)
+
+    def _open_fresh_context(self):
+        logging.info("Opening a fresh browser context...")
+        old_handles = self.driver.window_handles
+        old_context = self._browser_context
+        self._browser_context = self.driver.execute_cdp_cmd(
+            "Target.createBrowserContext", {}
+        )["browserContextId"]
+        created = self.driver.execute_cdp_cmd(
+            "Target.createTarget",
+            {"url": "about:blank", "browserContextId": self._browser_context},
+        )["targetId"]
+        handle = next(
+            handle
+            for handle in self.driver.window_handles
+            if target_id(handle) == created
+        )
+        self.driver.switch_to.window(handle)
+        self._close_targets(old_handles)
+        if old_context is not None:
+            self.driver.execute_cdp_cmd(
+                "Target.disposeBrowserContext", {"browserContextId": old_context}
+            )
+        self.load_profile.apply(self.driver)
+
+    def _close_targets(self, handles):
+        for handle in handles:
+            self.driver.execute_cdp_cmd(
+                "Target.closeTarget", {"targetId": target_id(handle)}
+            )
+
     def restart_browser(self):
         logging.info("Restarting browser session...")
+        self.recoveries["restart"] += 1
+        metrics.inc("scraper_browser_recoveries_total", action="restart")
         self.close()
+        self._failures = 0
+        self._browser_context = None
         self._initialize_browser()
+
+
+def chrome_processes(pid=None):
+    # Chrome processes started by pid (this process by default), at any depth.
+    count = 0
+    pending = _child_pids(pid or os.getpid())
+    while pending:
+        child = pending.pop()
+        try:
+            with open(f"/proc/{child}/comm") as comm:
+                name = comm.read().strip()
+        except OSError:
+            continue
+        if name.startswith("chrome") and name != "chromedriver":
+            count += 1
+        pending.extend(_child_pids(child))
+    return count
+
+
+def _process_rss(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _child_pids(pid):
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
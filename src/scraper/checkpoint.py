@@ -0,0 +1,142 @@
+import array
+import json
+import logging
+import os
+import re
+import struct
+import sys
+import time
+import uuid
+import zlib
+
+MAGIC = b"SCKP\x01"
+_LENGTH = struct.Struct(">I")
+
+
+def _pack_fingerprints(fingerprints):
+    packed = array.array("Q", fingerprints)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_fingerprints(data):
+    packed = array.array("Q")
+    packed.frombytes(data)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+
+def write_checkpoint(path, job, state, fingerprints):
+    # Layout: magic, length of the header, the header as zlib-compressed JSON
+    # (job payload, counters, frontier, files), then the fingerprints of
+    # every URL seen as little-endian 64-bit integers. Fingerprints are
+    # random, so compressing them would only cost time. The file holds the
+    # job's bearer token, so only its owner may read it.
+    header = zlib.compress(
+        json.dumps({"job": job, "state": state}, separators=(",", ":")).encode(), 1
+    )
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, "wb") as file:
+        file.write(MAGIC)
+        file.write(_LENGTH.pack(len(header)))
+        file.write(header)
+        file.write(_pack_fingerprints(fingerprints))
+        size = file.tell()
+    os.replace(temporary, path)
+    return size
+
+
+def read_checkpoint(path, fingerprints=True):
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a checkpoint: {path}")
+        (length,) = _LENGTH.unpack(file.read(_LENGTH.size))
+        header = json.loads(zlib.decompress(file.read(length)))
+        seen = _unpack_fingerprints(file.read()) if fingerprints else None
+    return header["job"], header["state"], seen
+
+
+class Checkpoint:
+    # Checkpoint of one analysis, rewritten by WebScraper every interval
+    # committed pages and removed once the analysis has been reported.
+    def __init__(self, path, job, interval=5):
+        self.path = path
+        self.job = job
+        self.interval = interval
+        self.writes = 0
+        self.write_seconds = 0.0
+        self.last_size = 0
+
+    def load(self):
+        # Returns (state, fingerprints), or None without a usable checkpoint.
+        if not os.path.exists(self.path):
+            return None
+        try:
+            job, state, fingerprints = read_checkpoint(self.path)
+        except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if job.get("analysisId") != self.job.get("analysisId"):
+            logging.warning(f"Ignoring checkpoint {self.path} of another analysis")
+            return None
+        return state, fingerprints
+
+    def save(self, state, fingerprints):
+        started = time.perf_counter()
+        self.last_size = write_checkpoint(self.path, self.job, state, fingerprints)
+        self.writes += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "mean_write_ms": (
+                self.write_seconds / self.writes * 1000 if self.writes else 0.0
+            ),
+            "bytes": self.last_size,
+        }
+
+
+class CheckpointStore:
+    def __init__(self, directory="./checkpoints", interval=5):
+        self.directory = directory
+        self.interval = interval
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        interval = int(os.getenv("CHECKPOINT_INTERVAL", "0"))
+        if interval <= 0:
+            return None
+        return cls(os.getenv("CHECKPOINT_DIR", "./checkpoints"), interval)
+
+    def path(self, analysis_id):
+        name = re.sub(r"[^\w.-]", "_", analysis_id)
+        return os.path.join(self.directory, f"{name}.ckpt")
+
+    def checkpoint(self, analysis_id, job):
+        return Checkpoint(self.path(analysis_id), job, self.interval)
+
+    def unfinished(self):
+        # Job payloads of the analyses that have a checkpoint left behind.
+        jobs = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".ckpt"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                job, _, _ = read_checkpoint(path, fingerprints=False)
+            except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+                logging.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+                continue
+            jobs.append(job)
+        return jobs
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+
+import aiohttp
+
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+# Responses meaning the request was not processed, so even a POST may be
+# sent again.
+REJECTED_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "PUT"}
+
+
+class ConnectorError(Exception):
+    pass
+
+
+class ConnectorClient:
+    def __init__(
+        self,
+        base_url,
+        timeout=30,
+        retries=3,
+        backoff=0.5,
+        max_connections=20,
+        write_interval=1.0,
+        report_batch_size=20,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.write_interval = write_interval
+        self.report_batch_size = report_batch_size
+
+        self._write_lock = threading.Lock()
+        self._pending_writes = {}
+        self._pending_reports = {}
+        # Streamed files whose partial report failed, resent with the summary.
+        self._undelivered = {}
+        self._write_handle = None
+        self._inflight = set()
+
+        # All network I/O happens on a private event loop, so the crawl thread
+        # only blocks for lookups it actually needs an answer to.
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="connector-client", daemon=True
+        )
+        self._thread.start()
+        self._session = self._call(self._create_session())
+
+    @classmethod
+    def from_env(cls):
+        address = os.getenv("CONNECTOR_ADDRESS")
+        port = os.getenv("CONNECTOR_PORT")
+        return cls(
+            f"http://{address}:{port}",
+            timeout=float(os.getenv("CONNECTOR_TIMEOUT", "30")),
+            retries=int(os.getenv("CONNECTOR_RETRIES", "3")),
+            write_interval=float(os.getenv("CONNECTOR_WRITE_INTERVAL", "1.0")),
+            report_batch_size=int(os.getenv("CONNECTOR_REPORT_BATCH_SIZE", "20")),
+        )
+
+    def find_predictions(self, model, links, headers):
+        try:
+            status, body = self._call(
+                self._request(
+                    "GET", f"/predictions/model/{model}", {"links": links}, headers
+                )
+            )
+        except ConnectorError as exc:
+            logging.error(f"Request failed: {exc}")
+            return None
+
+        if status != 200:
+            logging.error(f"Error response: {status}, Body: {body}")
+            return None
+
+        try:
+            response_data = json.loads(body)
+        except ValueError:
+            logging.error(f"Invalid prediction response: {body}")
+            return None
+        if not isinstance(response_data, list):
+            logging.info("Response body is not a list.")
+            return None
+
+        predictions = {}
+        for item in response_data:
+            predictions.setdefault(item["link"], item)
+        logging.info(f"Received model predictions for {len(predictions)} links.")
+        return predictions
+
+    def update_predictions(self, analysis_id, prediction_results, headers):
+        # Write-behind: results for the same analysis are merged and sent in a
+        # single PUT after write_interval seconds.
+        key = (analysis_id, headers.get("Authorization"))
+        with self._write_lock:
+            _, results = self._pending_writes.setdefault(key, (dict(headers), []))
+            results.extend(prediction_results)
+        self._loop.call_soon_threadsafe(self._schedule_write)
+
+    def stream_files(self, analysis_id, files, headers):
+        # Files are posted as partial reports in batches of report_batch_size,
+        # or after write_interval seconds, whichever comes first.
+        key = (analysis_id, headers.get("Authorization"))
+        with self._write_lock:
+            report_headers, pending = self._pending_reports.setdefault(
+                key, (dict(headers), [])
+            )
+            pending.extend(files)
+            if len(pending) >= self.report_batch_size:
+                del self._pending_reports[key]
+            else:
+                pending = None
+        if pending is not None:
+            self._loop.call_soon_threadsafe(
+                self._start_task,
+                self._post_partial_report(analysis_id, report_headers, pending),
+            )
+        else:
+            self._loop.call_soon_threadsafe(self._schedule_write)
+
+    def complete_report(self, analysis_id, total_files, headers):
+        # Sent once every streamed file has been delivered or has failed;
+        # files of failed partial reports are sent along with the summary.
+        self.flush()
+        with self._write_lock:
+            undelivered = self._undelivered.pop(
+                (analysis_id, headers.get("Authorization")), []
+            )
+        if undelivered:
+            logging.warning(
+                f"Resending {len(undelivered)} files of analysis {analysis_id} "
+                "with the summary"
+            )
+        body = {
+            "analysisId": analysis_id,
+            "files": undelivered,
+            "completed": True,
+            "totalFiles": total_files,
+        }
+        return self._post_report(body, headers)
+
+    def undelivered(self, analysis_id, headers):
+        # Files of failed partial reports that have not been resent yet.
+        with self._write_lock:
+            return list(
+                self._undelivered.get((analysis_id, headers.get("Authorization")), [])
+            )
+
+    def send_undelivered(self, analysis_id, headers):
+        # Sends the files of failed partial reports once more, without
+        # completing the analysis, for workers of a shared crawl that do not
+        # send the completion report. Files failing again are dropped; their
+        # number is returned so they are not counted as reported.
+        self.flush()
+        key = (analysis_id, headers.get("Authorization"))
+        with self._write_lock:
+            files = self._undelivered.pop(key, [])
+        if not files:
+            return 0
+        logging.warning(f"Resending {len(files)} files of analysis {analysis_id}")
+        self._call(self._post_partial_report(analysis_id, dict(headers), files))
+        with self._write_lock:
+            lost = self._undelivered.pop(key, [])
+        if lost:
+            logging.error(
+                f"Could not deliver {len(lost)} files of analysis {analysis_id}"
+            )
+        return len(lost)
+
+    def send_report(self, analysis_id, files, headers):
+        body = {"analysisId": analysis_id, "files": files}
+        return self._post_report(body, headers)
+
+    def _post_report(self, body, headers):
+        try:
+            status, text = self._call(
+                self._request("POST", "/scraper/report", body, headers)
+            )
+        except ConnectorError as exc:
+            logging.error(f"Request failed: {exc}")
+            return False
+
+        if status == 200:
+            logging.info("Successfully sent report data")
+            return True
+        logging.error(f"Error response: {status}, Body: {text}")
+        return False
+
+    def flush(self):
+        self._call(self._drain())
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self.flush()
+        self._call(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _create_session(self):
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def _request(self, method, path, body, headers):
+        # Reports are POSTs that add files, so they are only retried when the
+        # connector was never reached or rejected them unprocessed; a timeout
+        # or server error may follow an accepted report.
+        url = f"{self.base_url}{path}"
+        idempotent = method in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._session.request(
+                    method, url, json=body, headers=headers
+                ) as response:
+                    text = await response.text()
+                    if idempotent:
+                        retry = (
+                            response.status in RETRYABLE_STATUSES
+                            or response.status >= 500
+                        )
+                    else:
+                        retry = response.status in REJECTED_STATUSES
+                    if not retry or attempt == self.retries:
+                        return response.status, text
+                    logging.info(f"{method} {path} returned {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                unsent = isinstance(exc, aiohttp.ClientConnectorError)
+                if attempt == self.retries or not (idempotent or unsent):
+                    raise ConnectorError(f"{method} {path} failed: {exc}") from exc
+                logging.info(f"{method} {path} failed: {exc}")
+            # Exponential backoff with full jitter.
+            await asyncio.sleep(random.uniform(0, self.backoff * 2**attempt))
+
+    def _schedule_write(self):
+        if self._write_handle is None:
+            self._write_handle = self._loop.call_later(
+                self.write_interval, self._start_write
+            )
+
+    def _start_write(self):
+        self._write_handle = None
+        self._start_task(self._send_pending_writes())
+
+    def _start_task(self, coroutine):
+        task = self._loop.create_task(coroutine)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send_pending_writes(self):
+        with self._write_lock:
+            pending, self._pending_writes = self._pending_writes, {}
+            reports, self._pending_reports = self._pending_reports, {}
+        await asyncio.gather(
+            *(
+                self._put_predictions(analysis_id, headers, results)
+                for (analysis_id, _), (headers, results) in pending.items()
+            ),
+            *(
+                self._post_partial_report(analysis_id, headers, files)
+                for (analysis_id, _), (headers, files) in reports.items()
+            ),
+        )
+
+    async def _put_predictions(self, analysis_id, headers, results):
+        logging.info(f"Updating analysis {analysis_id} with {len(results)} results")
+        try:
+            status, text = await self._request(
+                "PUT",
+                f"/analyses/{analysis_id}/predictions",
+                {"predictionResults": results},
+                headers,
+            )
+        except ConnectorError as exc:
+            logging.error(f"Request failed: {exc}")
+            return
+
+        if status == 200:
+            logging.info("Successfully updated analysis")
+        else:
+            logging.error(f"Error response: {status}, Body: {text}")
+
+    async def _post_partial_report(self, analysis_id, headers, files):
+        logging.info(f"Reporting {len(files)} files of analysis {analysis_id}")
+        body = {"analysisId": analysis_id, "files": files, "completed": False}
+        try:
+            status, text = await self._request("POST", "/scraper/report", body, headers)
+        except ConnectorError as exc:
+            logging.error(f"Request failed: {exc}")
+        else:
+            if status == 200:
+                return
+            logging.error(f"Error response: {status}, Body: {text}")
+        with self._write_lock:
+            self._undelivered.setdefault(
+                (analysis_id, headers.get("Authorization")), []
+            ).extend(files)
+
+    async def _drain(self):
+        if self._write_handle is not None:
+            self._write_handle.cancel()
+            self._write_handle = None
+        await self._send_pending_writes()
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight))
@@ -0,0 +1,435 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from .frontier import url_fingerprint
+
+QUEUED, LEASED, DONE = 0, 1, 2
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _signed(fingerprint):
+    # SQLite integers are signed 64-bit.
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+class CrawlState(ABC):
+    # Crawl state of one analysis shared by every worker crawling it: the
+    # frontier, the fingerprints of every URL ever queued, and the page and
+    # file counters with their limits. Pages and file slots are leased, so
+    # the work of a worker that dies is picked up by the others once its
+    # leases expire. Every method must be atomic across workers; a Redis
+    # backend would implement them as Lua scripts over a sorted set per
+    # analysis.
+    poll_interval = 1.0
+
+    @abstractmethod
+    def push(self, url, depth, score=0.0):
+        # Queues url unless it has been queued before; returns whether it
+        # was new.
+        raise NotImplementedError
+
+    def push_many(self, items):
+        # Queues (url, depth, score) items; returns the new URLs.
+        return [url for url, depth, score in items if self.push(url, depth, score)]
+
+    @abstractmethod
+    def claim(self):
+        # Leases the best queued URL, or an expired lease, and returns
+        # (url, depth); None while nothing is claimable or the page or file
+        # budget is spent. Only first leases count towards max_pages.
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, url):
+        # Ends the lease of a visited page, after its links were pushed.
+        raise NotImplementedError
+
+    @abstractmethod
+    def has_work(self):
+        # Whether any page is leased or claimable and files are still wanted,
+        # so a worker with nothing to claim should wait for the others rather
+        # than stop.
+        raise NotImplementedError
+
+    @abstractmethod
+    def reserve_file(self):
+        # Leases one of the max_files slots and returns its token; None while
+        # files found plus slots leased reach max_files.
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_file(self, token, found):
+        raise NotImplementedError
+
+    @abstractmethod
+    def files_left(self):
+        # Whether fewer than max_files files have been found.
+        raise NotImplementedError
+
+    @abstractmethod
+    def join(self):
+        # Registers the worker; it stays registered while it is alive, even
+        # when it claims no pages for a while.
+        raise NotImplementedError
+
+    @abstractmethod
+    def leave(self, reported_files):
+        # Adds the files this worker reported. Once no other worker is
+        # crawling any more, marks the analysis completed and returns the
+        # files reported by all workers, i.e. this worker should send the
+        # completion report; None before, and None if another worker already
+        # completed it. Workers joining a completed analysis find no work
+        # instead of crawling it again.
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish(self):
+        # Drops the frontier of a completed analysis; its counters are kept.
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self):
+        raise NotImplementedError
+
+
+class SqliteCrawlState(CrawlState):
+    # Embedded backend for workers on one host, e.g. the worker processes of
+    # several API containers sharing a volume. One database holds any number
+    # of analyses. Every operation is a single IMMEDIATE transaction, which
+    # serializes claims across processes.
+    def __init__(
+        self,
+        path,
+        analysis_id,
+        max_pages,
+        max_files,
+        owner=None,
+        lease_seconds=600,
+        poll_interval=1.0,
+    ):
+        self.path = path
+        self.analysis_id = analysis_id
+        self.owner = owner or worker_name()
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._left = threading.Event()
+        self._heartbeat_thread = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    analysis_id TEXT PRIMARY KEY,
+                    max_pages INTEGER NOT NULL,
+                    max_files INTEGER NOT NULL,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    files INTEGER NOT NULL DEFAULT 0,
+                    reported INTEGER NOT NULL DEFAULT 0,
+                    completed INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS frontier (
+                    id INTEGER PRIMARY KEY,
+                    analysis_id TEXT NOT NULL,
+                    fingerprint INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    score REAL NOT NULL,
+                    state INTEGER NOT NULL,
+                    owner TEXT,
+                    lease_expires REAL,
+                    UNIQUE (analysis_id, fingerprint)
+                );
+                CREATE INDEX IF NOT EXISTS frontier_queue
+                    ON frontier(analysis_id, state, score DESC, id);
+                CREATE TABLE IF NOT EXISTS file_leases (
+                    token TEXT PRIMARY KEY,
+                    analysis_id TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    lease_expires REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS workers (
+                    analysis_id TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    seen REAL NOT NULL,
+                    PRIMARY KEY (analysis_id, owner)
+                );
+                """)
+        finally:
+            connection.close()
+        with self._transaction() as connection:
+            # Limits are set by the first worker; later ones join its crawl.
+            connection.execute(
+                "INSERT OR IGNORE INTO analyses (analysis_id, max_pages, max_files) "
+                "VALUES (?, ?, ?)",
+                (analysis_id, max_pages, max_files),
+            )
+
+    @classmethod
+    def from_env(cls, analysis_id, max_pages, max_files):
+        path = os.getenv("CRAWL_STATE_DB", "")
+        if not path:
+            return None
+        return cls(
+            path,
+            analysis_id,
+            max_pages,
+            max_files,
+            lease_seconds=float(os.getenv("CRAWL_STATE_LEASE_SECONDS", "600")),
+        )
+
+    def push(self, url, depth, score=0.0):
+        return bool(self.push_many([(url, depth, score)]))
+
+    def push_many(self, items):
+        new_urls = []
+        with self._transaction() as connection:
+            if self._counters(connection)[4]:
+                return new_urls
+            for url, depth, score in items:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO frontier "
+                    "(analysis_id, fingerprint, url, depth, score, state) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.analysis_id,
+                        _signed(url_fingerprint(url)),
+                        url,
+                        depth,
+                        score,
+                        QUEUED,
+                    ),
+                )
+                if cursor.rowcount:
+                    new_urls.append(url)
+        return new_urls
+
+    def claim(self):
+        now = time.time()
+        with self._transaction() as connection:
+            self._heartbeat(connection, now)
+            row = connection.execute(
+                "SELECT id, url, depth FROM frontier "
+                "WHERE analysis_id = ? AND state = ? AND lease_expires < ? "
+                "ORDER BY id LIMIT 1",
+                (self.analysis_id, LEASED, now),
+            ).fetchone()
+            pages, max_pages, files, max_files, completed = self._counters(connection)
+            if completed or files >= max_files:
+                return None
+            if row is None:
+                if pages >= max_pages:
+                    return None
+                row = connection.execute(
+                    "SELECT id, url, depth FROM frontier "
+                    "WHERE analysis_id = ? AND state = ? "
+                    "ORDER BY score DESC, id LIMIT 1",
+                    (self.analysis_id, QUEUED),
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute(
+                    "UPDATE analyses SET pages = pages + 1 WHERE analysis_id = ?",
+                    (self.analysis_id,),
+                )
+            connection.execute(
+                "UPDATE frontier SET state = ?, owner = ?, lease_expires = ? "
+                "WHERE id = ?",
+                (LEASED, self.owner, now + self.lease_seconds, row[0]),
+            )
+        return row[1], row[2]
+
+    def complete(self, url):
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE frontier SET state = ?, owner = NULL, lease_expires = NULL "
+                "WHERE analysis_id = ? AND fingerprint = ?",
+                (DONE, self.analysis_id, _signed(url_fingerprint(url))),
+            )
+
+    def has_work(self):
+        with self._transaction() as connection:
+            pages, max_pages, files, max_files, completed = self._counters(connection)
+            if completed or files >= max_files:
+                return False
+            states = (LEASED, QUEUED) if pages < max_pages else (LEASED,)
+            row = connection.execute(
+                "SELECT 1 FROM frontier WHERE analysis_id = ? "
+                f"AND state IN ({', '.join('?' * len(states))}) LIMIT 1",
+                (self.analysis_id, *states),
+            ).fetchone()
+        return row is not None
+
+    def reserve_file(self):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM file_leases WHERE analysis_id = ? AND lease_expires < ?",
+                (self.analysis_id, now),
+            )
+            _, _, files, max_files, completed = self._counters(connection)
+            (leased,) = connection.execute(
+                "SELECT COUNT(*) FROM file_leases WHERE analysis_id = ?",
+                (self.analysis_id,),
+            ).fetchone()
+            if completed or files + leased >= max_files:
+                return None
+            token = uuid.uuid4().hex
+            connection.execute(
+                "INSERT INTO file_leases (token, analysis_id, owner, lease_expires) "
+                "VALUES (?, ?, ?, ?)",
+                (token, self.analysis_id, self.owner, now + self.lease_seconds),
+            )
+        return token
+
+    def release_file(self, token, found):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM file_leases WHERE token = ?", (token,))
+            if found:
+                connection.execute(
+                    "UPDATE analyses SET files = files + 1 WHERE analysis_id = ?",
+                    (self.analysis_id,),
+                )
+
+    def files_left(self):
+        with self._transaction() as connection:
+            _, _, files, max_files, completed = self._counters(connection)
+        return not completed and files < max_files
+
+    def join(self):
+        with self._transaction() as connection:
+            self._heartbeat(connection, time.time())
+        # Downloads and lookups may keep a worker from claiming pages for
+        # longer than a lease, so it keeps beating until it leaves.
+        self._left.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._beat, name="crawl-state-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def _beat(self):
+        while not self._left.wait(max(0.05, self.lease_seconds / 4)):
+            try:
+                with self._transaction() as connection:
+                    self._heartbeat(connection, time.time())
+            except sqlite3.Error as e:
+                logging.warning(f"Crawl state heartbeat failed: {e}")
+
+    def leave(self, reported_files):
+        # Pages still leased by this worker become claimable at once; they
+        # were already counted when first claimed.
+        self._left.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE analyses SET reported = reported + ? WHERE analysis_id = ?",
+                (reported_files, self.analysis_id),
+            )
+            connection.execute(
+                "UPDATE frontier SET lease_expires = 0 "
+                "WHERE analysis_id = ? AND state = ? AND owner = ?",
+                (self.analysis_id, LEASED, self.owner),
+            )
+            connection.execute(
+                "DELETE FROM file_leases WHERE analysis_id = ? AND owner = ?",
+                (self.analysis_id, self.owner),
+            )
+            connection.execute(
+                "DELETE FROM workers WHERE analysis_id = ? AND owner = ?",
+                (self.analysis_id, self.owner),
+            )
+            # Workers silent for longer than a lease count as gone.
+            (others,) = connection.execute(
+                "SELECT COUNT(*) FROM workers WHERE analysis_id = ? AND seen >= ?",
+                (self.analysis_id, now - self.lease_seconds),
+            ).fetchone()
+            if others:
+                return None
+            row = connection.execute(
+                "SELECT reported, completed FROM analyses WHERE analysis_id = ?",
+                (self.analysis_id,),
+            ).fetchone()
+            if row is None or row[1]:
+                return None
+            connection.execute(
+                "UPDATE analyses SET completed = 1 WHERE analysis_id = ?",
+                (self.analysis_id,),
+            )
+        return row[0]
+
+    def finish(self):
+        with self._transaction() as connection:
+            for table in ("frontier", "file_leases", "workers"):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE analysis_id = ?", (self.analysis_id,)
+                )
+
+    def stats(self):
+        with self._transaction() as connection:
+            pages, max_pages, files, max_files, completed = self._counters(connection)
+            states = dict(
+                connection.execute(
+                    "SELECT state, COUNT(*) FROM frontier "
+                    "WHERE analysis_id = ? GROUP BY state",
+                    (self.analysis_id,),
+                ).fetchall()
+            )
+            (workers,) = connection.execute(
+                "SELECT COUNT(*) FROM workers WHERE analysis_id = ?",
+                (self.analysis_id,),
+            ).fetchone()
+        return {
+            "pages": pages,
+            "max_pages": max_pages,
+            "files": files,
+            "max_files": max_files,
+            "queued": states.get(QUEUED, 0),
+            "leased": states.get(LEASED, 0),
+            "done": states.get(DONE, 0),
+            "workers": workers,
+            "completed": bool(completed),
+        }
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _counters(self, connection):
+        return connection.execute(
+            "SELECT pages, max_pages, files, max_files, completed FROM analyses "
+            "WHERE analysis_id = ?",
+            (self.analysis_id,),
+        ).fetchone()
+
+    def _heartbeat(self, connection, now):
+        connection.execute(
+            "INSERT OR REPLACE INTO workers (analysis_id, owner, seen) "
+            "VALUES (?, ?, ?)",
+            (self.analysis_id, self.owner, now),
+        )
@@ -0,0 +1,145 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+
+class DownloadTimeout(Exception):
+    pass
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+def _exit_with_parent(parent, interval):
+    # Being in its own group, the worker survives the job worker being
+    # killed, e.g. on the job's time limit; once it is orphaned, it kills
+    # itself and the processes it spawned.
+    while os.getppid() == parent:
+        time.sleep(interval)
+    os.killpg(0, signal.SIGKILL)
+
+
+def _worker_main(connection, parent_poll_interval=1.0):
+    # Own process group, so a timeout kills yt-dlp together with the ffmpeg
+    # processes it spawned.
+    parent = os.getppid()
+    os.setsid()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    threading.Thread(
+        target=_exit_with_parent,
+        args=(parent, parent_poll_interval),
+        name="parent-watch",
+        daemon=True,
+    ).start()
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        function, args = task
+        try:
+            connection.send((True, function(*args)))
+        except Exception as e:
+            connection.send((False, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_connection,), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.tasks = 0
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.connection.close()
+
+
+class ProcessDownloadEngine:
+    def __init__(self, workers=2, max_tasks_per_worker=100, start_method="spawn"):
+        self.workers = workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context(start_method)
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._closed = False
+        self.spawned = 0
+        self.killed = 0
+
+    def run(self, function, args, timeout):
+        # Runs function(*args) in a reusable worker process. The worker is
+        # killed once the wall-clock deadline passes.
+        with self._slots:
+            worker = self._take_worker()
+            try:
+                worker.connection.send((function, args))
+                if not worker.connection.poll(timeout):
+                    self._discard(worker)
+                    worker = None
+                    raise DownloadTimeout(f"Task exceeded {timeout} seconds")
+                succeeded, value = worker.connection.recv()
+            except (EOFError, OSError) as e:
+                if worker is not None:
+                    self._discard(worker)
+                    worker = None
+                raise WorkerCrashed(f"Download worker died: {e}") from e
+            finally:
+                if worker is not None:
+                    self._return_worker(worker)
+
+        if not succeeded:
+            raise RuntimeError(value)
+        return value
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+    def _take_worker(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.spawned += 1
+        return _Worker(self._context)
+
+    def _return_worker(self, worker):
+        worker.tasks += 1
+        with self._lock:
+            if not self._closed and worker.tasks < self.max_tasks_per_worker:
+                self._idle.append(worker)
+                return
+        worker.stop()
+
+    def _discard(self, worker):
+        with self._lock:
+            self.killed += 1
+        logging.info(f"Killing download worker {worker.process.pid}")
+        worker.kill()
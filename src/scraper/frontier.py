@@ -0,0 +1,189 @@
+import hashlib
+import heapq
+import itertools
+import tempfile
+from collections import deque
+
+
+def url_fingerprint(url):
+    return int.from_bytes(
+        hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class _SpillFile:
+    # Append-only FIFO of (url, depth) records kept on disk.
+    def __init__(self, spill_dir=None):
+        self._file = tempfile.TemporaryFile(mode="w+b", dir=spill_dir)
+        self._read_offset = 0
+        self._write_offset = 0
+        self.count = 0
+
+    def append(self, url, depth):
+        self._file.seek(self._write_offset)
+        self._file.write(f"{depth}\t{url}\n".encode("utf-8"))
+        self._write_offset = self._file.tell()
+        self.count += 1
+
+    def read(self, limit):
+        self._file.seek(self._read_offset)
+        items = []
+        while len(items) < limit and self.count:
+            depth, url = (
+                self._file.readline().decode("utf-8").rstrip("\n").split("\t", 1)
+            )
+            items.append((url, int(depth)))
+            self.count -= 1
+        self._read_offset = self._file.tell()
+        if not self.count:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_offset = self._write_offset = 0
+        return items
+
+    def peek_all(self):
+        self._file.seek(self._read_offset)
+        for _ in range(self.count):
+            depth, url = (
+                self._file.readline().decode("utf-8").rstrip("\n").split("\t", 1)
+            )
+            yield url, int(depth)
+
+    def close(self):
+        self._file.close()
+
+
+class CrawlFrontier:
+    def __init__(self, memory_budget=100_000, spill_dir=None):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self._queue = deque()
+        self._spill = None
+        # Fingerprints of every URL ever enqueued, i.e. queued or visited.
+        self._seen = set()
+
+    def push(self, url, depth, score=0.0):
+        # URLs leave in FIFO order; score is ignored.
+        fingerprint = url_fingerprint(url)
+        if fingerprint in self._seen:
+            return False
+        self._seen.add(fingerprint)
+        self._append(url, depth)
+        return True
+
+    def _append(self, url, depth):
+        if self._spill is not None and self._spill.count:
+            self._spill.append(url, depth)
+        elif len(self._queue) >= self.memory_budget:
+            if self._spill is None:
+                self._spill = _SpillFile(self.spill_dir)
+            self._spill.append(url, depth)
+        else:
+            self._queue.append((url, depth))
+
+    def pop(self):
+        if not self._queue and self._spill is not None and self._spill.count:
+            self._queue.extend(self._spill.read(max(1, self.memory_budget // 2)))
+        return self._queue.popleft()
+
+    def seen(self, url):
+        return url_fingerprint(url) in self._seen
+
+    def __len__(self):
+        return len(self._queue) + (self._spill.count if self._spill else 0)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        yield from self._queue
+        if self._spill is not None:
+            yield from list(self._spill.peek_all())
+
+    def entries(self, limit):
+        # The first limit (url, depth, score) entries, for checkpoints; the
+        # spill file is only read when the queue holds fewer.
+        entries = [
+            (url, depth, 0.0) for url, depth in itertools.islice(self._queue, limit)
+        ]
+        if len(entries) < limit and self._spill is not None:
+            spilled = itertools.islice(self._spill.peek_all(), limit - len(entries))
+            entries.extend((url, depth, 0.0) for url, depth in spilled)
+        return entries
+
+    def fingerprints(self):
+        return list(self._seen)
+
+    def restore(self, entries, fingerprints):
+        # Replaces the contents with those of a checkpoint.
+        self.close()
+        self._queue.clear()
+        self._seen = set(fingerprints)
+        for url, depth, _ in entries:
+            self._append(url, depth)
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class PriorityFrontier:
+    # Best-first frontier: the URL with the highest score is popped first,
+    # ties in FIFO order. Past the memory budget the lowest scored URLs are
+    # dropped rather than spilled, since they would not be crawled anyway.
+    def __init__(self, memory_budget=100_000):
+        self.memory_budget = memory_budget
+        self._heap = []
+        self._sequence = itertools.count()
+        self._seen = set()
+        self.dropped = 0
+
+    def push(self, url, depth, score=0.0):
+        fingerprint = url_fingerprint(url)
+        if fingerprint in self._seen:
+            return False
+        self._seen.add(fingerprint)
+
+        heapq.heappush(self._heap, (-score, next(self._sequence), url, depth))
+        if len(self._heap) >= 2 * self.memory_budget:
+            self.dropped += len(self._heap) - self.memory_budget
+            self._heap = heapq.nsmallest(self.memory_budget, self._heap)
+        return True
+
+    def pop(self):
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+    def seen(self, url):
+        return url_fingerprint(url) in self._seen
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for _, _, url, depth in sorted(self._heap):
+            yield url, depth
+
+    def entries(self, limit):
+        # The limit best (url, depth, score) entries, for checkpoints.
+        return [
+            (url, depth, -score)
+            for score, _, url, depth in heapq.nsmallest(limit, self._heap)
+        ]
+
+    def fingerprints(self):
+        return list(self._seen)
+
+    def restore(self, entries, fingerprints):
+        self._seen = set(fingerprints)
+        self._heap = [
+            (-score, next(self._sequence), url, depth) for url, depth, score in entries
+        ]
+        heapq.heapify(self._heap)
+
+    def close(self):
+        self._heap = []
@@ -1,5 +1,6 @@
 import logging
-import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
 from urllib.parse import urljoin
 
 from selenium.common.exceptions import (
@@ -8,12 +9,85 @@ from selenium.common.exceptions import (
 )
 from selenium.webdriver.common.by import By
 
+# Collects every URL of interest in a single WebDriver round trip. Reading the
+# href/src properties returns URLs already resolved against the document base.
+EXTRACTION_SCRIPT = """
+var result = {links: [], anchorText: {}, iframes: [], media: [], metaMedia: []};
+var i, nodes, text;
+nodes = document.getElementsByTagName("a");
+for (i = 0; i < nodes.length; i++) {
+    // SVG anchors expose an SVGAnimatedString instead of a URL.
+    if (nodes[i].hasAttribute("href") && typeof nodes[i].href === "string") {
+        result.links.push(nodes[i].href);
+        text = (nodes[i].textContent || nodes[i].title || "").trim();
+        if (text && !(nodes[i].href in result.anchorText)) {
+            result.anchorText[nodes[i].href] = text.slice(0, 200);
+        }
+    }
+}
+nodes = document.getElementsByTagName("iframe");
+for (i = 0; i < nodes.length; i++) result.iframes.push(nodes[i].src);
+nodes = document.querySelectorAll("audio, video, source");
+for (i = 0; i < nodes.length; i++) {
+    result.media.push(nodes[i].src);
+    if (nodes[i].currentSrc) result.media.push(nodes[i].currentSrc);
+}
+nodes = document.querySelectorAll(
+    "meta[property^='og:audio'], meta[property^='og:video']"
+);
+for (i = 0; i < nodes.length; i++) {
+    var property = nodes[i].getAttribute("property");
+    if (/^og:(audio|video)(:url|:secure_url)?$/.test(property)) {
+        var content = nodes[i].getAttribute("content");
+        try {
+            if (content) result.metaMedia.push(new URL(content, document.baseURI).href);
+        } catch (e) {}
+    }
+}
+return result;
+"""
+
+
+@dataclass
+class PageLinks:
+    links: Set[str] = field(default_factory=set)
+    # Text of the first anchor pointing at each link, where it has any.
+    anchor_text: Dict[str, str] = field(default_factory=dict)
+    iframes: Set[str] = field(default_factory=set)
+    media: Set[str] = field(default_factory=set)
+    meta_media: Set[str] = field(default_factory=set)
+    # Manifests and audio files seen on the network while the page was
+    # rendered, and video files, which may well be ads.
+    sniffed_media: List[str] = field(default_factory=list)
+    sniffed_video: List[str] = field(default_factory=list)
+
 
 class LinkExtractor:
     def __init__(self, browser_session):
         self.browser = browser_session
 
     def extract_links(self, base_url):
+        return self.extract_page(base_url).links
+
+    def extract_page(self, base_url):
+        try:
+            result = self.browser.execute_script(EXTRACTION_SCRIPT)
+        except WebDriverException as e:
+            logging.warning(f"Script extraction failed, using anchor lookup: {e}")
+            result = None
+
+        if not isinstance(result, dict):
+            return PageLinks(links=self._extract_anchor_links(base_url))
+
+        return PageLinks(
+            links=_resolve(base_url, result.get("links")),
+            anchor_text=_anchor_text(base_url, result.get("anchorText")),
+            iframes=_resolve(base_url, result.get("iframes")),
+            media=_resolve(base_url, result.get("media")),
+            meta_media=_resolve(base_url, result.get("metaMedia")),
+        )
+
+    def _extract_anchor_links(self, base_url):
         try:
             anchors = self.browser.get_elements(By.TAG_NAME, "a")
         except WebDriverException as e:
@@ -35,3 +109,19 @@ class LinkExtractor:
                 continue
 
         return links
+
+
+def _anchor_text(base_url, anchor_text):
+    if not isinstance(anchor_text, dict):
+        return {}
+    return {
+        urljoin(base_url, url): text
+        for url, text in anchor_text.items()
+        if url and isinstance(text, str)
+    }
+
+
+def _resolve(base_url, urls):
+    return {
+        urljoin(base_url, url) for url in urls or () if url and isinstance(url, str)
+    }
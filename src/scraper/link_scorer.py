@@ -0,0 +1,77 @@
+import re
+
+from .media_prefilter import matching_extractor
+
+# Path segments of pages that usually carry a single episode or video.
+MEDIA_PATH = re.compile(
+    r"/(episodes?|watch|videos?|podcasts?|audio|listen|play(er)?|clips?|embed"
+    r"|shows?|media|stream|recordings?|sermons?|talks?)(/|\?|$|[-_.]\d)"
+    r"|\.(mp3|m4a|aac|ogg|opus|wav|flac|mp4|webm|m3u8|mpd)(\?|$)",
+    re.IGNORECASE,
+)
+# Navigation, legal and account pages rarely link to media.
+BORING_PATH = re.compile(
+    r"/(privacy|terms|legal|imprint|impressum|cookies?|about|contact|careers|jobs"
+    r"|login|log-in|signin|sign-in|signup|sign-up|register|account|cart|checkout"
+    r"|help|faq|support|press|sitemap)(/|\?|\.|$)"
+    r"|^(mailto|tel|javascript):",
+    re.IGNORECASE,
+)
+MEDIA_WORDS = re.compile(
+    r"\b(listen|watch|play|episodes?|videos?|podcasts?|trailer|stream|audio"
+    r"|interview|live)\b",
+    re.IGNORECASE,
+)
+BORING_WORDS = re.compile(
+    r"\b(privacy|terms|cookies?|log ?in|sign ?(in|up)|contact|careers|imprint"
+    r"|about us|newsletter)\b",
+    re.IGNORECASE,
+)
+
+DEFAULT_WEIGHTS = {
+    "extractor": 4.0,
+    "media_path": 2.0,
+    "boring_path": -3.0,
+    "media_words": 1.0,
+    "boring_words": -1.0,
+    "parent_yield": 2.0,
+    "depth": -0.25,
+}
+
+
+def media_signals(page_links):
+    # Number of kinds of media evidence found on a page.
+    return sum(
+        (
+            bool(page_links.media or page_links.meta_media),
+            bool(page_links.sniffed_media),
+            any(matching_extractor(iframe) for iframe in page_links.iframes),
+        )
+    )
+
+
+class LinkScorer:
+    # Estimates how likely a link leads to downloadable media; higher scores
+    # are crawled first by a PriorityFrontier.
+    def __init__(self, weights=None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    def parent_yield(self, page_links):
+        # Between 0 and 1; pages with media tend to link to more of it.
+        return media_signals(page_links) / 3
+
+    def score(self, url, depth, anchor_text="", parent_yield=0.0):
+        weights = self.weights
+        score = weights["depth"] * depth + weights["parent_yield"] * parent_yield
+        if matching_extractor(url) is not None:
+            score += weights["extractor"]
+        if MEDIA_PATH.search(url):
+            score += weights["media_path"]
+        elif BORING_PATH.search(url):
+            score += weights["boring_path"]
+        if anchor_text:
+            if MEDIA_WORDS.search(anchor_text):
+                score += weights["media_words"]
+            elif BORING_WORDS.search(anchor_text):
+                score += weights["boring_words"]
+        return score
@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+def media_key(info):
+    # Identifies media independently of the page it was found on, e.g.
+    # "Youtube:dQw4w9WgXcQ". Generic ids are derived from file names, so the
+    # URL identifies generic media instead.
+    if not info:
+        return None
+    if info.get("_type") in ("playlist", "multi_video") and info.get("entries"):
+        info = info["entries"][0]
+    extractor = info.get("extractor_key") or info.get("ie_key")
+    if extractor == "Generic":
+        url = info.get("webpage_url") or info.get("url")
+        return f"Generic:{url}" if url else None
+    media_id = info.get("id")
+    if not extractor or not media_id:
+        return None
+    return f"{extractor}:{media_id}"
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class MediaCache:
+    def __init__(self, cache_dir="./media_cache", max_bytes=10 * 1024**3):
+        # Files are stored once per content hash; media keys point at them.
+        # The index is shared by every process using the same directory.
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(cache_dir, "index.sqlite")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL REFERENCES blobs(hash)
+                );
+                CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs(last_used);
+                CREATE INDEX IF NOT EXISTS entries_hash ON entries(hash);
+                """)
+
+    @classmethod
+    def from_env(cls):
+        max_mb = int(os.getenv("MEDIA_CACHE_MAX_MB", "10240"))
+        if max_mb <= 0:
+            return None
+        return cls(
+            cache_dir=os.getenv("MEDIA_CACHE_DIR", "./media_cache"),
+            max_bytes=max_mb * 1024**2,
+        )
+
+    def lookup(self, key):
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT blobs.hash, blobs.path FROM entries "
+                "JOIN blobs ON blobs.hash = entries.hash WHERE entries.key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None and not os.path.exists(row[1]):
+                self._forget(connection, row[0])
+                row = None
+            if row is not None:
+                connection.execute(
+                    "UPDATE blobs SET last_used = ? WHERE hash = ?",
+                    (time.time(), row[0]),
+                )
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[1] if row is not None else None
+
+    def store(self, key, path):
+        # Adds a downloaded file to the cache under key (which may be None)
+        # and returns the cached copy.
+        content_hash = _file_hash(path)
+        extension = os.path.splitext(path)[1]
+        cached_path = os.path.join(
+            self.cache_dir, content_hash[:2], f"{content_hash}{extension}"
+        )
+        size = os.path.getsize(path)
+
+        if not os.path.exists(cached_path):
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            temporary = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+            _link_or_copy(path, temporary)
+            os.replace(temporary, cached_path)
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO blobs (hash, path, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (content_hash, cached_path, size, time.time()),
+            )
+            if key is not None:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, hash) VALUES (?, ?)",
+                    (key, content_hash),
+                )
+            evicted = self._evict(connection, keep=content_hash)
+
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+        return cached_path
+
+    def publish(self, cached_path, download_dir):
+        # Makes a cached file visible in download_dir under a new unique name,
+        # like a fresh download, so every page reporting the media gets a file
+        # of its own. The link is created under a temporary name and renamed,
+        # so readers never see a partial file.
+        extension = os.path.splitext(cached_path)[1]
+        target = os.path.join(download_dir, f"{uuid.uuid4()}{extension}")
+        temporary = f"{target}.tmp"
+        _link_or_copy(cached_path, temporary)
+        os.replace(temporary, target)
+        return os.path.basename(target)
+
+    def stats(self):
+        with self._connect() as connection:
+            files, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "files": files,
+                "bytes": size,
+            }
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self._index_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _evict(self, connection, keep):
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()
+        evicted = 0
+        rows = connection.execute(
+            "SELECT hash, path, size FROM blobs WHERE hash != ? ORDER BY last_used",
+            (keep,),
+        ).fetchall()
+        for content_hash, path, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning(f"Could not evict {path}: {e}")
+                continue
+            self._forget(connection, content_hash)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def _forget(self, connection, content_hash):
+        connection.execute("DELETE FROM entries WHERE hash = ?", (content_hash,))
+        connection.execute("DELETE FROM blobs WHERE hash = ?", (content_hash,))
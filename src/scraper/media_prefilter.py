@@ -0,0 +1,139 @@
+import functools
+import logging
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import yt_dlp
+
+_extractors = None
+_extractors_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4096)
+def matching_extractor(url):
+    # Name of the first dedicated yt-dlp extractor accepting the URL, ignoring
+    # the generic extractor that accepts everything. Links are scored and
+    # prefiltered, so results are cached.
+    global _extractors
+    if _extractors is None:
+        with _extractors_lock:
+            if _extractors is None:
+                _extractors = [
+                    extractor
+                    for extractor in yt_dlp.extractor.gen_extractor_classes()
+                    if extractor.ie_key() != "Generic"
+                ]
+    for extractor in _extractors:
+        if extractor.suitable(url):
+            return extractor.ie_key()
+    return None
+
+
+def path_pattern(url):
+    # Groups pages of the same kind: digits are masked and the last segment
+    # of nested paths is a wildcard, so /episode/12 and /episode/13 share a
+    # pattern while /about and /contact do not.
+    parts = urlsplit(url)
+    segments = [re.sub(r"\d+", "0", segment) for segment in parts.path.split("/")]
+    segments = [segment for segment in segments if segment]
+    if len(segments) > 1:
+        segments[-1] = "*"
+    return f"{parts.netloc}/{'/'.join(segments)}"
+
+
+def _has_media(info):
+    if not info:
+        return False
+    if info.get("_type") in ("playlist", "multi_video"):
+        return bool(info.get("entries"))
+    return bool(info.get("formats") or info.get("url"))
+
+
+class MediaPrefilter:
+    def __init__(
+        self,
+        probe,
+        negative_threshold=3,
+        miss_ratio=0.9,
+        decay=0.8,
+        reprobe_every=5,
+    ):
+        # probe(url) returns yt-dlp's extract_info(download=False) result, or
+        # None when yt-dlp finds nothing. A path pattern is skipped without a
+        # probe once negative_threshold probes of it were made and their
+        # decayed miss ratio reaches miss_ratio; every reprobe_every-th
+        # skipped page is probed anyway, so a pattern can recover.
+        self._probe = probe
+        self.negative_threshold = negative_threshold
+        self.miss_ratio = miss_ratio
+        self.decay = decay
+        self.reprobe_every = reprobe_every
+        self._lock = threading.Lock()
+        # Pattern -> [decayed misses, decayed probes, probes, skipped].
+        self._patterns = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def is_candidate(self, url, page_links=None):
+        extractor = matching_extractor(url)
+        if extractor is not None:
+            return self._hit("extractor", url, extractor)
+
+        if page_links is not None and page_links.sniffed_media:
+            return self._hit("network", url)
+
+        if page_links is not None and (
+            page_links.media
+            or page_links.meta_media
+            or any(matching_extractor(iframe) for iframe in page_links.iframes)
+        ):
+            return self._hit("dom", url)
+
+        pattern = path_pattern(url)
+        with self._lock:
+            stats = self._patterns.setdefault(pattern, [0.0, 0.0, 0, 0])
+            negative = self._is_negative(stats)
+            if negative:
+                stats[3] += 1
+                negative = stats[3] % self.reprobe_every != 0
+        if negative:
+            return self._miss("negative_cache", url)
+
+        found = _has_media(self._probe(url))
+        with self._lock:
+            stats[0] = stats[0] * self.decay + (not found)
+            stats[1] = stats[1] * self.decay + 1
+            stats[2] += 1
+        if found:
+            return self._hit("probe", url)
+        return self._miss("probe", url)
+
+    def _is_negative(self, stats):
+        misses, probes, count, _ = stats
+        return count >= self.negative_threshold and misses >= self.miss_ratio * probes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": sum(self.hits.values()),
+                "misses": sum(self.misses.values()),
+                "hits_by_rule": dict(self.hits),
+                "misses_by_rule": dict(self.misses),
+                "negative_patterns": sum(
+                    1 for stats in self._patterns.values() if self._is_negative(stats)
+                ),
+            }
+
+    def _hit(self, rule, url, detail=None):
+        with self._lock:
+            self.hits[rule] += 1
+        logging.info(f"Media candidate {url}, rule: {detail or rule}")
+        return True
+
+    def _miss(self, rule, url):
+        with self._lock:
+            self.misses[rule] += 1
+        logging.info(f"Skipping download of {url}, rule: {rule}")
+        return False
@@ -0,0 +1,160 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; page visits and downloads take up to minutes.
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+METRICS = {
+    "scraper_stage_seconds": (
+        "histogram",
+        "Duration of visits, link extraction, prediction lookups and updates, "
+        "downloads and reports",
+    ),
+    "scraper_pages_total": ("counter", "Pages claimed for crawling"),
+    "scraper_files_total": ("counter", "Files found, downloaded or already known"),
+    "scraper_retries_total": ("counter", "Page visits retried"),
+    "scraper_browser_recoveries_total": (
+        "counter",
+        "Browser recoveries by action (new_tab, new_context, restart)",
+    ),
+    "scraper_timeouts_total": ("counter", "Operations abandoned after a timeout"),
+    "scraper_queue_depth": ("gauge", "Pages waiting between crawl stages"),
+    "scraper_active_jobs": ("gauge", "Analyses running in worker processes"),
+    "scraper_queued_jobs": ("gauge", "Analyses waiting for a worker"),
+    "scraper_chrome_processes": ("gauge", "Chrome processes of the workers"),
+    "scraper_worker_restarts_total": ("counter", "Worker processes replaced"),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    # Counters, gauges and latency histograms of one process. Updates are a
+    # dict operation under a lock; snapshots are plain picklable dicts, so
+    # worker processes can send them to the API process to be merged.
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # One count per bucket and +Inf, then the sum of observations.
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": self.buckets,
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {
+                    key: list(values) for key, values in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+def merge_snapshots(snapshots):
+    # Sums the snapshots of several processes; gauges are summed as well,
+    # e.g. active jobs or Chrome processes per worker.
+    merged = {
+        "buckets": LATENCY_BUCKETS,
+        "counters": {},
+        "gauges": {},
+        "histograms": {},
+    }
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        merged["buckets"] = snapshot["buckets"]
+        for kind in ("counters", "gauges"):
+            for key, value in snapshot[kind].items():
+                merged[kind][key] = merged[kind].get(key, 0) + value
+        for key, values in snapshot["histograms"].items():
+            total = merged["histograms"].setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+    return merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshot):
+    # Prometheus text exposition format, version 0.0.4.
+    series = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for (name, labels), value in snapshot[kind].items():
+            series.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(series):
+        metric_type, description = METRICS.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(series[name], key=lambda item: item[0]):
+            if metric_type != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = [str(bound) for bound in snapshot["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, [('le', bound)])} "
+                    f"{cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# Registry of the current process.
+metrics = MetricsRegistry()
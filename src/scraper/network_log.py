@@ -0,0 +1,123 @@
+import json
+import logging
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import WebDriverException
+
+
+def read_network_events(driver):
+    # Network.* events from Chrome's performance log since the last read.
+    return [(method, params) for _, method, params in read_target_events(driver)]
+
+
+def read_target_events(driver):
+    # Like read_network_events, with the id of the tab each event came from.
+    try:
+        entries = driver.get_log("performance")
+    except WebDriverException as e:
+        logging.warning(f"Could not read the performance log: {e}")
+        return []
+
+    events = []
+    for entry in entries:
+        try:
+            log = json.loads(entry["message"])
+            message = log["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get("method", "").startswith("Network."):
+            events.append(
+                (log.get("webview"), message["method"], message.get("params", {}))
+            )
+    return events
+
+
+def document_status(events):
+    # HTTP status of the page's document; redirects do not produce a
+    # response event, so the first document response is the final one.
+    for method, params in events:
+        if method == "Network.responseReceived" and params.get("type") == "Document":
+            return params.get("response", {}).get("status")
+    return None
+
+
+def document_error(events):
+    # Chrome's error for a document that failed to load at all, e.g.
+    # "net::ERR_NAME_NOT_RESOLVED"; cancelled navigations are not errors.
+    for method, params in events:
+        if (
+            method == "Network.loadingFailed"
+            and params.get("type") == "Document"
+            and not params.get("canceled")
+        ):
+            return params.get("errorText")
+    return None
+
+
+def transferred_bytes(events):
+    return sum(
+        params.get("encodedDataLength", 0)
+        for method, params in events
+        if method == "Network.loadingFinished"
+    )
+
+
+def blocked_requests(events):
+    return sum(
+        1
+        for method, params in events
+        if method == "Network.loadingFailed" and params.get("blockedReason")
+    )
+
+
+MANIFEST_MIME_TYPES = {
+    "application/vnd.apple.mpegurl",
+    "application/x-mpegurl",
+    "audio/mpegurl",
+    "audio/x-mpegurl",
+    "application/dash+xml",
+}
+MANIFEST_EXTENSIONS = (".m3u8", ".mpd")
+# Single segments of an adaptive stream are useless on their own.
+SEGMENT_MIME_TYPES = {"video/mp2t", "video/iso.segment", "audio/iso.segment"}
+
+
+def media_urls(events, limit=5):
+    # Media URLs from responses seen while the page loaded: HLS and DASH
+    # manifests first, then audio files, in the order they arrived.
+    manifests, audio, _ = _media_responses(events)
+    return (manifests + audio)[:limit]
+
+
+def video_urls(events, limit=5):
+    # Video files seen while the page loaded. These are often ads or
+    # decorative clips rather than the page's media.
+    return _media_responses(events)[2][:limit]
+
+
+def _media_responses(events):
+    manifests = []
+    audio = []
+    video = []
+    for method, params in events:
+        if method != "Network.responseReceived":
+            continue
+        response = params.get("response", {})
+        url = response.get("url", "")
+        if not url.startswith(("http://", "https://")):
+            continue
+        mime_type = response.get("mimeType", "").lower()
+        path = urlsplit(url).path.lower()
+        if mime_type in MANIFEST_MIME_TYPES or path.endswith(MANIFEST_EXTENSIONS):
+            found = manifests
+        elif mime_type in SEGMENT_MIME_TYPES:
+            continue
+        elif mime_type.startswith("audio/"):
+            found = audio
+        elif mime_type.startswith("video/"):
+            found = video
+        else:
+            continue
+        if url not in found:
+            found.append(url)
+    return manifests, audio, video
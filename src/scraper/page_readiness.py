@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Installed once per document. Tracks the last DOM mutation, the last finished
+# network request and the number of fetch/XHR requests still in flight, then
+# reports whether the page has been quiet for the requested windows.
+READINESS_SCRIPT = """
+var mutationQuiet = arguments[0], networkIdle = arguments[1];
+var probe = window.__eardefenderReadiness;
+if (!probe) {
+    probe = window.__eardefenderReadiness = {
+        lastMutation: performance.now(),
+        lastNetwork: performance.now(),
+        pending: 0
+    };
+    new MutationObserver(function () {
+        probe.lastMutation = performance.now();
+    }).observe(document, {childList: true, subtree: true, attributes: true});
+    if (window.PerformanceObserver) {
+        new PerformanceObserver(function (list) {
+            list.getEntries().forEach(function (entry) {
+                probe.lastNetwork = Math.max(probe.lastNetwork, entry.responseEnd);
+            });
+        }).observe({type: "resource", buffered: true});
+    }
+    var finished = function () {
+        probe.pending = Math.max(0, probe.pending - 1);
+        probe.lastNetwork = performance.now();
+    };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            probe.pending += 1;
+            return originalFetch.apply(this, arguments).finally(finished);
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        probe.pending += 1;
+        this.addEventListener("loadend", finished);
+        return originalSend.apply(this, arguments);
+    };
+}
+var now = performance.now();
+var sinceMutation = now - probe.lastMutation;
+var sinceNetwork = now - probe.lastNetwork;
+return {
+    readyState: document.readyState,
+    sinceMutation: sinceMutation,
+    sinceNetwork: sinceNetwork,
+    pending: probe.pending,
+    ready: document.readyState === "complete"
+        && probe.pending === 0
+        && sinceMutation >= mutationQuiet
+        && sinceNetwork >= networkIdle
+};
+"""
+
+
+class PageReadiness:
+    def __init__(
+        self,
+        max_wait=10.0,
+        mutation_quiet=0.5,
+        network_idle=0.5,
+        poll_interval=0.1,
+        learning_rate=0.3,
+    ):
+        self.max_wait = max_wait
+        self.mutation_quiet = mutation_quiet
+        self.network_idle = network_idle
+        self.poll_interval = poll_interval
+        self.learning_rate = learning_rate
+
+        self._lock = threading.Lock()
+        self.settle_times = {}
+        self.pages = 0
+        self.total_wait = 0.0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_wait=float(os.getenv("PAGE_READY_MAX_WAIT", "10")),
+            mutation_quiet=float(os.getenv("PAGE_READY_MUTATION_QUIET", "0.5")),
+            network_idle=float(os.getenv("PAGE_READY_NETWORK_IDLE", "0.5")),
+        )
+
+    def wait(self, execute_script, url):
+        host = urlsplit(url).netloc
+        start = time.monotonic()
+        deadline = start + self.max_wait
+
+        # Pages of a known domain are not worth polling before they have had
+        # most of their usual settle time. The first poll installs the probe,
+        # so the quiet windows are measured through that sleep.
+        learned = self.settle_times.get(host)
+        pre_sleep = min(learned * 0.8, self.max_wait) if learned else 0.0
+
+        timed_out = False
+        polls = 0
+        while True:
+            state = execute_script(
+                READINESS_SCRIPT,
+                self.mutation_quiet * 1000,
+                self.network_idle * 1000,
+            )
+            polls += 1
+            if not isinstance(state, dict) or state.get("ready"):
+                break
+            if time.monotonic() >= deadline:
+                timed_out = True
+                logging.info(
+                    f"Page {url} not quiescent after {self.max_wait} seconds: {state}"
+                )
+                break
+            if polls == 1 and pre_sleep:
+                time.sleep(max(0.0, start + pre_sleep - time.monotonic()))
+            else:
+                time.sleep(self.poll_interval)
+
+        waited = time.monotonic() - start
+        self._record(host, self._settle_time(waited, state), timed_out)
+        return waited
+
+    def _settle_time(self, waited, state):
+        # The page became ready when both quiet windows had passed, which may
+        # be well before the poll that noticed it, e.g. after a pre-sleep.
+        # Learning the time waited instead would grow with every pre-sleep.
+        if not isinstance(state, dict) or not state.get("ready"):
+            return waited
+        overshoot = min(
+            state.get("sinceMutation", 0) / 1000 - self.mutation_quiet,
+            state.get("sinceNetwork", 0) / 1000 - self.network_idle,
+        )
+        return max(0.0, waited - max(0.0, overshoot))
+
+    def _record(self, host, waited, timed_out):
+        with self._lock:
+            self.pages += 1
+            self.total_wait += waited
+            if timed_out:
+                self.timeouts += 1
+                return
+            previous = self.settle_times.get(host)
+            if previous is None:
+                self.settle_times[host] = waited
+            else:
+                self.settle_times[host] = previous + self.learning_rate * (
+                    waited - previous
+                )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "total_wait_seconds": self.total_wait,
+                "avg_wait_seconds": self.total_wait / self.pages if self.pages else 0.0,
+                "timeouts": self.timeouts,
+                "domains": len(self.settle_times),
+            }
@@ -0,0 +1,58 @@
+import logging
+import time
+
+
+class PredictionCache:
+    def __init__(self, fetch, batch_size=50, flush_interval=2.0):
+        # fetch(links, headers) returns {link: prediction} for the links the
+        # connector knows about, or None when the request failed.
+        self._fetch = fetch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._results = {}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self.round_trips = 0
+
+    def prefetch(self, links, headers):
+        for link in links:
+            if link not in self._results:
+                self._pending[link] = None
+        if len(self._pending) >= self.batch_size or (
+            self._pending and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush(headers)
+
+    def lookup(self, link, headers):
+        if link not in self._results:
+            # Resolve the link together with the oldest pending ones.
+            self._pending.pop(link, None)
+            self._flush_batch([link] + self._take_pending(self.batch_size - 1), headers)
+        return self._results.get(link)
+
+    def flush(self, headers):
+        while self._pending:
+            self._flush_batch(self._take_pending(self.batch_size), headers)
+
+    def _take_pending(self, count):
+        batch = []
+        for link in self._pending:
+            if len(batch) >= count:
+                break
+            batch.append(link)
+        for link in batch:
+            del self._pending[link]
+        return batch
+
+    def _flush_batch(self, links, headers):
+        self._last_flush = time.monotonic()
+        if not links:
+            return
+        self.round_trips += 1
+        predictions = self._fetch(links, headers)
+        if predictions is None:
+            logging.info(f"Prediction lookup failed for {len(links)} links.")
+            return
+        for link in links:
+            self._results[link] = predictions.get(link)
@@ -0,0 +1,200 @@
+import logging
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .browser_session import check_navigation
+from .link_extractor import PageLinks
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+SPA_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby", "svelte"}
+NOSCRIPT_MARKERS = re.compile(r"javascript|enable js|enable scripts", re.IGNORECASE)
+IGNORED_TEXT_TAGS = {"script", "style", "noscript", "template"}
+MEDIA_TAGS = {"audio", "video", "source"}
+MEDIA_META = re.compile(r"^og:(audio|video)(:url|:secure_url)?$")
+
+
+class StaticPage:
+    def __init__(self, url, page_links=None, escalation=None):
+        self.url = url
+        self.page_links = page_links if page_links is not None else PageLinks()
+        self.escalation = escalation
+
+
+class _PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base_href = None
+        self.hrefs = []
+        self.anchor_text = {}
+        self.iframes = []
+        self.media = []
+        self.meta_media = []
+        self.scripts = 0
+        self.text_length = 0
+        self.noscript_text = []
+        self.empty_roots = 0
+        self._ignored_depth = 0
+        self._in_noscript = False
+        self._open_root = None
+        self._anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if tag == "a" and "href" in attributes:
+            self.hrefs.append(attributes["href"] or "")
+            self._anchor = (attributes["href"] or "", [])
+        elif tag == "base" and self.base_href is None and attributes.get("href"):
+            self.base_href = attributes["href"]
+        elif tag == "script":
+            self.scripts += 1
+        elif tag == "iframe" and attributes.get("src"):
+            self.iframes.append(attributes["src"])
+        elif tag in MEDIA_TAGS and attributes.get("src"):
+            self.media.append(attributes["src"])
+        elif (
+            tag == "meta"
+            and MEDIA_META.match(attributes.get("property") or "")
+            and attributes.get("content")
+        ):
+            self.meta_media.append(attributes["content"])
+
+        if tag in IGNORED_TEXT_TAGS:
+            self._ignored_depth += 1
+        if tag == "noscript":
+            self._in_noscript = True
+
+        if self._open_root is not None:
+            self._open_root = None
+        elif attributes.get("id") in SPA_ROOT_IDS:
+            self._open_root = tag
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag == "a":
+            self._anchor = None
+        if tag in IGNORED_TEXT_TAGS:
+            self._ignored_depth -= 1
+        if tag == "noscript":
+            self._in_noscript = False
+        self._open_root = None
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._anchor is not None:
+            href, text = self._anchor
+            text = " ".join(" ".join(text).split())
+            if text:
+                self.anchor_text.setdefault(href, text[:200])
+            self._anchor = None
+        if tag in IGNORED_TEXT_TAGS and self._ignored_depth:
+            self._ignored_depth -= 1
+        if tag == "noscript":
+            self._in_noscript = False
+        if self._open_root == tag:
+            # The mount node of a client-side app closed without any children.
+            self.empty_roots += 1
+            self._open_root = None
+
+    def handle_data(self, data):
+        if self._in_noscript:
+            self.noscript_text.append(data)
+        elif not self._ignored_depth:
+            if self._anchor is not None:
+                self._anchor[1].append(data)
+            text = data.strip()
+            self.text_length += len(text)
+            if text:
+                self._open_root = None
+
+
+class StaticFetcher:
+    def __init__(self, timeout=10, min_links=3, min_text_length=200, pool_size=10):
+        self.timeout = timeout
+        self.min_links = min_links
+        self.min_text_length = min_text_length
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=1, backoff_factor=0.2),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url):
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                # Client errors other than timeouts and rate limits are final;
+                # the browser would get the same answer.
+                check_navigation(url, status=response.status_code)
+                if response.status_code != 200:
+                    return StaticPage(url, escalation=f"http_{response.status_code}")
+
+                content_type = response.headers.get("Content-Type", "")
+                if "html" not in content_type:
+                    # Media and documents carry no anchors; the browser would
+                    # not find any either.
+                    return StaticPage(url)
+
+                final_url = response.url
+                html = response.text
+        except requests.RequestException as e:
+            logging.info(f"Static fetch of {url} failed: {e}")
+            return StaticPage(url, escalation="request_failed")
+
+        return self.parse(url, final_url, html)
+
+    def parse(self, url, final_url, html):
+        parser = _PageParser()
+        try:
+            parser.feed(html)
+            parser.close()
+        except Exception as e:
+            logging.info(f"Could not parse {url}: {e}")
+            return StaticPage(url, escalation="parse_error")
+
+        document_url = final_url
+        if parser.base_href:
+            document_url = urljoin(final_url, parser.base_href.strip())
+        page_links = PageLinks(
+            links=_resolve(document_url, parser.hrefs),
+            anchor_text={
+                urljoin(document_url, href.strip()): text
+                for href, text in parser.anchor_text.items()
+            },
+            iframes=_resolve(document_url, parser.iframes),
+            media=_resolve(document_url, parser.media),
+            meta_media=_resolve(document_url, parser.meta_media),
+        )
+
+        return StaticPage(url, page_links, self._escalation(parser, page_links.links))
+
+    def _escalation(self, parser, links):
+        if parser.noscript_text and NOSCRIPT_MARKERS.search(
+            " ".join(parser.noscript_text)
+        ):
+            return "noscript"
+        if parser.empty_roots or (
+            parser.scripts and parser.text_length < self.min_text_length
+        ):
+            return "spa_shell"
+        if len(links) < self.min_links:
+            return "few_links"
+        return None
+
+    def close(self):
+        self.session.close()
+
+
+def _resolve(document_url, urls):
+    return {urljoin(document_url, url.strip()) for url in urls}
@@ -0,0 +1,266 @@
+import copy
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from .browser_session import (
+    BrowserSession,
+    NavigationError,
+    check_navigation,
+    target_id,
+)
+from .load_profile import LoadProfile
+from .metrics import metrics
+from .network_log import (
+    blocked_requests,
+    document_error,
+    document_status,
+    media_urls,
+    read_target_events,
+    transferred_bytes,
+    video_urls,
+)
+from .page_readiness import PageReadiness
+
+NAVIGATE_SCRIPT = """
+window.__scraperPendingNavigation = true;
+window.location.assign(arguments[0]);
+"""
+NAVIGATION_PENDING_SCRIPT = "return window.__scraperPendingNavigation === true;"
+
+
+class BrowserTab:
+    # One tab of a TabPool. It offers the BrowserSession interface used by
+    # WebScraper and LinkExtractor; every command switches the shared driver
+    # to this tab under the pool lock, so tabs load pages in parallel while
+    # their commands take turns.
+    def __init__(self, pool, handle):
+        self.pool = pool
+        self.handle = handle
+        self.pages_visited = 0
+        self.last_wait_time = None
+        self.last_page_bytes = 0
+        self.last_blocked_requests = 0
+        self.last_media_urls = []
+        self.last_video_urls = []
+        self.last_status = None
+        self.recoveries = Counter()
+
+    def visit(self, url, retries=3, backoff=0.5):
+        for attempt in range(retries):
+            try:
+                self._navigate(url)
+                self.pages_visited += 1
+
+                self.last_wait_time = self.pool.readiness.wait(self.execute_script, url)
+                events = self.pool.read_events(self.handle)
+                self.last_status = document_status(events)
+                # Unlike driver.get, a navigation from script does not raise
+                # when the page fails to load; without a document response,
+                # the failure is only in the network log.
+                error = document_error(events) if self.last_status is None else None
+                if error is not None:
+                    error = WebDriverException(f"Loading {url} failed: {error}")
+                    check_navigation(url, error=error)
+                    raise error
+                check_navigation(url, status=self.last_status)
+                self.last_page_bytes = transferred_bytes(events)
+                self.last_blocked_requests = blocked_requests(events)
+                self.last_media_urls = media_urls(events)
+                self.last_video_urls = video_urls(events)
+                logging.info(
+                    f"Page {url} ready in tab after {self.last_wait_time:.2f}s, "
+                    f"{self.last_page_bytes} bytes transferred, "
+                    f"{self.last_blocked_requests} requests blocked, "
+                    f"{len(self.last_media_urls)} media responses"
+                )
+                return
+            except NavigationError:
+                raise
+            except Exception as e:
+                logging.error(f"Attempt {attempt + 1} failed visiting {url}: {e}")
+                if isinstance(e, TimeoutException):
+                    metrics.inc("scraper_timeouts_total", stage="visit")
+                if attempt < retries - 1:
+                    self.recoveries["retry"] += 1
+                    metrics.inc("scraper_retries_total")
+                    time.sleep(backoff * 2**attempt)
+                    continue
+                self.recover()
+                raise
+
+    def _navigate(self, url):
+        # Drop events of earlier pages.
+        self.pool.read_events(self.handle)
+        self.execute_script(NAVIGATE_SCRIPT, url)
+
+        # The marker disappears with the old document once the new one has
+        # been committed.
+        deadline = time.monotonic() + self.pool.navigation_timeout
+        while self.execute_script(NAVIGATION_PENDING_SCRIPT):
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"Navigation to {url} did not start")
+            time.sleep(0.05)
+
+    def execute_script(self, script, *args):
+        with self.pool.lock:
+            self.pool.switch_to(self.handle)
+            return self.pool.session.driver.execute_script(script, *args)
+
+    def get_elements(self, by, value):
+        try:
+            with self.pool.lock:
+                self.pool.switch_to(self.handle)
+                return self.pool.session.driver.find_elements(by, value)
+        except WebDriverException as e:
+            logging.error(f"Error retrieving elements: {e}")
+            return []
+
+    def recover(self):
+        # Only this tab is replaced; the browser and other tabs keep running.
+        self.recoveries["new_tab"] += 1
+        metrics.inc("scraper_browser_recoveries_total", action="new_tab")
+        self.pool.replace(self)
+
+
+class TabPool:
+    def __init__(
+        self,
+        tabs=4,
+        session_factory=None,
+        navigation_timeout=30,
+        script_timeout=10,
+        lease_timeout=600,
+    ):
+        self.navigation_timeout = navigation_timeout
+        self.script_timeout = script_timeout
+        # A lease held by a render thread that died is never returned, so
+        # waiting for a tab is bounded.
+        self.lease_timeout = lease_timeout
+        self.readiness = PageReadiness.from_env()
+        self._session_factory = session_factory or self._create_session
+
+        # lock serialises driver commands; _condition guards leasing.
+        self.lock = threading.RLock()
+        self._condition = threading.Condition()
+        self._current_handle = None
+        self._events = {}
+        self.replaced = 0
+        self.restarts = 0
+
+        self.session = self._session_factory()
+        self.tabs = [BrowserTab(self, handle) for handle in self._open_tabs(tabs)]
+        self._idle = deque(self.tabs)
+
+    @classmethod
+    def from_env(cls):
+        tabs = int(os.getenv("BROWSER_TABS", "1"))
+        if tabs <= 1:
+            return None
+        return cls(
+            tabs=tabs,
+            lease_timeout=int(os.getenv("BROWSER_POOL_LEASE_TIMEOUT", "600")),
+        )
+
+    def _create_session(self):
+        # Commands must not wait for a tab's page load while other tabs are
+        # waiting for the lock; readiness is checked by polling instead.
+        load_profile = copy.copy(LoadProfile.from_env())
+        load_profile.page_load_strategy = "none"
+        return BrowserSession(
+            remote_debugging_port=0,
+            readiness=self.readiness,
+            load_profile=load_profile,
+        )
+
+    def acquire(self, timeout=None):
+        timeout = self.lease_timeout if timeout is None else timeout
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._idle, timeout):
+                raise TimeoutException(
+                    f"No browser tab available after {timeout} seconds"
+                )
+            return self._idle.popleft()
+
+    def release(self, tab):
+        try:
+            tab.execute_script("window.location.replace('about:blank');")
+        except WebDriverException as e:
+            logging.warning(f"Failed to reset browser tab, replacing it: {e}")
+            self.replace(tab)
+        with self._condition:
+            self._idle.append(tab)
+            self._condition.notify()
+
+    def switch_to(self, handle):
+        # Called with lock held.
+        if self._current_handle != handle:
+            self.session.driver.switch_to.window(handle)
+            self._current_handle = handle
+
+    def read_events(self, handle):
+        with self.lock:
+            for target, method, params in read_target_events(self.session.driver):
+                self._events.setdefault(target, []).append((method, params))
+            return self._events.pop(target_id(handle), [])
+
+    def replace(self, tab):
+        with self.lock:
+            driver = self.session.driver
+            try:
+                # Open the new tab from a healthy one, then close the old tab
+                # through CDP, which works even if its renderer hangs.
+                healthy = [other.handle for other in self.tabs if other is not tab]
+                if healthy:
+                    self.switch_to(healthy[0])
+                driver.switch_to.new_window("tab")
+                self.session.load_profile.apply(driver)
+                old_handle, tab.handle = tab.handle, driver.current_window_handle
+                self._current_handle = tab.handle
+                driver.execute_cdp_cmd(
+                    "Target.closeTarget", {"targetId": target_id(old_handle)}
+                )
+                self._events.pop(target_id(old_handle), None)
+                self.replaced += 1
+                logging.info("Replaced browser tab.")
+            except WebDriverException as e:
+                logging.error(f"Failed to replace browser tab: {e}")
+                if not self.session.is_healthy():
+                    self._restart()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "tabs": len(self.tabs),
+                "idle": len(self._idle),
+                "replaced": self.replaced,
+                "restarts": self.restarts,
+            }
+
+    def close(self):
+        with self.lock:
+            self.session.close()
+
+    def _open_tabs(self, count):
+        driver = self.session.driver
+        driver.set_script_timeout(self.script_timeout)
+        handles = [driver.current_window_handle]
+        for _ in range(count - 1):
+            driver.switch_to.new_window("tab")
+            self.session.load_profile.apply(driver)
+            handles.append(driver.current_window_handle)
+        self._current_handle = handles[-1]
+        return handles
+
+    def _restart(self):
+        # The whole browser is gone; every tab gets a new handle.
+        self.restarts += 1
+        # Counted by the session as a restart.
+        self.session.restart_browser()
+        self._events.clear()
+        for tab, handle in zip(self.tabs, self._open_tabs(len(self.tabs))):
+            tab.handle = handle
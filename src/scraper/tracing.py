@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+_NO_SPAN = nullcontext()
+
+
+class Tracer:
+    # Records spans as Chrome trace events ("X" complete events), which
+    # Perfetto and chrome://tracing load directly. Times are taken from the
+    # monotonic clock, which is shared by every process on Linux, so spans
+    # measured in download worker processes can be added as well.
+    enabled = True
+
+    def __init__(self):
+        self._origin = time.monotonic()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._events = []
+        self._threads = set()
+
+    @contextmanager
+    def span(self, name, category="stage", **args):
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.add(name, started, time.monotonic(), category, **args)
+
+    def add(self, name, started, finished, category="stage", **args):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (started - self._origin) * 1e6,
+            "dur": max(0.0, finished - started) * 1e6,
+            "pid": self._pid,
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads.add(thread.ident)
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self._pid,
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self._events.append(event)
+
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, file)
+        os.replace(temporary, path)
+        return path
+
+
+class NullTracer:
+    # Used when tracing is off; spans cost a method call.
+    enabled = False
+
+    def span(self, name, category="stage", **args):
+        return _NO_SPAN
+
+    def add(self, name, started, finished, category="stage", **args):
+        pass
+
+
+NULL_TRACER = NullTracer()
@@ -1,12 +1,50 @@
 import logging
-import os
+import queue
+import threading
 import time
-
-import requests
+from collections import Counter, deque
+from typing import Optional
 
 from .audio_downloader import AudioDownloader
-from .browser_session import BrowserSession
-from .link_extractor import LinkExtractor
+from .browser_pool import BrowserPool
+from .browser_session import BrowserSession, NavigationError
+from .checkpoint import Checkpoint
+from .connector_client import ConnectorClient
+from .crawl_state import CrawlState
+from .download_engine import ProcessDownloadEngine
+from .frontier import CrawlFrontier, PriorityFrontier
+from .link_extractor import LinkExtractor, PageLinks
+from .link_scorer import LinkScorer
+from .media_cache import MediaCache
+from .media_prefilter import MediaPrefilter, matching_extractor
+from .metrics import metrics
+from .prediction_cache import PredictionCache
+from .static_fetcher import StaticFetcher
+from .tab_pool import TabPool
+from .tracing import NULL_TRACER, Tracer
+
+_STOP = object()
+
+
+class _Page:
+    __slots__ = (
+        "sequence",
+        "url",
+        "depth",
+        "page_links",
+        "new_links",
+        "file_lease",
+        "failed",
+    )
+
+    def __init__(self, sequence, url, depth):
+        self.sequence = sequence
+        self.url = url
+        self.depth = depth
+        self.page_links = PageLinks()
+        self.new_links = []
+        self.file_lease = None
+        self.failed = False
 
 
 class WebScraper:
@@ -20,6 +58,31 @@ class WebScraper:
         max_time_per_file: int,
         max_total_time: int,
         download_dir: str = "./downloads",
+        browser_pool: Optional[BrowserPool] = None,
+        static_fetch: bool = True,
+        frontier_memory_budget: int = 100_000,
+        lookup_batch_size: int = 50,
+        lookup_flush_interval: float = 2.0,
+        connector: Optional[ConnectorClient] = None,
+        render_workers: int = 1,
+        download_workers: int = 1,
+        media_prefilter: bool = True,
+        download_engine: Optional[ProcessDownloadEngine] = None,
+        isolate_downloads: bool = True,
+        stream_results: bool = True,
+        media_cache: Optional[MediaCache] = None,
+        audio_profile: str = "mp3",
+        sample_rate: int = 16000,
+        clip_seconds: Optional[int] = None,
+        clip_start: int = 0,
+        tab_pool: Optional[TabPool] = None,
+        max_media_duration: Optional[int] = None,
+        max_media_filesize: Optional[int] = None,
+        crawl_order: str = "bfs",
+        link_scorer: Optional[LinkScorer] = None,
+        tracer: Optional[Tracer] = None,
+        crawl_state: Optional[CrawlState] = None,
+        checkpoint: Optional[Checkpoint] = None,
     ):
         self.starting_point = starting_point
         self.max_depth = max_depth
@@ -29,45 +92,237 @@ class WebScraper:
         self.max_time_per_file = max_time_per_file
         self.max_total_time = max_total_time
         self.download_dir = download_dir
+        self.stream_results = stream_results
+        self.tracer = tracer or NULL_TRACER
 
         self.start_time = time.time()
-        self.visit_queue = [(self.starting_point, 0)]
-        self.visited = set()
+        self._started = time.monotonic()
+        if crawl_order == "bfs":
+            self.frontier = CrawlFrontier(memory_budget=frontier_memory_budget)
+            self.link_scorer = None
+        elif crawl_order == "priority":
+            self.frontier = PriorityFrontier(memory_budget=frontier_memory_budget)
+            self.link_scorer = link_scorer or LinkScorer()
+        else:
+            raise ValueError(f"Unknown crawl order: {crawl_order}")
+        # With a shared crawl state, the workers crawling the same analysis
+        # claim pages from one frontier; whoever starts first seeds it.
+        self.crawl_state = crawl_state
+        if crawl_state is not None:
+            crawl_state.push(self.starting_point, 0)
+        else:
+            self.frontier.push(self.starting_point, 0)
         self.extracted_files = list()
         self.page_counter = 0
         self.file_counter = 0
         self.link_counter = 1
 
-        self.browser = BrowserSession()
-        self.link_extractor = LinkExtractor(self.browser)
-        self.media_downloader = AudioDownloader(self.download_dir, max_time_per_file)
+        self.render_workers = render_workers
+        self.download_workers = download_workers
+        self._state = threading.Condition()
+        self._commit_lock = threading.Lock()
+        self._stopped = False
+        self._next_sequence = 0
+        self._next_commit = 0
+        self._rendered = {}
+        self._pages_in_flight = 0
+        self._files_in_flight = 0
+        self._downloaded_files = []
+        # Claimed pages that have not yet been through every stage; a
+        # checkpoint puts them back in front of the frontier.
+        self._open_pages = {}
+        self._resumed = deque()
+        self._elapsed_before = 0.0
+        # Streamed files a checkpoint lists as not delivered, and where the
+        # running crawl reports its files.
+        self._undelivered_files = []
+        self._report_to = None
+        self._pages_since_checkpoint = 0
+        self.checkpoint = checkpoint
+        self.rendered_pages = 0
+        self.rendered_bytes = 0
+        self.browser_recoveries = Counter()
+        self._recoveries_at_lease = [Counter() for _ in range(render_workers)]
 
-    def scrape(self, headers, analysis_id):
-        try:
-            self.start_time = time.time()
-
-            while self.visit_queue:
-                current_url, current_depth = self.visit_queue.pop(0)
-
-                if self.check_conditions(current_depth):
-                    break
+        # Chrome is only started once a page actually needs rendering.
+        self.browser_pool = browser_pool
+        self.tab_pool = tab_pool
+        self.browsers = [None] * render_workers
+        self.link_extractors = [None] * render_workers
+        self.static_fetcher = StaticFetcher() if static_fetch else None
+        self.owns_download_engine = download_engine is None and isolate_downloads
+        if self.owns_download_engine:
+            download_engine = ProcessDownloadEngine(workers=download_workers)
+        self.download_engine = download_engine
+        self.media_cache = media_cache
+        self.media_downloader = AudioDownloader(
+            self.download_dir,
+            max_time_per_file,
+            engine=download_engine,
+            cache=media_cache,
+            profile=audio_profile,
+            sample_rate=sample_rate,
+            clip_seconds=clip_seconds,
+            clip_start=clip_start,
+            max_duration=max_media_duration,
+            max_filesize=max_media_filesize,
+            tracer=self.tracer,
+        )
+        self.prefilter = (
+            MediaPrefilter(self.media_downloader.probe) if media_prefilter else None
+        )
+        self.owns_connector = connector is None
+        self.connector = connector or ConnectorClient.from_env()
+        self.predictions = PredictionCache(
+            self.find_existing_analysis,
+            batch_size=lookup_batch_size,
+            flush_interval=lookup_flush_interval,
+        )
+        if checkpoint is not None:
+            self._restore_checkpoint()
 
-                if current_url in self.visited:
-                    continue
+    def scrape(self, headers, analysis_id):
+        # Pages flow through three stages connected by bounded queues:
+        # render workers fetch pages and extract links, a single lookup
+        # stage resolves known predictions, and download workers run yt-dlp.
+        lookup_queue = queue.Queue(maxsize=2 * self.render_workers)
+        download_queue = queue.Queue(maxsize=2 * self.download_workers)
+        render_threads = [
+            threading.Thread(
+                target=self._render_stage,
+                args=(slot, lookup_queue),
+                name=f"render-{slot}",
+            )
+            for slot in range(self.render_workers)
+        ]
+        lookup_thread = threading.Thread(
+            target=self._lookup_stage,
+            args=(lookup_queue, download_queue, headers, analysis_id),
+            name="lookup",
+        )
+        download_threads = [
+            threading.Thread(
+                target=self._download_stage,
+                args=(download_queue, headers, analysis_id),
+                name=f"download-{index}",
+            )
+            for index in range(self.download_workers)
+        ]
 
-                self.visited.add(current_url)
-                self.page_counter += 1
+        try:
+            self._report_to = (analysis_id, headers)
+            if self._undelivered_files and self.stream_results:
+                logging.info(
+                    f"{id(self)} Resending {len(self._undelivered_files)} files "
+                    "not delivered before the checkpoint"
+                )
+                self.connector.stream_files(
+                    analysis_id, self._undelivered_files, headers
+                )
+                self._undelivered_files = []
 
-                self.process_page(current_url, current_depth, headers, analysis_id)
+            # A resumed crawl continues with the time it had left.
+            self.start_time = time.time() - self._elapsed_before
+            self._started = time.monotonic() - self._elapsed_before
 
-                if not self.visit_queue:
-                    logging.info("Visit queue is empty.")
+            for thread in render_threads + [lookup_thread] + download_threads:
+                thread.start()
+            for thread in render_threads:
+                thread.join()
+            lookup_queue.put(_STOP)
+            lookup_thread.join()
+            for _ in download_threads:
+                download_queue.put(_STOP)
+            for thread in download_threads:
+                thread.join()
         except Exception as e:
             logging.error(f"Error during scraping: {e}")
         finally:
-            self.browser.close()
+            self.tracer.add(
+                "scrape", self._started, time.monotonic(), "job", analysisId=analysis_id
+            )
+            logging.info(
+                f"{id(self)} Prediction lookups: {self.predictions.round_trips} "
+                f"round trips for {self.page_counter} pages."
+            )
+            logging.info(
+                f"{id(self)} Rendered {self.rendered_pages} pages in the browser, "
+                f"{self.rendered_bytes} bytes transferred."
+            )
+            self.release_browser()
+            logging.info(
+                f"{id(self)} Browser recoveries: {dict(self.browser_recoveries)}"
+            )
+            if self.prefilter is not None:
+                logging.info(f"{id(self)} Media prefilter: {self.prefilter.stats()}")
+            if self.media_cache is not None:
+                logging.info(f"{id(self)} Media cache: {self.media_cache.stats()}")
+            if self.crawl_state is not None:
+                logging.info(f"{id(self)} Crawl state: {self.crawl_state.stats()}")
+            if self.checkpoint is not None:
+                self._write_checkpoint()
+                logging.info(f"{id(self)} Checkpoints: {self.checkpoint.stats()}")
+            self.frontier.close()
+            self.release_connector()
+            if self.owns_download_engine:
+                self.download_engine.close()
+
+        # Files are reported in the order their pages were claimed, no matter
+        # which download finished first.
+        self.extracted_files = [file for _, file in sorted(self._downloaded_files)]
         return self.extracted_files
 
+    def ensure_browser(self, slot=0):
+        if self.browsers[slot] is None:
+            if self.tab_pool is not None:
+                # Tabs are shared with other jobs' render threads; waiting
+                # past the time left to the crawl is pointless.
+                browser = self.tab_pool.acquire(timeout=self._time_left())
+            elif self.browser_pool is not None:
+                browser = self.browser_pool.acquire()
+            elif slot == 0:
+                browser = BrowserSession()
+            else:
+                # Additional browsers cannot share the default DevTools port.
+                browser = BrowserSession(remote_debugging_port=0)
+            self.browsers[slot] = browser
+            self._recoveries_at_lease[slot] = Counter(browser.recoveries)
+            self.link_extractors[slot] = LinkExtractor(browser)
+        return self.browsers[slot]
+
+    def _time_left(self):
+        return max(0.0, self.max_total_time - (time.monotonic() - self._started))
+
+    @property
+    def browser(self):
+        return self.browsers[0]
+
+    def release_browser(self):
+        if self.static_fetcher is not None:
+            self.static_fetcher.close()
+        for slot, browser in enumerate(self.browsers):
+            if browser is None:
+                continue
+            # Pooled browsers outlive the job; only count this job's recoveries.
+            self.browser_recoveries.update(
+                browser.recoveries - self._recoveries_at_lease[slot]
+            )
+            if self.tab_pool is not None:
+                self.tab_pool.release(browser)
+            elif self.browser_pool is not None:
+                self.browser_pool.release(browser)
+            else:
+                browser.close()
+            self.browsers[slot] = None
+
+    def release_connector(self):
+        # Pending prediction updates must reach the connector before the
+        # report is sent.
+        if self.owns_connector:
+            self.connector.close()
+        else:
+            self.connector.flush()
+
     def check_conditions(self, current_depth):
         elapsed_time = time.time() - self.start_time
 
@@ -84,87 +339,408 @@ class WebScraper:
             or elapsed_time >= self.max_total_time
         )
 
-    def process_page(self, url, current_depth, headers, analysis_id):
-        try:
-            self.browser.visit(url)
+    def _render_stage(self, slot, lookup_queue):
+        while True:
+            page = self._claim_page()
+            if page is None:
+                return
+
+            # Failed visits have already been retried and the browser
+            # recovered by the session. A page that could not be loaded is
+            # still committed for the crawl order and the page budget, but
+            # is not looked up or downloaded.
+            try:
+                page.page_links = self.fetch_page(page.url, slot)
+            except NavigationError as e:
+                logging.info(f"{id(self)} Skipping page {e}")
+                page.page_links = PageLinks()
+                page.failed = True
+            except Exception as e:
+                logging.error(f"{id(self)} Error processing page {page.url}: {e}")
+
+            try:
+                self._commit_page(page, lookup_queue)
+            except Exception as e:
+                logging.error(f"{id(self)} Error committing page {page.url}: {e}")
+                with self._state:
+                    self._stop()
+
+    def _claim_page(self):
+        if self.crawl_state is not None:
+            return self._claim_shared_page()
+        with self._state:
+            while True:
+                if self._stopped:
+                    return None
+                if self._resumed or self.frontier:
+                    if self._resumed:
+                        url, depth = self._resumed.popleft()
+                    else:
+                        url, depth = self.frontier.pop()
+                    if self.check_conditions(depth):
+                        self._stop()
+                        return None
+                    return self._start_page(url, depth)
+                if not self._pages_in_flight:
+                    logging.info("Visit queue is empty.")
+                    self._stop()
+                    return None
+                # Pages still being rendered may add more links.
+                self._state.wait()
 
-            links = self.link_extractor.extract_links(url)
+    def _claim_shared_page(self):
+        # The crawl state enforces max_pages and max_files across workers;
+        # links beyond max_depth are never pushed. Other workers may still
+        # push links, so an empty frontier only ends the crawl once no page
+        # is leased anywhere.
+        with self._state:
+            while True:
+                if self._stopped:
+                    return None
+                if self.check_conditions(0):
+                    self._stop()
+                    return None
+                claimed = self.crawl_state.claim()
+                if claimed is not None:
+                    return self._start_page(*claimed)
+                if not self._pages_in_flight and not self.crawl_state.has_work():
+                    logging.info("Shared visit queue is empty.")
+                    self._stop()
+                    return None
+                self._state.wait(self.crawl_state.poll_interval)
 
-            search_result = self.find_existing_analysis(url, headers)
+    def _start_page(self, url, depth):
+        self.page_counter += 1
+        metrics.inc("scraper_pages_total")
+        self._pages_in_flight += 1
+        page = _Page(self._next_sequence, url, depth)
+        self._open_pages[page.sequence] = page
+        self._next_sequence += 1
+        return page
+
+    def _commit_page(self, page, lookup_queue):
+        # Links are added to the frontier in claim order, so the crawl order
+        # does not depend on which render worker finished first. The sequence
+        # must advance even if the frontier or the crawl state fails, or the
+        # other render workers would wait for this page forever; such a
+        # failure stops the crawl instead.
+        with self._commit_lock:
+            with self._state:
+                self._rendered[page.sequence] = page
+                ready = []
+                committed = 0
+                while self._next_commit in self._rendered:
+                    ready_page = self._rendered.pop(self._next_commit)
+                    try:
+                        ready_page.new_links = self.enqueue_links(
+                            ready_page.page_links.links,
+                            ready_page.depth + 1,
+                            ready_page.page_links,
+                        )
+                        if self.crawl_state is not None:
+                            self.crawl_state.complete(ready_page.url)
+                    except Exception as e:
+                        logging.error(
+                            f"{id(self)} Error queueing links of {ready_page.url}: {e}"
+                        )
+                        self._stop()
+                    if ready_page.failed:
+                        self._open_pages.pop(ready_page.sequence, None)
+                    else:
+                        ready.append(ready_page)
+                    self._next_commit += 1
+                    committed += 1
+                self._pages_in_flight -= committed
+                self._state.notify_all()
+            if self.checkpoint is not None:
+                self._pages_since_checkpoint += committed
+                if self._pages_since_checkpoint >= self.checkpoint.interval:
+                    self._pages_since_checkpoint = 0
+                    self._write_checkpoint()
+            for ready_page in ready:
+                lookup_queue.put(ready_page)
+            metrics.set("scraper_queue_depth", lookup_queue.qsize(), queue="lookup")
+
+    def enqueue_links(self, links, depth, page_links=None):
+        if self.link_scorer is not None or self.crawl_state is not None:
+            return self._enqueue_scored_links(links, depth, page_links)
+
+        new_links = []
+        for link in links:
+            if self.link_counter >= self.max_pages:
+                break
+            if not self.frontier.push(link, depth):
+                continue
+            new_links.append(link)
+            self.link_counter += 1
+        return new_links
+
+    def _enqueue_scored_links(self, links, depth, page_links):
+        # Every link competes for the page budget, so none are cut off in
+        # BFS fashion. A deep link may be popped before shallow ones, so links
+        # beyond max_depth are dropped here instead of ending the crawl.
+        if depth >= self.max_depth:
+            return []
+        page_links = page_links or PageLinks()
+        if self.link_scorer is None:
+            items = [(link, depth, 0.0) for link in links]
+        else:
+            parent_yield = self.link_scorer.parent_yield(page_links)
+            items = [
+                (
+                    link,
+                    depth,
+                    self.link_scorer.score(
+                        link, depth, page_links.anchor_text.get(link, ""), parent_yield
+                    ),
+                )
+                for link in links
+            ]
+        if self.crawl_state is not None:
+            # One round trip per page rather than per link.
+            new_links = self.crawl_state.push_many(items)
+        else:
+            new_links = [item[0] for item in items if self.frontier.push(*item)]
+        self.link_counter += len(new_links)
+        return new_links
+
+    def _lookup_stage(self, lookup_queue, download_queue, headers, analysis_id):
+        while True:
+            page = lookup_queue.get()
+            if page is _STOP:
+                return
+            metrics.set("scraper_queue_depth", lookup_queue.qsize(), queue="lookup")
+
+            try:
+                with self.tracer.span("prefetch", links=len(page.new_links)):
+                    self.predictions.prefetch(page.new_links, headers)
+            except Exception as e:
+                logging.error(f"{id(self)} Error prefetching predictions: {e}")
+            if not self._reserve_file(page):
+                continue
+
+            try:
+                with self.tracer.span("lookup", url=page.url, page=page.sequence):
+                    search_result = self.predictions.lookup(page.url, headers)
+            except Exception as e:
+                logging.error(f"{id(self)} Error looking up page {page.url}: {e}")
+                search_result = None
 
             if search_result is not None:
                 self.update_analysis(headers, analysis_id, search_result)
-                self.file_counter += 1
+                self._release_file(True, page)
             else:
-                path = self.media_downloader.download_audio(url)
+                download_queue.put(page)
+                metrics.set(
+                    "scraper_queue_depth", download_queue.qsize(), queue="download"
+                )
 
-                if path is not None:
-                    self.extracted_files.append({"filePath": path, "link": url})
-                    self.file_counter += 1
+    def _reserve_file(self, page):
+        # A page may only start towards a file while the files found plus the
+        # downloads in flight stay below max_files.
+        with self._state:
+            while True:
+                if self.file_counter >= self.max_files:
+                    self._open_pages.pop(page.sequence, None)
+                    return False
+                if self.crawl_state is not None:
+                    # Slots are leased from the files of all workers.
+                    page.file_lease = self.crawl_state.reserve_file()
+                    if page.file_lease is not None:
+                        self._files_in_flight += 1
+                        return True
+                    if not self.crawl_state.files_left():
+                        self._open_pages.pop(page.sequence, None)
+                        return False
+                    self._state.wait(self.crawl_state.poll_interval)
+                    continue
+                if self.file_counter + self._files_in_flight < self.max_files:
+                    self._files_in_flight += 1
+                    return True
+                self._state.wait()
 
-            unvisited_links = [link for link in links if link not in self.visited]
-            for link in unvisited_links:
-                self.visit_queue.append((link, current_depth + 1))
-                self.link_counter += 1
+    def _release_file(self, found, page=None, file=None):
+        with self._state:
+            self._files_in_flight -= 1
+            if page is not None:
+                self._open_pages.pop(page.sequence, None)
+                if page.file_lease is not None:
+                    self.crawl_state.release_file(page.file_lease, found)
+            if found:
+                self.file_counter += 1
+                metrics.inc("scraper_files_total")
+            if file is not None:
+                self._downloaded_files.append((page.sequence, file))
+            self._state.notify_all()
 
-                if self.link_counter >= self.max_pages:
-                    break
+    def _download_stage(self, download_queue, headers, analysis_id):
+        while True:
+            page = download_queue.get()
+            if page is _STOP:
+                return
+            metrics.set("scraper_queue_depth", download_queue.qsize(), queue="download")
 
-        except Exception as e:
-            logging.error(f"{id(self)} Error processing page {url}: {e}")
-            self.browser.restart_browser()
+            path = None
+            try:
+                if self._is_candidate(page):
+                    with metrics.timer("scraper_stage_seconds", stage="download"):
+                        with self.tracer.span("media", url=page.url):
+                            path = self.download_media(page)
+            except Exception as e:
+                logging.error(f"{id(self)} Error downloading {page.url}: {e}")
+            if path is None:
+                self._release_file(False, page)
+                continue
+
+            # A checkpoint lists the released files as found, so a file is
+            # only released once it has been reported.
+            file = {"filePath": path, "link": page.url}
+            try:
+                if self.stream_results:
+                    self.report_file(headers, analysis_id, file)
+            finally:
+                self._release_file(True, page, file)
+
+    def _is_candidate(self, page):
+        if self.prefilter is None:
+            return True
+        with self.tracer.span("prefilter", url=page.url, page=page.sequence):
+            return self.prefilter.is_candidate(page.url, page.page_links)
 
-    def find_existing_analysis(self, url, headers):
+    def download_media(self, page):
+        # Manifests and audio sniffed while rendering are downloaded directly,
+        # which saves yt-dlp from fetching and parsing the page again. Sniffed
+        # video may be a pre-roll or a hero clip, so it only goes first when
+        # no dedicated extractor knows the page, and is a fallback otherwise.
+        sniffed = page.page_links.sniffed_media[:1]
+        fallback = page.page_links.sniffed_video[:1]
+        if not sniffed and matching_extractor(page.url) is None:
+            sniffed, fallback = fallback, []
+        # All attempts for one page share the per-file time limit.
+        deadline = time.monotonic() + self.max_time_per_file
+        for media_url in [*sniffed, page.url, *fallback]:
+            if time.monotonic() >= deadline:
+                logging.warning(f"No time left to download media of {page.url}")
+                return None
+            if media_url != page.url:
+                logging.info(f"Downloading media of {page.url} from {media_url}")
+            path = self.media_downloader.download_audio(media_url, deadline=deadline)
+            if path is not None:
+                return path
+        return None
+
+    def _write_checkpoint(self):
+        # Only the pages the budget still allows can be crawled, so the
+        # frontier is cut to them; the seen set is kept as fingerprints.
+        # Streamed files are only queued for the connector, so the queue is
+        # flushed after the state is taken, and files whose partial report
+        # failed are saved to be sent again on resume.
+        with self._state:
+            open_pages = [
+                (self._open_pages[sequence].url, self._open_pages[sequence].depth)
+                for sequence in sorted(self._open_pages)
+            ]
+            remaining = max(0, self.max_pages - self.page_counter)
+            state = {
+                "elapsed": time.monotonic() - self._started,
+                "pages": self.page_counter - len(open_pages),
+                "files": self.file_counter,
+                "links": self.link_counter,
+                "next_sequence": self._next_sequence,
+                "pending": open_pages + list(self._resumed),
+                "frontier": self.frontier.entries(remaining),
+                "downloaded_files": sorted(self._downloaded_files),
+            }
+            fingerprints = self.frontier.fingerprints()
+        state["undelivered"] = list(self._undelivered_files)
+        if self.stream_results and self._report_to is not None:
+            self.connector.flush()
+            state["undelivered"] += list(self.connector.undelivered(*self._report_to))
         try:
-            body = {"links": [url]}
-            logging.info(body)
-            connector_address = os.getenv("CONNECTOR_ADDRESS")
-            connector_port = os.getenv("CONNECTOR_PORT")
-
-            response = requests.get(
-                f"http://{connector_address}:{connector_port}/predictions/model/{self.model}",
-                json=body,
-                headers=headers,
-                timeout=100,
-            )
+            self.checkpoint.save(state, fingerprints)
+        except OSError as e:
+            logging.error(f"{id(self)} Could not write checkpoint: {e}")
 
-            if response.status_code == 200:
-                logging.info("Received model predictions for given url.")
+    def _restore_checkpoint(self):
+        saved = self.checkpoint.load()
+        if saved is None:
+            return
+        state, fingerprints = saved
+        self.frontier.restore(state["frontier"], fingerprints)
+        self._resumed.extend((url, depth) for url, depth in state["pending"])
+        self.page_counter = state["pages"]
+        self.file_counter = state["files"]
+        self.link_counter = state["links"]
+        self._next_sequence = self._next_commit = state["next_sequence"]
+        self._downloaded_files = [
+            (sequence, file) for sequence, file in state["downloaded_files"]
+        ]
+        self._undelivered_files = state.get("undelivered", [])
+        self._elapsed_before = state["elapsed"]
+        logging.info(
+            f"{id(self)} Resuming from checkpoint after {self._elapsed_before:.0f}s: "
+            f"{self.page_counter} pages, {self.file_counter} files, "
+            f"{len(self._resumed)} unfinished pages, {len(self.frontier)} queued"
+        )
 
-                response_data = response.json()
+    def _stop(self):
+        self._stopped = True
+        self._state.notify_all()
 
-                if isinstance(response_data, list) and len(response_data) > 0:
-                    first_item = response_data[0]
-                    logging.info(f"First item link: {first_item['link']}")
-                    return first_item
-                else:
-                    logging.info("Response body is not a list or is empty.")
-                    return None
-        except requests.RequestException as exc:
-            logging.error(f"Request failed: {exc}")
-            return None
+    def fetch_page(self, url, slot=0):
+        if self.static_fetcher is not None:
+            with metrics.timer("scraper_stage_seconds", stage="static_fetch"):
+                with self.tracer.span("fetch", url=url):
+                    page = self.static_fetcher.fetch(url)
+            if page.escalation is None:
+                return page.page_links
+            logging.info(f"Rendering {url} in browser, rule: {page.escalation}")
 
-    def update_analysis(self, headers, analysis_id, analysis_result):
+        browser = self.ensure_browser(slot)
+        self._visit(browser, url)
+        with self._state:
+            self.rendered_pages += 1
+            self.rendered_bytes += browser.last_page_bytes
+        with metrics.timer("scraper_stage_seconds", stage="extract_links"):
+            with self.tracer.span("extract", url=url):
+                page_links = self.link_extractors[slot].extract_page(url)
+        page_links.sniffed_media = list(browser.last_media_urls)
+        page_links.sniffed_video = list(browser.last_video_urls)
+        return page_links
+
+    def _visit(self, browser, url):
+        # The readiness wait ends the visit, so the trace splits the visit
+        # into navigate and wait afterwards instead of timing inside it.
+        started = time.monotonic()
         try:
-            body = {"predictionResults": [analysis_result]}
-            logging.info(
-                f'Updating analysis {analysis_id}, link: {analysis_result["link"]}'
-            )
-            connector_address = os.getenv("CONNECTOR_ADDRESS")
-            connector_port = os.getenv("CONNECTOR_PORT")
-
-            response = requests.put(
-                f"http://{connector_address}:{connector_port}/analyses/{analysis_id}/predictions",
-                json=body,
-                headers=headers,
-                timeout=100,
-            )
+            with metrics.timer("scraper_stage_seconds", stage="visit"):
+                browser.visit(url)
+        except Exception as e:
+            finished = time.monotonic()
+            self.tracer.add("navigate", started, finished, url=url, error=str(e))
+            raise
+        if self.tracer.enabled:
+            finished = time.monotonic()
+            waited = min(browser.last_wait_time or 0.0, finished - started)
+            self.tracer.add("navigate", started, finished - waited, url=url)
+            self.tracer.add("wait", finished - waited, finished, url=url)
 
-            if response.status_code == 200:
-                logging.info("Successfully updated analysis")
-            else:
-                logging.error(
-                    f"Error response: {response.status_code}, Body: {response.text}"
-                )
-        except requests.RequestException as exc:
-            logging.error(f"Request failed: {exc}")
+    def find_existing_analysis(self, links, headers):
+        logging.info(f"Looking up predictions for {len(links)} links.")
+        with metrics.timer("scraper_stage_seconds", stage="find_predictions"):
+            return self.connector.find_predictions(self.model, links, headers)
+
+    def report_file(self, headers, analysis_id, file):
+        logging.info(
+            f"Reporting file of analysis {analysis_id} after "
+            f"{time.monotonic() - self._started:.1f}s, link: {file['link']}"
+        )
+        with self.tracer.span("upload", url=file["link"]):
+            self.connector.stream_files(analysis_id, [file], headers)
+
+    def update_analysis(self, headers, analysis_id, analysis_result):
+        logging.info(
+            f'Updating analysis {analysis_id}, link: {analysis_result["link"]}'
+        )
+        with metrics.timer("scraper_stage_seconds", stage="update_predictions"):
+            self.connector.update_predictions(analysis_id, [analysis_result], headers)
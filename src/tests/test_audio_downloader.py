@@ -1,10 +1,16 @@
 import os
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
 import yt_dlp
+from yt_dlp.postprocessor.ffmpeg import FFmpegExtractAudioPP, FFmpegPostProcessor
 
-from scraper.audio_downloader import AudioDownloader
+from scraper.audio_downloader import AudioDownloader, _profile_options, _youtube_dl
+from scraper.download_engine import DownloadTimeout
+from scraper.media_cache import MediaCache
+from scraper.tracing import Tracer
 
 
 @pytest.fixture
@@ -107,3 +113,266 @@ def test_download_audio_no_file(MockYoutubeDL, audio_downloader):
 
     assert file_path is None
     mock_ydl.extract_info.assert_called_once_with(url, download=True)
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_probe_returns_metadata(MockYoutubeDL, audio_downloader):
+    """Test that probe extracts metadata without downloading."""
+    downloader, download_dir = audio_downloader
+    mock_ydl = MockYoutubeDL.return_value
+    mock_ydl.__enter__.return_value = mock_ydl
+    mock_ydl.extract_info.return_value = {"id": "1234", "formats": []}
+
+    url = "http://testurl.com/video"
+    assert downloader.probe(url) == {"id": "1234", "formats": []}
+    mock_ydl.extract_info.assert_called_once_with(url, download=False, process=False)
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_probe_unsupported_url(MockYoutubeDL, audio_downloader):
+    """Test that probe returns None when yt-dlp finds no media."""
+    downloader, download_dir = audio_downloader
+    mock_ydl = MockYoutubeDL.return_value
+    mock_ydl.__enter__.return_value = mock_ydl
+    mock_ydl.extract_info.side_effect = yt_dlp.utils.DownloadError("Unsupported URL")
+
+    assert downloader.probe("http://testurl.com/article") is None
+
+
+def test_download_audio_engine_timeout_removes_partial_files(tmp_path):
+    """Test that files left by a killed download are deleted."""
+    engine = MagicMock()
+    engine.run.side_effect = DownloadTimeout("too slow")
+    downloader = AudioDownloader(download_dir=str(tmp_path), timeout=1, engine=engine)
+    unrelated = tmp_path / "other.mp3"
+    unrelated.touch()
+
+    with patch("scraper.audio_downloader.uuid.uuid4", return_value="1234"):
+        (tmp_path / "1234.webm.part").touch()
+        (tmp_path / "1234.temp.mp3").touch()
+        assert downloader.download_audio("http://testurl.com/video") is None
+
+    assert os.listdir(tmp_path) == ["other.mp3"]
+    assert 0 < engine.run.call_args[0][2] <= 1
+
+
+def test_probe_and_download_share_one_timeout(tmp_path):
+    """Test that the download only gets the time left after the probe."""
+    engine = MagicMock()
+    clock = iter([100.0, 100.0, 107.0, 107.0])
+    engine.run.side_effect = [{"extractor_key": "Youtube", "id": "abc"}, "file.mp3"]
+    downloader = AudioDownloader(
+        download_dir=str(tmp_path), timeout=10, engine=engine, max_duration=3600
+    )
+
+    with patch("scraper.audio_downloader.time.monotonic", lambda: next(clock)):
+        assert downloader.download_audio("https://a.example/audio") == "file.mp3"
+
+    probe_timeout = engine.run.call_args_list[0].args[2]
+    download_timeout = engine.run.call_args_list[1].args[2]
+    assert (probe_timeout, download_timeout) == (10.0, 3.0)
+
+
+def test_download_audio_uses_the_given_deadline(tmp_path):
+    """Test that a caller's deadline replaces the per-file timeout."""
+    engine = MagicMock()
+    engine.run.return_value = "file.mp3"
+    downloader = AudioDownloader(download_dir=str(tmp_path), timeout=10, engine=engine)
+
+    with patch("scraper.audio_downloader.time.monotonic", lambda: 100.0):
+        assert (
+            downloader.download_audio("https://a.example/audio", deadline=104.0)
+            == "file.mp3"
+        )
+
+    assert engine.run.call_args.args[2] == 4.0
+
+
+def test_download_audio_uses_media_cache(tmp_path):
+    """Test that media found in the cache is published without downloading."""
+    cache = MediaCache(cache_dir=str(tmp_path / "cache"))
+    downloader = AudioDownloader(download_dir=str(tmp_path / "downloads"), cache=cache)
+    info = {"extractor_key": "Youtube", "id": "abc"}
+
+    def download(url, clip=None, deadline=None):
+        (tmp_path / "downloads" / "1234.mp3").write_bytes(b"audio")
+        return "1234.mp3"
+
+    with patch.object(downloader, "probe", return_value=info), patch.object(
+        downloader, "_download_audio", side_effect=download
+    ) as mock_download:
+        assert downloader.download_audio("https://a.example/watch") == "1234.mp3"
+        published = downloader.download_audio("https://b.example/embed")
+
+    mock_download.assert_called_once()
+    assert (tmp_path / "downloads" / published).read_bytes() == b"audio"
+    assert cache.stats()["hits"] == 1
+
+
+def test_media_locks_are_dropped_after_download(tmp_path):
+    """Test that the per-media lock is removed once no download needs it."""
+    cache = MediaCache(cache_dir=str(tmp_path / "cache"))
+    downloader = AudioDownloader(download_dir=str(tmp_path / "downloads"), cache=cache)
+    info = {"extractor_key": "Youtube", "id": "abc"}
+    started = threading.Event()
+    release = threading.Event()
+
+    def download(url, clip=None, deadline=None):
+        started.set()
+        release.wait(5)
+        (tmp_path / "downloads" / "1234.mp3").write_bytes(b"audio")
+        return "1234.mp3"
+
+    with patch.object(downloader, "probe", return_value=info), patch.object(
+        downloader, "_download_audio", side_effect=download
+    ) as mock_download:
+        threads = [
+            threading.Thread(target=downloader.download_audio, args=(url,))
+            for url in ("https://a.example/watch", "https://b.example/embed")
+        ]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        # Wait until the second download queues behind the first.
+        for _ in range(500):
+            if [count for _, count in downloader._key_locks.values()] == [2]:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+    mock_download.assert_called_once()
+    assert downloader._key_locks == {}
+
+
+@pytest.mark.parametrize(
+    "profile, key, codec, output_args",
+    [
+        ("mp3", "FFmpegExtractAudio", "mp3", None),
+        ("native", "FFmpegExtractAudio", "best", None),
+        (
+            "model",
+            "ModelAudio",
+            "flac",
+            {"extractaudio+ffmpeg_o": ["-ac", "1", "-ar", "22050"]},
+        ),
+    ],
+)
+def test_download_audio_profiles(tmp_path, profile, key, codec, output_args):
+    """Test that each profile configures a single ffmpeg audio extraction."""
+    downloader = AudioDownloader(
+        download_dir=str(tmp_path), profile=profile, sample_rate=22050
+    )
+
+    with patch.object(downloader, "_run", return_value="file") as mock_run:
+        downloader.download_audio("https://a.example/audio")
+
+    _, _, ydl_opts = mock_run.call_args.args
+    (postprocessor,) = ydl_opts["postprocessors"]
+    assert postprocessor["key"] == key
+    assert postprocessor["preferredcodec"] == codec
+    assert ydl_opts.get("postprocessor_args") == output_args
+
+
+def test_model_profile_reencodes_flac_sources(tmp_path):
+    """Test that a FLAC source is re-encoded, so it is downmixed and resampled."""
+    ydl = _youtube_dl({"quiet": True, **_profile_options("model", 16000)})
+    (postprocessor,) = ydl._pps["post_process"]
+    source = tmp_path / "source.flac"
+    source.write_bytes(b"flac")
+
+    with patch.object(FFmpegExtractAudioPP, "get_audio_codec", return_value="flac"):
+        with patch.object(FFmpegPostProcessor, "run_ffmpeg") as mock_ffmpeg:
+            with patch("os.replace"):
+                _, info = postprocessor.run({"filepath": str(source), "ext": "flac"})
+
+    _, path, temp_path, options = mock_ffmpeg.call_args.args
+    assert path == str(source)
+    assert temp_path == str(tmp_path / "source.temp.flac")
+    assert options[:3] == ["-vn", "-acodec", "flac"]
+    assert info["filepath"] == str(source)
+    assert postprocessor._configuration_args("ffmpeg", ["_o"]) == [
+        "-ac",
+        "1",
+        "-ar",
+        "16000",
+    ]
+
+
+def test_unknown_profile(tmp_path):
+    """Test that unknown profiles are rejected up front."""
+    with pytest.raises(ValueError):
+        AudioDownloader(download_dir=str(tmp_path), profile="wav")
+
+
+@pytest.mark.parametrize(
+    "duration, clip",
+    [(3600, (60, 90)), (70, (40, 70)), (20, None), (None, (60, 90))],
+)
+def test_clip_mode_downloads_only_the_window(tmp_path, duration, clip):
+    """Test that clip mode requests a download range inside the media."""
+    downloader = AudioDownloader(
+        download_dir=str(tmp_path), clip_seconds=30, clip_start=60
+    )
+    info = {"extractor_key": "Youtube", "id": "abc", "duration": duration}
+
+    with patch.object(downloader, "probe", return_value=info), patch.object(
+        downloader, "_run", return_value="file"
+    ) as mock_run:
+        downloader.download_audio("https://a.example/audio")
+
+    _, _, ydl_opts = mock_run.call_args.args
+    if clip is None:
+        assert "download_ranges" not in ydl_opts
+    else:
+        ranges = list(ydl_opts["download_ranges"](info, None))
+        assert ranges == [{"start_time": clip[0], "end_time": clip[1]}]
+
+
+@pytest.mark.parametrize(
+    "info",
+    [
+        {"duration": 10_000},
+        {"filesize_approx": 500 * 1024**2},
+        {"formats": [{"vcodec": "none", "filesize": 500 * 1024**2}]},
+        {"_type": "playlist", "entries": [{"duration": 10_000}]},
+    ],
+)
+def test_media_above_caps_is_skipped(tmp_path, info):
+    """Test that long or large media is skipped before any download."""
+    downloader = AudioDownloader(
+        download_dir=str(tmp_path), max_duration=3600, max_filesize=100 * 1024**2
+    )
+
+    with patch.object(downloader, "probe", return_value=info), patch.object(
+        downloader, "_download_audio"
+    ) as mock_download:
+        assert downloader.download_audio("https://a.example/audio") is None
+
+    mock_download.assert_not_called()
+
+
+@patch("yt_dlp.YoutubeDL")
+def test_traced_download_splits_download_and_transcode(MockYoutubeDL, tmp_path):
+    """Test that postprocessor hooks separate the transcode span."""
+    tracer = Tracer()
+    downloader = AudioDownloader(download_dir=str(tmp_path), tracer=tracer)
+    mock_ydl = MockYoutubeDL.return_value
+    mock_ydl.__enter__.return_value = mock_ydl
+    (tmp_path / "1234.mp3").touch()
+
+    def extract_info(url, download):
+        for status in ("started", "finished"):
+            for hook in MockYoutubeDL.call_args.args[0]["postprocessor_hooks"]:
+                hook({"postprocessor": "ExtractAudio", "status": status})
+        return {"requested_downloads": [{"filepath": f"{tmp_path}/1234.mp3"}]}
+
+    mock_ydl.extract_info.side_effect = extract_info
+
+    assert downloader.download_audio("https://a.example/audio") == "1234.mp3"
+
+    spans = [event for event in tracer.events() if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["download", "transcode"]
+    assert spans[0]["ts"] <= spans[1]["ts"]
+    assert spans[1]["args"] == {"url": "https://a.example/audio"}
@@ -0,0 +1,109 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from scraper.browser_pool import BrowserPool, BrowserPoolTimeout
+
+
+def make_session():
+    session = MagicMock()
+    session.pages_visited = 0
+    session.memory_usage.return_value = 0
+    session.is_healthy.return_value = True
+    return session
+
+
+@pytest.fixture
+def sessions():
+    return []
+
+
+@pytest.fixture
+def pool(sessions):
+    def factory():
+        session = make_session()
+        sessions.append(session)
+        return session
+
+    pool = BrowserPool(
+        size=2, max_pages_per_browser=3, max_memory_mb=100, session_factory=factory
+    )
+    pool.start()
+    # Sessions are launched in the background; wait until every one is idle.
+    deadline = time.monotonic() + 5
+    while pool.stats()["idle"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield pool
+    pool.close()
+
+
+def test_acquire_returns_prelaunched_session(pool, sessions):
+    """Test that leases are served from the pre-launched sessions."""
+    first = pool.acquire(timeout=5)
+    second = pool.acquire(timeout=5)
+
+    assert first is not second
+    assert len(sessions) == 2
+    assert pool.stats()["leased"] == 2
+    assert pool.stats()["launch_time"]["count"] == 2
+
+
+def test_acquire_times_out_when_exhausted(pool):
+    """Test that acquire raises once every session is leased."""
+    pool.acquire(timeout=5)
+    pool.acquire(timeout=5)
+
+    with pytest.raises(BrowserPoolTimeout):
+        pool.acquire(timeout=0.1)
+
+
+def test_release_resets_session(pool):
+    """Test that a released session is reset and can be leased again."""
+    session = pool.acquire(timeout=5)
+    pool.release(session)
+
+    session.reset.assert_called_once()
+    assert pool.stats()["idle"] == 2
+    assert pool.stats()["lease_wait"]["count"] == 1
+
+
+def test_release_recycles_after_page_limit(pool, sessions):
+    """Test that a session is relaunched once it reaches the page limit."""
+    session = pool.acquire(timeout=5)
+    session.pages_visited = 3
+    pool.release(session)
+
+    session.close.assert_called_once()
+    session.reset.assert_not_called()
+    assert len(sessions) == 3
+    assert pool.stats()["recycled"] == 1
+    assert pool.stats()["idle"] == 2
+
+
+def test_release_recycles_on_memory_threshold(pool, sessions):
+    """Test that a session is relaunched once it exceeds the memory budget."""
+    session = pool.acquire(timeout=5)
+    session.memory_usage.return_value = 200 * 1024 * 1024
+    pool.release(session)
+
+    session.close.assert_called_once()
+    assert pool.stats()["recycled"] == 1
+
+
+def test_unhealthy_session_is_replaced_on_acquire(sessions):
+    """Test that acquire never hands out a session failing its health check."""
+
+    def factory():
+        session = make_session()
+        session.is_healthy.return_value = len(sessions) > 0
+        sessions.append(session)
+        return session
+
+    pool = BrowserPool(size=1, session_factory=factory)
+    pool.start()
+    session = pool.acquire(timeout=5)
+
+    assert session is sessions[1]
+    sessions[0].close.assert_called_once()
+    pool.close()
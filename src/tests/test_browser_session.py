@@ -1,8 +1,12 @@
-from unittest.mock import MagicMock, patch
+import json
+import re
+from unittest.mock import MagicMock, PropertyMock, patch
 
 import pytest
+from selenium.common.exceptions import WebDriverException
 
-from scraper.browser_session import BrowserSession
+from scraper.browser_session import BrowserSession, NavigationError
+from scraper.load_profile import LoadProfile
 
 
 @pytest.fixture
@@ -10,7 +14,7 @@ def browser_session():
     with patch("selenium.webdriver.Chrome") as MockChrome:
         mock_driver = MagicMock()
         MockChrome.return_value = mock_driver
-        session = BrowserSession()
+        session = BrowserSession(load_profile=LoadProfile.full())
         yield session, mock_driver
         session.close()
 
@@ -33,3 +37,189 @@ def test_close(browser_session):
     session, mock_driver = browser_session
     session.close()
     mock_driver.quit.assert_called_once()
+
+
+def test_reset_clears_state(browser_session):
+    session, mock_driver = browser_session
+    mock_driver.window_handles = ["main", "popup"]
+    session.visit("https://example.com/page")
+    session.reset()
+
+    mock_driver.switch_to.window.assert_any_call("popup")
+    mock_driver.close.assert_called_once()
+    mock_driver.get.assert_called_with("about:blank")
+    mock_driver.delete_all_cookies.assert_called_once()
+    mock_driver.execute_cdp_cmd.assert_called_once_with(
+        "Storage.clearDataForOrigin",
+        {"origin": "https://example.com", "storageTypes": "all"},
+    )
+    assert session.visited_origins == set()
+
+
+def perf_entry(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def test_lean_profile_blocks_resources():
+    """Test that the lean profile blocks images, fonts and trackers per tab."""
+    with patch("selenium.webdriver.Chrome") as MockChrome:
+        mock_driver = MockChrome.return_value
+        BrowserSession(load_profile=LoadProfile.lean(["ads.example"]))
+
+    options = MockChrome.call_args.kwargs["options"]
+    assert options.page_load_strategy == "eager"
+    assert options.experimental_options["prefs"] == {
+        "profile.managed_default_content_settings.images": 2
+    }
+    blocked = mock_driver.execute_cdp_cmd.call_args_list[-1].args[1]["urls"]
+    assert "*.woff2" in blocked
+    assert "*://*.ads.example/*" in blocked
+    assert "*://*.google-analytics.com/*" in blocked
+
+
+def blocked_by_patterns(url, patterns):
+    # Network.setBlockedURLs patterns only know "*" as a wildcard.
+    return any(
+        re.fullmatch(".*".join(map(re.escape, pattern.split("*"))), url)
+        for pattern in patterns
+    )
+
+
+def test_lean_profile_blocks_extensionless_urls_by_type_or_domain():
+    """Test which extensionless resources the lean profile still blocks."""
+    profile = LoadProfile.lean()
+
+    assert blocked_by_patterns("https://cdn.example/app.css?v=2", profile.blocked_urls)
+    assert blocked_by_patterns(
+        "https://www.google-analytics.com/g/collect", profile.blocked_urls
+    )
+    # Images are blocked by the content setting whatever their URL; fonts and
+    # stylesheets without an extension are not matched and still load.
+    assert not blocked_by_patterns(
+        "https://img.example/photo?id=1", profile.blocked_urls
+    )
+    assert profile.block_images
+    assert blocked_by_patterns(
+        "https://fonts.googleapis.com/css2?family=Inter", profile.blocked_urls
+    )
+    assert not blocked_by_patterns("https://cdn.example/styles", profile.blocked_urls)
+
+
+def test_visit_reports_transferred_bytes(browser_session):
+    """Test that bytes and blocked requests of the visited page are reported."""
+    session, mock_driver = browser_session
+    mock_driver.get_log.side_effect = [
+        [perf_entry("Network.loadingFinished", encodedDataLength=999)],
+        [
+            perf_entry("Network.loadingFinished", encodedDataLength=1000),
+            perf_entry("Network.loadingFinished", encodedDataLength=500),
+            perf_entry("Network.loadingFailed", blockedReason="inspector"),
+            {"message": "not json"},
+        ],
+        [],
+    ]
+
+    session.visit("https://example.com")
+
+    assert session.last_page_bytes == 1500
+    assert session.last_blocked_requests == 1
+
+
+def test_visit_sniffs_media_responses(browser_session):
+    """Test that media responses are classified, manifests first."""
+    session, mock_driver = browser_session
+
+    def response(url, mime_type):
+        return perf_entry(
+            "Network.responseReceived", response={"url": url, "mimeType": mime_type}
+        )
+
+    mock_driver.get_log.side_effect = [
+        [],
+        [
+            response("https://cdn.example/track.mp3", "audio/mpeg"),
+            response("https://cdn.example/track.mp3", "audio/mpeg"),
+            response("https://cdn.example/segment1.ts", "video/mp2t"),
+            response("https://ads.example/preroll.mp4", "video/mp4"),
+            response("https://cdn.example/live.m3u8?token=1", "text/plain"),
+            response("https://cdn.example/app.js", "application/javascript"),
+            response("blob:https://example.com/1", "audio/mp4"),
+        ],
+        [],
+    ]
+
+    session.visit("https://example.com")
+
+    assert session.last_media_urls == [
+        "https://cdn.example/live.m3u8?token=1",
+        "https://cdn.example/track.mp3",
+    ]
+    assert session.last_video_urls == ["https://ads.example/preroll.mp4"]
+
+
+def test_visit_skips_unresolvable_host(browser_session):
+    """Test that DNS errors are neither retried nor recovered from."""
+    session, mock_driver = browser_session
+    mock_driver.get.side_effect = WebDriverException(
+        "unknown error: net::ERR_NAME_NOT_RESOLVED"
+    )
+
+    with pytest.raises(NavigationError):
+        session.visit("https://missing.example")
+
+    mock_driver.get.assert_called_once()
+    assert session.recoveries == {}
+
+
+def test_visit_skips_client_errors(browser_session):
+    """Test that a 404 document raises NavigationError without retries."""
+    session, mock_driver = browser_session
+    mock_driver.get_log.side_effect = [
+        [],
+        [
+            perf_entry(
+                "Network.responseReceived",
+                type="Document",
+                response={"url": "https://example.com/gone", "status": 404},
+            )
+        ],
+    ]
+
+    with pytest.raises(NavigationError, match="HTTP 404"):
+        session.visit("https://example.com/gone")
+
+    mock_driver.get.assert_called_once()
+
+
+@patch("scraper.browser_session.time.sleep")
+def test_recovery_escalates(sleep, browser_session):
+    """Test that failures open a new tab, then a new context, then restart."""
+    session, mock_driver = browser_session
+    mock_driver.window_handles = ["CDwindow-old", "new"]
+    mock_driver.execute_cdp_cmd.side_effect = lambda command, params: {
+        "Target.createBrowserContext": {"browserContextId": "context"},
+        "Target.createTarget": {"targetId": "new"},
+    }.get(command, {})
+    mock_driver.get.side_effect = WebDriverException("timeout")
+
+    with pytest.raises(WebDriverException):
+        session.visit("https://example.com")
+    assert session.recoveries == {"retry": 2, "new_tab": 1}
+    assert [call.args[0] for call in sleep.call_args_list] == [0.5, 1.0]
+    mock_driver.execute_cdp_cmd.assert_any_call(
+        "Target.closeTarget", {"targetId": "old"}
+    )
+
+    with pytest.raises(WebDriverException):
+        session.visit("https://example.com")
+    assert session.recoveries["new_context"] == 1
+    mock_driver.switch_to.window.assert_called_with("new")
+
+    with patch("selenium.webdriver.Chrome") as MockChrome:
+        type(mock_driver).window_handles = PropertyMock(
+            side_effect=WebDriverException("gone")
+        )
+        with pytest.raises(WebDriverException):
+            session.visit("https://example.com")
+    assert session.recoveries["restart"] == 1
+    assert session.driver is MockChrome.return_value
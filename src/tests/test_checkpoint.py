@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from scraper.checkpoint import CheckpointStore, read_checkpoint, write_checkpoint
+from scraper.frontier import url_fingerprint
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints"), interval=2)
+
+
+def test_write_and_read_checkpoint(tmp_path):
+    """Test that a checkpoint round-trips its job, state and 64-bit fingerprints."""
+    path = str(tmp_path / "a.ckpt")
+    fingerprints = [url_fingerprint(f"https://example.com/{i}") for i in range(100)]
+    write_checkpoint(path, {"analysisId": "a"}, {"pages": 3}, fingerprints)
+
+    job, state, seen = read_checkpoint(path)
+    assert job == {"analysisId": "a"}
+    assert state == {"pages": 3}
+    assert list(seen) == fingerprints
+    # Only the owner may read the bearer token inside.
+    assert os.stat(path).st_mode & 0o077 == 0
+    assert os.listdir(tmp_path) == ["a.ckpt"]
+
+
+def test_checkpoint_save_load_and_remove(store):
+    """Test that a checkpoint is loaded by the same analysis only."""
+    checkpoint = store.checkpoint("analysis/1", {"analysisId": "analysis/1"})
+    assert checkpoint.load() is None
+
+    checkpoint.save({"pages": 1}, [1, 2])
+    state, fingerprints = checkpoint.load()
+    assert state == {"pages": 1}
+    assert list(fingerprints) == [1, 2]
+    assert checkpoint.stats()["writes"] == 1
+    other = store.checkpoint("analysis_1", {"analysisId": "analysis_1"})
+    assert other.path == checkpoint.path
+    assert other.load() is None
+
+    checkpoint.remove()
+    checkpoint.remove()
+    assert checkpoint.load() is None
+
+
+def test_unfinished_skips_unreadable_files(store):
+    """Test that the jobs of every readable checkpoint are listed for resuming."""
+    store.checkpoint("b", {"analysisId": "b"}).save({}, [])
+    store.checkpoint("a", {"analysisId": "a"}).save({}, [])
+    with open(os.path.join(store.directory, "broken.ckpt"), "wb") as file:
+        file.write(b"garbage")
+
+    assert store.unfinished() == [{"analysisId": "a"}, {"analysisId": "b"}]
+
+
+def test_from_env(tmp_path, monkeypatch):
+    """Test that checkpoints are opt-in and an interval of 0 disables them."""
+    monkeypatch.setenv("CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.delenv("CHECKPOINT_INTERVAL", raising=False)
+    assert CheckpointStore.from_env() is None
+    monkeypatch.setenv("CHECKPOINT_INTERVAL", "3")
+    store = CheckpointStore.from_env()
+    assert store.interval == 3
+    assert os.path.isdir(store.directory)
+    monkeypatch.setenv("CHECKPOINT_INTERVAL", "0")
+    assert CheckpointStore.from_env() is None
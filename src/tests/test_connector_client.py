@@ -0,0 +1,245 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+from scraper.connector_client import ConnectorClient
+
+HEADERS = {"Authorization": "Bearer token"}
+
+
+class FakeConnector:
+    def __init__(self):
+        self.requests = []
+        self.failures = 0
+        self.predictions = []
+        self.report_failures = 0
+        self.report_status = 500
+
+    async def predictions_handler(self, request):
+        self.requests.append(("GET", request.path, await request.json()))
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=503)
+        return web.json_response(self.predictions)
+
+    async def update_handler(self, request):
+        self.requests.append(("PUT", request.path, await request.json()))
+        return web.json_response({})
+
+    async def report_handler(self, request):
+        self.requests.append(("POST", request.path, await request.json()))
+        if self.report_failures:
+            self.report_failures -= 1
+            return web.Response(status=self.report_status)
+        return web.json_response({})
+
+
+@pytest.fixture
+def fake_connector():
+    fake = FakeConnector()
+    app = web.Application()
+    app.router.add_get("/predictions/model/{model}", fake.predictions_handler)
+    app.router.add_put("/analyses/{analysis_id}/predictions", fake.update_handler)
+    app.router.add_post("/scraper/report", fake.report_handler)
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    yield fake, f"http://127.0.0.1:{port}"
+
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def client(fake_connector):
+    _, base_url = fake_connector
+    client = ConnectorClient(base_url, retries=2, backoff=0.01, write_interval=0.05)
+    yield client
+    client.close()
+
+
+def test_find_predictions_maps_links(fake_connector, client):
+    """Test that predictions are returned keyed by their link."""
+    fake, _ = fake_connector
+    fake.predictions = [{"link": "https://a.example"}, {"link": "https://b.example"}]
+
+    predictions = client.find_predictions(
+        "model", ["https://a.example", "https://b.example"], HEADERS
+    )
+
+    assert set(predictions) == {"https://a.example", "https://b.example"}
+    assert fake.requests == [
+        (
+            "GET",
+            "/predictions/model/model",
+            {"links": ["https://a.example", "https://b.example"]},
+        )
+    ]
+
+
+def test_find_predictions_retries_unavailable(fake_connector, client):
+    """Test that 503 responses are retried with backoff."""
+    fake, _ = fake_connector
+    fake.failures = 2
+
+    assert client.find_predictions("model", ["https://a.example"], HEADERS) == {}
+    assert len(fake.requests) == 3
+
+
+def test_find_predictions_gives_up_after_retries(fake_connector, client):
+    """Test that None is returned when every attempt fails."""
+    fake, _ = fake_connector
+    fake.failures = 5
+
+    assert client.find_predictions("model", ["https://a.example"], HEADERS) is None
+    assert len(fake.requests) == 3
+
+
+def test_update_predictions_are_merged(fake_connector, client):
+    """Test that updates for one analysis are merged into a single PUT."""
+    fake, _ = fake_connector
+
+    client.update_predictions("analysis", [{"link": "a"}], HEADERS)
+    client.update_predictions("analysis", [{"link": "b"}], HEADERS)
+    client.update_predictions("other", [{"link": "c"}], HEADERS)
+    client.flush()
+
+    assert sorted(fake.requests, key=lambda request: request[1]) == [
+        (
+            "PUT",
+            "/analyses/analysis/predictions",
+            {"predictionResults": [{"link": "a"}, {"link": "b"}]},
+        ),
+        ("PUT", "/analyses/other/predictions", {"predictionResults": [{"link": "c"}]}),
+    ]
+
+
+def test_send_report(fake_connector, client):
+    """Test that the report is posted and its outcome returned."""
+    fake, _ = fake_connector
+
+    assert client.send_report("analysis", [{"filePath": "a.mp3"}], HEADERS)
+    assert fake.requests == [
+        (
+            "POST",
+            "/scraper/report",
+            {"analysisId": "analysis", "files": [{"filePath": "a.mp3"}]},
+        )
+    ]
+
+
+def test_unreachable_connector():
+    """Test that connection errors are reported as failures, not exceptions."""
+    client = ConnectorClient("http://127.0.0.1:9", retries=1, backoff=0.01)
+    try:
+        assert client.find_predictions("model", ["https://a.example"], HEADERS) is None
+        assert not client.send_report("analysis", [], HEADERS)
+    finally:
+        client.close()
+
+
+def test_streamed_files_are_batched_before_the_summary(fake_connector):
+    """Test that files go out in batches and the summary comes last."""
+    fake, base_url = fake_connector
+    client = ConnectorClient(base_url, write_interval=30, report_batch_size=2)
+    try:
+        client.stream_files("analysis", [{"filePath": "a.mp3"}], HEADERS)
+        client.stream_files("analysis", [{"filePath": "b.mp3"}], HEADERS)
+        client.stream_files("analysis", [{"filePath": "c.mp3"}], HEADERS)
+
+        assert client.complete_report("analysis", 3, HEADERS)
+    finally:
+        client.close()
+
+    *partial, summary = [body for _, _, body in fake.requests]
+    assert sorted(partial, key=lambda body: len(body["files"])) == [
+        {
+            "analysisId": "analysis",
+            "files": [{"filePath": "c.mp3"}],
+            "completed": False,
+        },
+        {
+            "analysisId": "analysis",
+            "files": [{"filePath": "a.mp3"}, {"filePath": "b.mp3"}],
+            "completed": False,
+        },
+    ]
+    assert summary == {
+        "analysisId": "analysis",
+        "files": [],
+        "completed": True,
+        "totalFiles": 3,
+    }
+
+
+def test_failed_partial_report_is_resent_with_the_summary(fake_connector):
+    """Test that files of a failed partial report are resent with the summary."""
+    fake, base_url = fake_connector
+    fake.report_failures = 1
+    client = ConnectorClient(base_url, retries=0, write_interval=30)
+    try:
+        client.stream_files("analysis", [{"filePath": "a.mp3"}], HEADERS)
+        assert client.complete_report("analysis", 1, HEADERS)
+    finally:
+        client.close()
+
+    assert [body for _, _, body in fake.requests] == [
+        {
+            "analysisId": "analysis",
+            "files": [{"filePath": "a.mp3"}],
+            "completed": False,
+        },
+        {
+            "analysisId": "analysis",
+            "files": [{"filePath": "a.mp3"}],
+            "completed": True,
+            "totalFiles": 1,
+        },
+    ]
+
+
+@pytest.mark.parametrize("failures, lost", [(1, 0), (2, 1)])
+def test_send_undelivered_resends_without_completing(fake_connector, failures, lost):
+    """Test that undelivered files are resent once and the lost ones counted."""
+    fake, base_url = fake_connector
+    fake.report_failures = failures
+    client = ConnectorClient(base_url, retries=0, write_interval=30)
+    try:
+        client.stream_files("analysis", [{"filePath": "a.mp3"}], HEADERS)
+        assert client.send_undelivered("analysis", HEADERS) == lost
+        assert client.send_undelivered("analysis", HEADERS) == 0
+    finally:
+        client.close()
+
+    assert len(fake.requests) == 2
+    assert not any(body["completed"] for _, _, body in fake.requests)
+
+
+def test_report_is_not_retried_after_server_error(fake_connector, client):
+    """Test that a report POST is not resent once the connector may have taken it."""
+    fake, _ = fake_connector
+    fake.report_failures = 1
+
+    assert not client.send_report("analysis", [{"filePath": "a.mp3"}], HEADERS)
+    assert len(fake.requests) == 1
+
+
+def test_report_is_retried_when_rejected(fake_connector, client):
+    """Test that a report POST rejected as unavailable is sent again."""
+    fake, _ = fake_connector
+    fake.report_failures = 1
+    fake.report_status = 503
+
+    assert client.send_report("analysis", [{"filePath": "a.mp3"}], HEADERS)
+    assert len(fake.requests) == 2
@@ -0,0 +1,196 @@
+import multiprocessing
+import time
+
+import pytest
+
+from scraper.crawl_state import CrawlState, SqliteCrawlState
+
+
+def open_state(path, owner, max_pages=10, max_files=10, lease_seconds=600):
+    return SqliteCrawlState(
+        str(path),
+        "analysis",
+        max_pages,
+        max_files,
+        owner=owner,
+        lease_seconds=lease_seconds,
+    )
+
+
+@pytest.fixture
+def db(tmp_path):
+    return tmp_path / "state" / "crawl.sqlite"
+
+
+def test_incomplete_backend_cannot_be_created():
+    """Test that a backend missing part of the interface cannot be created."""
+
+    class PushOnly(CrawlState):
+        def push(self, url, depth, score=0.0):
+            return True
+
+    with pytest.raises(TypeError, match="claim"):
+        PushOnly()
+
+
+def test_push_deduplicates_across_workers(db):
+    """Test that a URL queued by one worker is not queued again by another."""
+    first = open_state(db, "a")
+    second = open_state(db, "b")
+
+    assert first.push("https://a.example/", 0)
+    assert not second.push("https://a.example/", 0)
+    assert second.push_many(
+        [("https://a.example/", 1, 0.0), ("https://a.example/x", 1, 0.0)] * 2
+    ) == ["https://a.example/x"]
+    assert first.stats()["queued"] == 2
+
+
+def test_claim_order_and_page_budget(db):
+    """Test that claims follow the score, then FIFO, and stop at max_pages."""
+    state = open_state(db, "a", max_pages=2)
+    state.push_many([("low", 1, 0.0), ("high", 1, 5.0), ("also-low", 1, 0.0)])
+
+    assert state.claim() == ("high", 1)
+    assert state.claim() == ("low", 1)
+    assert state.claim() is None
+    assert state.stats()["pages"] == 2
+    # Pages still leased may add links, so the crawl is not over yet.
+    assert state.has_work()
+    state.complete("high")
+    state.complete("low")
+    assert not state.has_work()
+
+
+def test_other_worker_claims_expired_lease_without_counting(db):
+    """Test that a dead worker's page is claimed again once its lease expires."""
+    dead = open_state(db, "dead", max_pages=1, lease_seconds=-1)
+    alive = open_state(db, "alive", max_pages=1)
+    dead.push("https://a.example/", 0)
+
+    assert dead.claim() == ("https://a.example/", 0)
+    assert alive.claim() == ("https://a.example/", 0)
+    assert alive.stats()["pages"] == 1
+    alive.complete("https://a.example/")
+    assert alive.stats()["done"] == 1
+
+
+def test_leave_releases_leases(db):
+    """Test that pages leased by a leaving worker become claimable at once."""
+    first = open_state(db, "a")
+    second = open_state(db, "b")
+    first.join()
+    second.join()
+    first.push("https://a.example/", 0)
+    first.claim()
+
+    assert second.claim() is None
+    assert first.leave(0) is None
+    assert second.claim() == ("https://a.example/", 0)
+
+
+def test_file_slots_are_shared(db):
+    """Test that files found plus leased slots never exceed max_files."""
+    first = open_state(db, "a", max_files=2)
+    second = open_state(db, "b", max_files=2)
+
+    one = first.reserve_file()
+    two = second.reserve_file()
+    assert one and two
+    assert first.reserve_file() is None
+    first.release_file(one, found=False)
+    three = second.reserve_file()
+    second.release_file(two, found=True)
+    second.release_file(three, found=True)
+
+    assert not first.files_left()
+    assert first.reserve_file() is None
+    first.push("https://a.example/", 0)
+    # No more pages are visited once enough files were found.
+    assert first.claim() is None
+    assert not first.has_work()
+
+
+def test_last_worker_to_leave_gets_total(db):
+    """Test that only the last worker leaving gets the files of all workers."""
+    first = open_state(db, "a")
+    second = open_state(db, "b")
+    first.join()
+    second.join()
+
+    assert first.leave(2) is None
+    assert second.leave(3) == 5
+    second.finish()
+    assert second.leave(0) is None
+
+
+def test_completed_analysis_is_not_crawled_again(db):
+    """Test that a worker joining a completed analysis finds no work."""
+    first = open_state(db, "a")
+    first.join()
+    first.push("https://a.example/", 0)
+    assert first.leave(0) == 0
+    first.finish()
+
+    late = open_state(db, "late")
+    late.join()
+    assert not late.push("https://a.example/", 0)
+    assert late.claim() is None
+    assert not late.has_work()
+    assert late.reserve_file() is None
+    assert late.leave(1) is None
+    assert late.stats()["completed"]
+
+
+def test_heartbeat_keeps_slow_worker_registered(db):
+    """Test that a worker that claims no pages for a while is not taken for dead."""
+    fast = open_state(db, "fast", lease_seconds=0.2)
+    slow = open_state(db, "slow", lease_seconds=0.2)
+    fast.join()
+    slow.join()
+    time.sleep(0.5)
+
+    assert fast.leave(1) is None
+    assert slow.leave(2) == 3
+
+
+def crawl_worker(path, owner, claimed):
+    state = open_state(path, owner, max_pages=40)
+    state.join()
+    while True:
+        page = state.claim()
+        if page is None:
+            if not state.has_work():
+                break
+            continue
+        url, depth = page
+        claimed.put(url)
+        index = int(url.rsplit("/", 1)[-1])
+        state.push_many(
+            [
+                (f"https://a.example/{child}", depth + 1, 0.0)
+                for child in (2 * index + 1, 2 * index + 2)
+            ]
+        )
+        state.complete(url)
+    state.leave(0)
+
+
+def test_processes_cooperate_without_duplicate_visits(db):
+    """Test that worker processes visit each page once and stop at max_pages."""
+    open_state(db, "seed", max_pages=40).push("https://a.example/0", 0)
+    context = multiprocessing.get_context("spawn")
+    claimed = context.Queue()
+    workers = [
+        context.Process(target=crawl_worker, args=(str(db), f"w{i}", claimed))
+        for i in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    urls = [claimed.get(timeout=10) for _ in range(40)]
+    assert len(set(urls)) == 40
+    assert claimed.empty()
+    assert open_state(db, "seed").stats()["pages"] == 40
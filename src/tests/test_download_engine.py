@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+from scraper.download_engine import (
+    DownloadTimeout,
+    ProcessDownloadEngine,
+    WorkerCrashed,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = ProcessDownloadEngine(workers=1)
+    yield engine
+    engine.close()
+
+
+def test_run_returns_result_in_worker_process(engine):
+    """Test that tasks run in a separate, reused worker process."""
+    first_pid = engine.run(os.getpid, (), timeout=30)
+    second_pid = engine.run(os.getpid, (), timeout=30)
+
+    assert first_pid != os.getpid()
+    assert first_pid == second_pid
+    assert engine.spawned == 1
+
+
+def test_run_kills_worker_on_timeout(engine):
+    """Test that a task past its deadline is killed instead of awaited."""
+    engine.run(os.getpid, (), timeout=30)
+
+    started = time.monotonic()
+    with pytest.raises(DownloadTimeout):
+        engine.run(time.sleep, (30,), timeout=0.5)
+
+    assert time.monotonic() - started < 10
+    assert engine.killed == 1
+    assert engine.run(os.getpid, (), timeout=30) != os.getpid()
+    assert engine.spawned == 2
+
+
+def test_run_reports_task_errors(engine):
+    """Test that exceptions raised by a task are re-raised in the caller."""
+    with pytest.raises(RuntimeError, match="FileNotFoundError"):
+        engine.run(os.stat, ("/does/not/exist",), timeout=30)
+
+
+def test_run_detects_crashed_worker(engine):
+    """Test that a worker dying mid-task is reported and replaced."""
+    with pytest.raises(WorkerCrashed):
+        engine.run(os._exit, (1,), timeout=30)
+
+    assert engine.run(os.getpid, (), timeout=30) != os.getpid()
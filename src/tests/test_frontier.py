@@ -0,0 +1,122 @@
+import pytest
+
+from scraper.frontier import CrawlFrontier, PriorityFrontier, url_fingerprint
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = CrawlFrontier(memory_budget=4, spill_dir=str(tmp_path))
+    yield frontier
+    frontier.close()
+
+
+def test_fingerprint_is_64_bit():
+    """Test that URL fingerprints are stable 64-bit integers."""
+    fingerprint = url_fingerprint("https://example.com")
+    assert fingerprint == url_fingerprint("https://example.com")
+    assert 0 <= fingerprint < 2**64
+    assert fingerprint != url_fingerprint("https://example.com/")
+
+
+def test_push_pop_is_fifo(frontier):
+    """Test that URLs are dequeued in the order they were enqueued."""
+    frontier.push("https://example.com/a", 0)
+    frontier.push("https://example.com/b", 1)
+
+    assert frontier.pop() == ("https://example.com/a", 0)
+    assert frontier.pop() == ("https://example.com/b", 1)
+    assert not frontier
+
+
+def test_push_dedupes_queued_and_visited(frontier):
+    """Test that a URL is rejected whether it is still queued or already visited."""
+    assert frontier.push("https://example.com/a", 0)
+    assert not frontier.push("https://example.com/a", 1)
+
+    frontier.pop()
+    assert not frontier.push("https://example.com/a", 2)
+    assert frontier.seen("https://example.com/a")
+    assert len(frontier) == 0
+
+
+def test_spills_to_disk_past_memory_budget(frontier):
+    """Test that URLs beyond the memory budget are spilled and read back in order."""
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    for depth, url in enumerate(urls):
+        frontier.push(url, depth)
+
+    assert len(frontier._queue) == 4
+    assert len(frontier) == 10
+    assert list(frontier) == [(url, depth) for depth, url in enumerate(urls)]
+
+    popped = [frontier.pop() for _ in range(7)]
+    frontier.push("https://example.com/late", 99)
+    popped += [frontier.pop() for _ in range(4)]
+
+    assert popped == [(url, depth) for depth, url in enumerate(urls)] + [
+        ("https://example.com/late", 99)
+    ]
+    assert not frontier
+
+
+def test_priority_frontier_pops_best_first():
+    """Test that higher scores leave first and equal scores in FIFO order."""
+    frontier = PriorityFrontier()
+    frontier.push("https://example.com/about", 1, -3.0)
+    frontier.push("https://example.com/a", 1)
+    frontier.push("https://example.com/episode/1", 2, 2.0)
+    frontier.push("https://example.com/b", 1)
+    assert not frontier.push("https://example.com/a", 1, 5.0)
+
+    expected = [
+        ("https://example.com/episode/1", 2),
+        ("https://example.com/a", 1),
+        ("https://example.com/b", 1),
+        ("https://example.com/about", 1),
+    ]
+    assert list(frontier) == expected
+    assert [frontier.pop() for _ in range(4)] == expected
+    assert not frontier
+
+
+def test_priority_frontier_drops_lowest_scores():
+    """Test that the lowest scored URLs are dropped past twice the budget."""
+    frontier = PriorityFrontier(memory_budget=2)
+    for score in range(4):
+        frontier.push(f"https://example.com/{score}", 1, score)
+
+    assert len(frontier) == 2
+    assert frontier.dropped == 2
+    assert frontier.pop() == ("https://example.com/3", 1)
+    assert frontier.seen("https://example.com/0")
+
+
+def test_restore_from_entries(frontier):
+    """Test that a frontier restored from its entries keeps order and seen URLs."""
+    for i in range(6):
+        frontier.push(f"https://example.com/{i}", 1)
+    entries = frontier.entries(5)
+    assert [url for url, _, _ in entries] == [
+        f"https://example.com/{i}" for i in range(5)
+    ]
+
+    restored = CrawlFrontier(memory_budget=2, spill_dir=frontier.spill_dir)
+    restored.restore(entries, frontier.fingerprints())
+    assert list(restored) == [(f"https://example.com/{i}", 1) for i in range(5)]
+    assert restored.seen("https://example.com/5")
+    assert not restored.push("https://example.com/5", 1)
+    restored.close()
+
+
+def test_priority_restore_keeps_scores():
+    """Test that a restored priority frontier pops its best entries in order."""
+    frontier = PriorityFrontier()
+    for url, score in (("a", 1.0), ("b", 3.0), ("c", 2.0)):
+        frontier.push(url, 1, score)
+
+    restored = PriorityFrontier()
+    restored.restore(frontier.entries(2), frontier.fingerprints())
+    assert restored.pop() == ("b", 1)
+    assert restored.pop() == ("c", 1)
+    assert not restored
+    assert restored.seen("a")
@@ -1,10 +1,11 @@
 from unittest.mock import MagicMock
 
 import pytest
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 
 # Adjust the import path if needed
-from scraper.link_extractor import LinkExtractor
+from scraper.link_extractor import EXTRACTION_SCRIPT, LinkExtractor, PageLinks
 
 
 @pytest.fixture
@@ -102,3 +103,41 @@ def test_extract_links_no_links(link_extractor, mock_browser_session):
     # Expect an empty set when no links are found
     assert links == set()
     mock_browser_session.get_elements.assert_called_once_with(By.TAG_NAME, "a")
+
+
+def test_extract_page_single_script_call(link_extractor, mock_browser_session):
+    """Test that all URLs are collected from one execute_script round trip."""
+    mock_browser_session.execute_script.return_value = {
+        "links": ["https://example.com/page1", "https://example.com/page1", ""],
+        "anchorText": {"https://example.com/page1": "Episode 1", "": "Empty"},
+        "iframes": ["https://www.youtube.com/embed/abc", ""],
+        "media": ["https://example.com/audio.mp3", ""],
+        "metaMedia": ["https://example.com/og.mp4"],
+    }
+
+    page = link_extractor.extract_page("https://example.com")
+
+    assert page == PageLinks(
+        links={"https://example.com/page1"},
+        anchor_text={"https://example.com/page1": "Episode 1"},
+        iframes={"https://www.youtube.com/embed/abc"},
+        media={"https://example.com/audio.mp3"},
+        meta_media={"https://example.com/og.mp4"},
+    )
+    mock_browser_session.execute_script.assert_called_once_with(EXTRACTION_SCRIPT)
+    mock_browser_session.get_elements.assert_not_called()
+
+
+def test_extract_links_falls_back_when_script_fails(
+    link_extractor, mock_browser_session
+):
+    """Test that per-element extraction is used only when scripting fails."""
+    mock_browser_session.execute_script.side_effect = WebDriverException("no JS")
+    mock_anchor = MagicMock()
+    mock_anchor.get_attribute.return_value = "/page1"
+    mock_browser_session.get_elements.return_value = [mock_anchor]
+
+    links = link_extractor.extract_links("https://example.com")
+
+    assert links == {"https://example.com/page1"}
+    mock_browser_session.get_elements.assert_called_once_with(By.TAG_NAME, "a")
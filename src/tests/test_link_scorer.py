@@ -0,0 +1,37 @@
+from scraper.link_extractor import PageLinks
+from scraper.link_scorer import LinkScorer
+
+
+def test_media_links_outrank_navigation():
+    """Test that episode, watch and extractor URLs score above legal pages."""
+    scorer = LinkScorer()
+
+    episode = scorer.score("https://example.com/episodes/42-pilot", 1)
+    watch = scorer.score("https://www.youtube.com/watch?v=dQw4w9WgXcQ", 1)
+    article = scorer.score("https://example.com/news/today", 1)
+    privacy = scorer.score("https://example.com/privacy", 1)
+
+    assert watch > episode > article > privacy
+
+
+def test_anchor_text_and_parent_yield_raise_scores():
+    """Test that media wording and a parent page with media raise the score."""
+    scorer = LinkScorer()
+    url = "https://example.com/item/7"
+    parent = PageLinks(media={"https://example.com/a.mp3"}, sniffed_media=["x"])
+
+    plain = scorer.score(url, 1)
+    listen = scorer.score(url, 1, "Listen now")
+    login = scorer.score(url, 1, "Log in")
+
+    assert scorer.parent_yield(parent) == 2 / 3
+    assert scorer.score(url, 1, parent_yield=scorer.parent_yield(parent)) > plain
+    assert login < plain < listen
+    assert scorer.score(url, 2) < plain
+
+
+def test_weights_can_be_overridden():
+    """Test that individual weights replace the defaults."""
+    scorer = LinkScorer({"depth": 0.0})
+
+    assert scorer.score("https://example.com/a", 5) == 0.0
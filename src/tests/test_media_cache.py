@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from scraper.media_cache import MediaCache, media_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MediaCache(cache_dir=str(tmp_path / "cache"), max_bytes=1000)
+
+
+def write_file(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_media_key():
+    """Test that keys combine extractor and id, and use the URL for generic media."""
+    assert media_key({"extractor_key": "Youtube", "id": "abc"}) == "Youtube:abc"
+    assert (
+        media_key({"_type": "playlist", "entries": [{"ie_key": "Youtube", "id": "x"}]})
+        == "Youtube:x"
+    )
+    assert (
+        media_key({"extractor_key": "Generic", "id": "audio", "url": "https://a/b.mp3"})
+        == "Generic:https://a/b.mp3"
+    )
+    assert media_key({"id": "abc"}) is None
+    assert media_key(None) is None
+
+
+def test_store_lookup_and_publish(cache, tmp_path):
+    """Test that a stored file is found again and published atomically."""
+    source = write_file(tmp_path / "downloads" / "a.mp3", b"audio")
+
+    assert cache.lookup("Youtube:abc") is None
+    cached_path = cache.store("Youtube:abc", source)
+    assert cache.lookup("Youtube:abc") == cached_path
+
+    published = cache.publish(cached_path, str(tmp_path / "downloads"))
+    assert (tmp_path / "downloads" / published).read_bytes() == b"audio"
+    assert published.endswith(".mp3")
+    # Every hit gets a file of its own.
+    assert cache.publish(cached_path, str(tmp_path / "downloads")) != published
+    assert not [name for name in os.listdir(tmp_path / "downloads") if ".tmp" in name]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_identical_content_is_stored_once(cache, tmp_path):
+    """Test that keys with identical content share one cached file."""
+    first = cache.store("A:1", write_file(tmp_path / "1.mp3", b"same"))
+    second = cache.store("B:2", write_file(tmp_path / "2.mp3", b"same"))
+
+    assert first == second
+    assert cache.stats()["files"] == 1
+
+
+def test_least_recently_used_files_are_evicted(cache, tmp_path):
+    """Test that the size budget evicts the least recently used files."""
+    cache.store("old", write_file(tmp_path / "old.mp3", b"o" * 400))
+    cache.store("used", write_file(tmp_path / "used.mp3", b"u" * 400))
+    cache.lookup("old")
+    cache.store("new", write_file(tmp_path / "new.mp3", b"n" * 400))
+
+    assert cache.lookup("used") is None
+    assert cache.lookup("old") is not None
+    assert cache.lookup("new") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 800
+
+
+def test_missing_cached_file_is_a_miss(cache, tmp_path):
+    """Test that an entry whose file vanished is dropped."""
+    cached_path = cache.store("A:1", write_file(tmp_path / "1.mp3", b"audio"))
+    os.remove(cached_path)
+
+    assert cache.lookup("A:1") is None
+    assert cache.stats()["files"] == 0
@@ -0,0 +1,123 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from scraper.link_extractor import PageLinks
+from scraper.media_prefilter import MediaPrefilter, matching_extractor, path_pattern
+
+
+@pytest.fixture
+def probe():
+    return MagicMock(return_value=None)
+
+
+@pytest.fixture
+def prefilter(probe):
+    return MediaPrefilter(probe, negative_threshold=2)
+
+
+def test_matching_extractor():
+    """Test that dedicated extractors match and the generic one is ignored."""
+    assert (
+        matching_extractor("https://www.youtube.com/watch?v=dQw4w9WgXcQ") == "Youtube"
+    )
+    assert matching_extractor("https://example.com/about") is None
+
+
+def test_extractor_match_skips_probe(prefilter, probe):
+    """Test that URLs handled by a dedicated extractor are accepted without probing."""
+    assert prefilter.is_candidate("https://soundcloud.com/artist/track")
+    probe.assert_not_called()
+    assert prefilter.stats()["hits_by_rule"] == {"extractor": 1}
+
+
+def test_dom_media_skips_probe(prefilter, probe):
+    """Test that pages with media elements or embeds are accepted without probing."""
+    assert prefilter.is_candidate(
+        "https://example.com/a", PageLinks(media={"https://example.com/a.mp3"})
+    )
+    assert prefilter.is_candidate(
+        "https://example.com/b",
+        PageLinks(iframes={"https://www.youtube.com/embed/dQw4w9WgXcQ"}),
+    )
+    probe.assert_not_called()
+    assert prefilter.stats()["hits"] == 2
+
+
+def test_sniffed_media_skips_probe(prefilter, probe):
+    """Test that media seen on the network counts as a hit without probing."""
+    assert prefilter.is_candidate(
+        "https://example.com/a",
+        PageLinks(sniffed_media=["https://cdn.example/live.m3u8"]),
+    )
+    probe.assert_not_called()
+    assert prefilter.stats()["hits_by_rule"] == {"network": 1}
+
+
+def test_sniffed_video_is_probed(prefilter, probe):
+    """Test that a page that only loaded video files is still probed."""
+    probe.return_value = None
+    assert not prefilter.is_candidate(
+        "https://example.com/a",
+        PageLinks(sniffed_video=["https://ads.example/preroll.mp4"]),
+    )
+    probe.assert_called_once_with("https://example.com/a")
+
+
+def test_probe_decides_remaining_pages(prefilter, probe):
+    """Test that yt-dlp metadata extraction decides pages without hints."""
+    probe.return_value = {"formats": [{"url": "https://cdn.example.com/a.m4a"}]}
+    assert prefilter.is_candidate("https://example.com/episode")
+
+    probe.return_value = None
+    assert not prefilter.is_candidate("https://example.com/about")
+    assert prefilter.stats()["misses_by_rule"] == {"probe": 1}
+
+
+def test_path_pattern():
+    """Test that pages differing only in ids or their last segment share a pattern."""
+    assert path_pattern("https://example.com/episode/12") == "example.com/episode/*"
+    assert path_pattern("https://example.com/show/3/ep-4") == "example.com/show/0/*"
+    assert path_pattern("https://example.com/about") == "example.com/about"
+    assert path_pattern("https://example.com/") == "example.com/"
+
+
+def test_negative_cache_per_path_pattern(prefilter, probe):
+    """Test that path patterns without media stop being probed, but only those."""
+    for page in range(4):
+        assert not prefilter.is_candidate(f"https://example.com/tag/{page}")
+
+    assert probe.call_count == 2
+    assert prefilter.stats()["misses_by_rule"] == {"probe": 2, "negative_cache": 2}
+    assert prefilter.stats()["negative_patterns"] == 1
+
+    probe.return_value = {"formats": [{"url": "https://cdn.example.com/a.m4a"}]}
+    assert prefilter.is_candidate("https://example.com/episode/1")
+    assert prefilter.is_candidate(
+        "https://example.com/tag/4", PageLinks(media={"https://example.com/4.mp3"})
+    )
+
+
+def test_navigation_misses_do_not_reject_the_host(probe):
+    """Test that misses on navigation pages do not skip media pages of the host."""
+    prefilter = MediaPrefilter(probe)
+    for path in ("/", "/about", "/contact"):
+        assert not prefilter.is_candidate(f"https://example.com{path}")
+
+    probe.return_value = {"formats": [{"url": "https://cdn.example.com/a.m4a"}]}
+    assert prefilter.is_candidate("https://example.com/episode/1")
+    assert probe.call_count == 4
+
+
+def test_negative_pattern_is_probed_again(prefilter, probe):
+    """Test that a skipped pattern is re-probed now and then and can recover."""
+    for page in range(2):
+        prefilter.is_candidate(f"https://example.com/tag/{page}")
+
+    probe.return_value = {"formats": [{"url": "https://cdn.example.com/a.m4a"}]}
+    results = [
+        prefilter.is_candidate(f"https://example.com/tag/{page}")
+        for page in range(2, 7)
+    ]
+    assert results == [False, False, False, False, True]
+    assert prefilter.is_candidate("https://example.com/tag/7")
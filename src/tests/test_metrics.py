@@ -0,0 +1,49 @@
+from scraper.metrics import MetricsRegistry, merge_snapshots, render_prometheus
+
+
+def test_histogram_buckets_and_sum():
+    """Test that observations land in the first bucket at or above them."""
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.observe("scraper_stage_seconds", 0.1, stage="visit")
+    registry.observe("scraper_stage_seconds", 0.5, stage="visit")
+    registry.observe("scraper_stage_seconds", 7, stage="visit")
+
+    key = ("scraper_stage_seconds", (("stage", "visit"),))
+    assert registry.snapshot()["histograms"][key] == [1, 1, 1, 7.6]
+
+
+def test_merge_sums_processes():
+    """Test that counters, gauges and histograms of workers are added up."""
+    first, second = MetricsRegistry(), MetricsRegistry()
+    for registry in (first, second):
+        registry.inc("scraper_pages_total", 2)
+        registry.set("scraper_active_jobs", 1)
+        registry.observe("scraper_stage_seconds", 0.2, stage="download")
+
+    merged = merge_snapshots([first.snapshot(), None, second.snapshot()])
+
+    assert merged["counters"][("scraper_pages_total", ())] == 4
+    assert merged["gauges"][("scraper_active_jobs", ())] == 2
+    histogram = merged["histograms"][
+        ("scraper_stage_seconds", (("stage", "download"),))
+    ]
+    assert sum(histogram[:-1]) == 2
+
+
+def test_render_prometheus_text_format():
+    """Test the exposition format of counters and cumulative histograms."""
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.inc("scraper_browser_recoveries_total", action="new_tab")
+    registry.observe("scraper_stage_seconds", 0.05, stage="visit")
+    registry.observe("scraper_stage_seconds", 0.5, stage="visit")
+
+    text = render_prometheus(registry.snapshot())
+
+    assert "# TYPE scraper_browser_recoveries_total counter\n" in text
+    assert 'scraper_browser_recoveries_total{action="new_tab"} 1\n' in text
+    assert "# TYPE scraper_stage_seconds histogram\n" in text
+    assert 'scraper_stage_seconds_bucket{stage="visit",le="0.1"} 1\n' in text
+    assert 'scraper_stage_seconds_bucket{stage="visit",le="1"} 2\n' in text
+    assert 'scraper_stage_seconds_bucket{stage="visit",le="+Inf"} 2\n' in text
+    assert 'scraper_stage_seconds_sum{stage="visit"} 0.55\n' in text
+    assert 'scraper_stage_seconds_count{stage="visit"} 2\n' in text
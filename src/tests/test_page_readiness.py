@@ -0,0 +1,100 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from scraper.page_readiness import READINESS_SCRIPT, PageReadiness
+
+
+@pytest.fixture
+def readiness():
+    return PageReadiness(max_wait=1.0, poll_interval=0.01)
+
+
+def test_wait_returns_when_page_is_ready(readiness):
+    """Test that wait returns as soon as the page reports readiness."""
+    execute_script = MagicMock(
+        side_effect=[{"ready": False}, {"ready": False}, {"ready": True}]
+    )
+
+    waited = readiness.wait(execute_script, "https://example.com/page")
+
+    assert waited < 1.0
+    assert execute_script.call_count == 3
+    execute_script.assert_called_with(READINESS_SCRIPT, 500, 500)
+    assert readiness.stats()["pages"] == 1
+    assert readiness.stats()["timeouts"] == 0
+
+
+def test_wait_gives_up_after_max_wait(readiness):
+    """Test that wait stops polling once the maximum wait is reached."""
+    execute_script = MagicMock(return_value={"ready": False})
+
+    waited = readiness.wait(execute_script, "https://example.com/page")
+
+    assert waited >= 1.0
+    assert readiness.stats()["timeouts"] == 1
+    assert "example.com" not in readiness.settle_times
+
+
+def test_wait_stops_when_page_cannot_be_measured(readiness):
+    """Test that wait does not block when the script returns no state."""
+    execute_script = MagicMock(return_value=None)
+
+    readiness.wait(execute_script, "https://example.com/page")
+
+    execute_script.assert_called_once()
+
+
+def test_settle_times_are_learned_per_domain(readiness):
+    """Test that settle times are tracked per domain and used as initial delay."""
+    readiness._record("example.com", 2.0, timed_out=False)
+    readiness._record("example.com", 1.0, timed_out=False)
+    assert readiness.settle_times["example.com"] == pytest.approx(1.7)
+
+    execute_script = MagicMock(side_effect=[{"ready": False}, {"ready": True}])
+    with patch("scraper.page_readiness.time.sleep") as mock_sleep:
+        readiness.wait(execute_script, "https://example.com/")
+    # The probe is installed before the initial delay.
+    mock_sleep.assert_called_once_with(pytest.approx(1.0, abs=0.01))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_learned_settle_time_does_not_grow():
+    """Test that the pre-sleep does not inflate the settle time learned for a domain."""
+    readiness = PageReadiness(max_wait=10.0, poll_interval=0.05)
+    clock = FakeClock()
+
+    def page():
+        # A page that is quiet from navigation on; the probe only measures
+        # quiet time from the poll that installed it.
+        installed = []
+
+        def execute_script(script, mutation_quiet, network_idle):
+            installed.append(clock.now)
+            quiet = (clock.now - installed[0]) * 1000
+            return {
+                "ready": quiet >= mutation_quiet and quiet >= network_idle,
+                "sinceMutation": quiet,
+                "sinceNetwork": quiet,
+            }
+
+        return execute_script
+
+    waits = []
+    with patch("scraper.page_readiness.time", clock):
+        for _ in range(15):
+            clock.now = 0.0
+            waits.append(readiness.wait(page(), "https://example.com/"))
+
+    assert readiness.settle_times["example.com"] == pytest.approx(0.5, abs=0.06)
+    assert max(waits[5:]) <= 0.55 + 1e-9
@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from scraper.prediction_cache import PredictionCache
+
+HEADERS = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture
+def fetch():
+    return MagicMock(return_value={})
+
+
+@pytest.fixture
+def cache(fetch):
+    return PredictionCache(fetch, batch_size=3, flush_interval=60)
+
+
+def test_prefetch_waits_for_full_batch(cache, fetch):
+    """Test that prefetched links are only sent once a batch is full."""
+    cache.prefetch(["a", "b"], HEADERS)
+    fetch.assert_not_called()
+
+    cache.prefetch(["c", "d"], HEADERS)
+    assert fetch.call_args_list == [
+        ((["a", "b", "c"], HEADERS),),
+        ((["d"], HEADERS),),
+    ]
+    assert cache.round_trips == 2
+
+
+def test_prefetch_flushes_after_interval(fetch):
+    """Test that pending links are sent once the flush interval has passed."""
+    cache = PredictionCache(fetch, batch_size=10, flush_interval=0)
+
+    cache.prefetch(["a"], HEADERS)
+
+    fetch.assert_called_once_with(["a"], HEADERS)
+
+
+def test_lookup_uses_cached_answer(cache, fetch):
+    """Test that links resolved by a batch need no further round trip."""
+    prediction = {"link": "b", "label": "fake"}
+    fetch.return_value = {"b": prediction}
+    cache.prefetch(["a", "b", "c"], HEADERS)
+
+    assert cache.lookup("b", HEADERS) == prediction
+    assert cache.lookup("a", HEADERS) is None
+    assert fetch.call_count == 1
+
+
+def test_lookup_miss_flushes_with_pending_links(cache, fetch):
+    """Test that an uncached lookup is sent together with pending links."""
+    cache.prefetch(["a", "b"], HEADERS)
+
+    cache.lookup("x", HEADERS)
+
+    fetch.assert_called_once_with(["x", "a", "b"], HEADERS)
+
+
+def test_failed_lookup_is_not_cached(cache, fetch):
+    """Test that links are looked up again after a failed request."""
+    fetch.return_value = None
+    assert cache.lookup("a", HEADERS) is None
+
+    fetch.return_value = {"a": {"link": "a"}}
+    assert cache.lookup("a", HEADERS) == {"link": "a"}
+    assert fetch.call_count == 2
@@ -0,0 +1,223 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+from api.scheduler import DuplicateJob, FairQueue, Job, JobScheduler, SchedulerFull
+from scraper.download_engine import ProcessDownloadEngine
+from scraper.metrics import metrics
+
+
+def start_download(path):
+    # Runs inside a download worker; stands in for yt-dlp running ffmpeg.
+    child = subprocess.Popen(["sleep", "60"])
+    with open(path, "w") as file:
+        file.write(f"{os.getpid()} {child.pid}")
+    time.sleep(60)
+
+
+def run_test_job(job):
+    # Runs inside the scheduler's worker processes.
+    if job.get("download"):
+        ProcessDownloadEngine(workers=1).run(start_download, (job["download"],), 60)
+    if job.get("child"):
+        child = subprocess.Popen(["sleep", "60"])
+        with open(job["child"], "w") as file:
+            file.write(str(child.pid))
+    time.sleep(job.get("sleep", 0))
+    if job.get("crash"):
+        os._exit(1)
+    if job.get("error"):
+        raise ValueError(job["error"])
+    metrics.inc("scraper_pages_total")
+    return {"pid": os.getpid(), "worker": {"lastJob": job["analysisId"]}}
+
+
+def collect_metrics():
+    return metrics.snapshot()
+
+
+def make_job(analysis_id, tenant="tenant", host="a.example"):
+    return Job(analysis_id, tenant, host, {"analysisId": analysis_id}, 60)
+
+
+def wait_for_status(scheduler, analysis_id, status, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if scheduler.status(analysis_id)["status"] == status:
+            return scheduler.status(analysis_id)
+        time.sleep(0.05)
+    raise AssertionError(f"{analysis_id} never reached {status}")
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(run_test_job, max_concurrency=1, timeout_grace=0)
+    scheduler.start()
+    yield scheduler
+    scheduler.close()
+
+
+def test_fair_queue_round_robins_tenants():
+    """Test that one tenant's backlog does not starve another tenant."""
+    queue = FairQueue()
+    for analysis_id in ("a1", "a2", "a3"):
+        queue.push(make_job(analysis_id, tenant="a"))
+    queue.push(make_job("b1", tenant="b"))
+
+    assert [job.analysis_id for job in queue.order()] == ["a1", "b1", "a2", "a3"]
+
+    popped = [queue.pop_eligible(lambda job: True).analysis_id for _ in range(4)]
+    assert popped == ["a1", "b1", "a2", "a3"]
+    assert len(queue) == 0
+
+
+def test_fair_queue_skips_ineligible_jobs():
+    """Test that jobs for a busy host wait while other jobs go first."""
+    queue = FairQueue()
+    queue.push(make_job("busy", host="busy.example"))
+    queue.push(make_job("free", host="free.example"))
+
+    job = queue.pop_eligible(lambda job: job.host != "busy.example")
+
+    assert job.analysis_id == "free"
+    assert queue.count("tenant") == 1
+
+
+def test_jobs_run_in_worker_processes(scheduler):
+    """Test that a submitted job completes in a separate process."""
+    scheduler.submit("first", "tenant", "a.example", {"analysisId": "first"}, 60)
+
+    status = wait_for_status(scheduler, "first", "completed")
+
+    assert status["result"]["pid"] != os.getpid()
+    assert scheduler.worker_reports()[0]["lastJob"] == "first"
+
+
+def test_queue_position_and_admission(scheduler):
+    """Test queue positions, ETA reporting and rejection of a full queue."""
+    scheduler.max_queued = 2
+    scheduler.submit("running", "a", "a.example", {"analysisId": "x", "sleep": 2}, 60)
+    wait_for_status(scheduler, "running", "in_progress")
+    scheduler.submit("second", "a", "b.example", {"analysisId": "second"}, 60)
+    queued = scheduler.submit("third", "b", "c.example", {"analysisId": "third"}, 60)
+
+    assert queued["status"] == "queued"
+    assert queued["queuePosition"] == 2
+    assert queued["etaSeconds"] > 0
+    with pytest.raises(SchedulerFull):
+        scheduler.submit("fourth", "c", "d.example", {"analysisId": "fourth"}, 60)
+    with pytest.raises(DuplicateJob):
+        scheduler.submit("second", "a", "b.example", {}, 60)
+
+    wait_for_status(scheduler, "third", "completed")
+
+
+def test_crashed_worker_fails_job_and_is_replaced(scheduler):
+    """Test that a dying worker fails only its own job."""
+    scheduler.submit("crash", "a", "a.example", {"analysisId": "x", "crash": 1}, 60)
+    scheduler.submit("next", "a", "a.example", {"analysisId": "next"}, 60)
+
+    assert wait_for_status(scheduler, "crash", "failed")["error"]
+    wait_for_status(scheduler, "next", "completed")
+    assert scheduler.stats()["workerRestarts"] == 1
+
+
+def test_job_errors_and_time_limit(scheduler):
+    """Test that job exceptions and overrunning jobs are reported as failed."""
+    scheduler.submit("error", "a", "a.example", {"analysisId": "x", "error": "x"}, 60)
+    scheduler.submit("slow", "a", "a.example", {"analysisId": "y", "sleep": 30}, 1)
+
+    assert "ValueError" in wait_for_status(scheduler, "error", "failed")["error"]
+    started = time.monotonic()
+    assert wait_for_status(scheduler, "slow", "failed")["error"]
+    assert time.monotonic() - started < 10
+
+
+def test_time_limit_calls_cleanup_with_the_payload(scheduler):
+    """Test that a job killed on its time limit is cleaned up after."""
+    cleaned = []
+    scheduler.on_timeout = cleaned.append
+    scheduler.submit("error", "a", "a.example", {"analysisId": "x", "error": "x"}, 60)
+    scheduler.submit("slow", "a", "a.example", {"analysisId": "y", "sleep": 30}, 1)
+
+    wait_for_status(scheduler, "slow", "failed")
+    assert cleaned == [{"analysisId": "y", "sleep": 30}]
+
+
+def is_running(pid):
+    # Orphans are reparented; a zombie waiting to be reaped is not running.
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_time_limit_kills_processes_started_by_the_job(scheduler, tmp_path):
+    """Test that a killed job leaves none of its child processes behind."""
+    child = tmp_path / "child.pid"
+    payload = {"analysisId": "y", "sleep": 30, "child": str(child)}
+    scheduler.submit("slow", "a", "a.example", payload, 1)
+
+    wait_for_status(scheduler, "slow", "failed")
+    pid = int(child.read_text())
+    deadline = time.monotonic() + 10
+    while is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not is_running(pid)
+
+
+def test_time_limit_kills_running_downloads(scheduler, tmp_path):
+    """Test that a killed job leaves no download worker or its children behind."""
+    pids = tmp_path / "download.pids"
+    payload = {"analysisId": "y", "download": str(pids)}
+    scheduler.submit("slow", "a", "a.example", payload, 3)
+
+    wait_for_status(scheduler, "slow", "failed")
+    deadline = time.monotonic() + 10
+    while not pids.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    download_pids = [int(pid) for pid in pids.read_text().split()]
+    while any(map(is_running, download_pids)) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(map(is_running, download_pids))
+
+
+def test_finished_records_are_evicted(scheduler):
+    """Test that finished jobs are dropped after their TTL."""
+    scheduler.record_ttl = 0
+    scheduler.submit("done", "a", "a.example", {"analysisId": "done"}, 60)
+
+    deadline = time.monotonic() + 30
+    while scheduler.status("done") is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert scheduler.status("done") is None
+
+
+def test_worker_metrics_are_merged_and_survive_restarts():
+    """Test that worker snapshots are merged and kept after a worker dies."""
+    scheduler = JobScheduler(
+        run_test_job, max_concurrency=2, metrics=collect_metrics, metrics_interval=0.1
+    )
+    scheduler.start()
+    try:
+        for analysis_id in ("a", "b"):
+            scheduler.submit(
+                analysis_id, analysis_id, analysis_id, {"analysisId": analysis_id}, 60
+            )
+        wait_for_status(scheduler, "a", "completed")
+        wait_for_status(scheduler, "b", "completed")
+        pages = ("scraper_pages_total", ())
+        assert scheduler.metrics_snapshot()["counters"][pages] == 2
+
+        scheduler.submit("crash", "c", "c", {"analysisId": "c", "crash": True}, 60)
+        wait_for_status(scheduler, "crash", "failed")
+        snapshot = scheduler.metrics_snapshot()
+        assert snapshot["counters"][pages] == 2
+        assert snapshot["counters"][("scraper_worker_restarts_total", ())] == 1
+        assert snapshot["gauges"][("scraper_queued_jobs", ())] == 0
+    finally:
+        scheduler.close()
@@ -0,0 +1,147 @@
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from scraper.browser_session import NavigationError
+from scraper.static_fetcher import StaticFetcher
+
+ARTICLE = """
+<html><head><title>Article</title>
+<meta property="og:audio" content="/media/og.mp3"></head>
+<body>
+  <nav><a href="/">Home</a> <a href="/podcasts">Podcasts</a></nav>
+  <p>{text}</p>
+  <a href="https://other.example.org/episode/1">Episode</a>
+  <a href="#comments">Comments</a>
+  <a name="anchor-without-href">Anchor</a>
+  <iframe src="https://www.youtube.com/embed/abc"></iframe>
+  <audio controls><source src="/media/episode.mp3" type="audio/mpeg"></audio>
+</body></html>
+""".format(text="Server rendered paragraph. " * 20)
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = StaticFetcher(min_links=3)
+    yield fetcher
+    fetcher.close()
+
+
+def mock_response(status_code=200, content_type="text/html", text="", url=None):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = status_code
+    response.headers = {"Content-Type": content_type}
+    response.text = text
+    response.url = url
+    return response
+
+
+def test_parse_server_rendered_page(fetcher):
+    """Test that anchors and media URLs are resolved like the browser's properties."""
+    page = fetcher.parse(
+        "https://example.com/news", "https://example.com/news/article", ARTICLE
+    )
+
+    assert page.escalation is None
+    assert page.page_links.links == {
+        "https://example.com/",
+        "https://example.com/podcasts",
+        "https://other.example.org/episode/1",
+        "https://example.com/news/article#comments",
+    }
+    assert page.page_links.iframes == {"https://www.youtube.com/embed/abc"}
+    assert page.page_links.media == {"https://example.com/media/episode.mp3"}
+    assert page.page_links.meta_media == {"https://example.com/media/og.mp3"}
+
+
+def test_parse_respects_base_href(fetcher):
+    """Test that relative links are resolved against the base element."""
+    html = '<html><head><base href="https://cdn.example.com/a/"></head><body><a href="b">x</a></body></html>'
+    page = fetcher.parse("https://example.com", "https://example.com", html)
+
+    assert page.page_links.links == {"https://cdn.example.com/a/b"}
+
+
+@pytest.mark.parametrize(
+    "html, rule",
+    [
+        (
+            '<html><body><div id="root"></div><script src="/app.js"></script></body></html>',
+            "spa_shell",
+        ),
+        (
+            "<html><body><noscript>Please enable JavaScript.</noscript>"
+            + ARTICLE
+            + "</body></html>",
+            "noscript",
+        ),
+        (
+            "<html><body><p>" + "text " * 100 + '</p><a href="/a">a</a></body></html>',
+            "few_links",
+        ),
+    ],
+)
+def test_parse_escalation_rules(fetcher, html, rule):
+    """Test that pages needing JavaScript are escalated with the deciding rule."""
+    page = fetcher.parse("https://example.com", "https://example.com", html)
+
+    assert page.escalation == rule
+
+
+def test_fetch_uses_final_url(fetcher):
+    """Test that fetch parses the body against the URL after redirects."""
+    fetcher.session.get = MagicMock(
+        return_value=mock_response(text=ARTICLE, url="https://example.com/moved/")
+    )
+
+    page = fetcher.fetch("https://example.com/old")
+
+    assert "https://example.com/moved/#comments" in page.page_links.links
+    assert page.escalation is None
+
+
+def test_fetch_non_html_is_not_escalated(fetcher):
+    """Test that media responses yield no links and no browser render."""
+    fetcher.session.get = MagicMock(
+        return_value=mock_response(content_type="audio/mpeg")
+    )
+
+    page = fetcher.fetch("https://example.com/file.mp3")
+
+    assert page.page_links.links == set()
+    assert page.escalation is None
+
+
+@pytest.mark.parametrize("status_code", [403, 404, 410])
+def test_fetch_client_errors_are_final(fetcher, status_code):
+    """Test that client errors are not fetched again in the browser."""
+    fetcher.session.get = MagicMock(return_value=mock_response(status_code=status_code))
+    with pytest.raises(NavigationError):
+        fetcher.fetch("https://example.com")
+
+
+def test_fetch_escalates_on_errors(fetcher):
+    """Test that retryable HTTP errors and failed requests fall back to the browser."""
+    for status_code in (408, 429, 500, 503):
+        fetcher.session.get = MagicMock(
+            return_value=mock_response(status_code=status_code)
+        )
+        page = fetcher.fetch("https://example.com")
+        assert page.escalation == f"http_{status_code}"
+
+    fetcher.session.get = MagicMock(side_effect=requests.ConnectionError("down"))
+    assert fetcher.fetch("https://example.com").escalation == "request_failed"
+
+
+def test_parse_collects_anchor_text(fetcher):
+    """Test that the text of the first anchor of each link is kept for scoring."""
+    page = fetcher.parse("https://example.com", "https://example.com", ARTICLE)
+
+    assert page.page_links.anchor_text == {
+        "https://example.com/": "Home",
+        "https://example.com/podcasts": "Podcasts",
+        "https://other.example.org/episode/1": "Episode",
+        "https://example.com#comments": "Comments",
+    }
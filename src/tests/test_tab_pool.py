@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from scraper.browser_session import NavigationError
+from scraper.load_profile import LoadProfile
+from scraper.page_readiness import READINESS_SCRIPT
+from scraper.tab_pool import NAVIGATE_SCRIPT, NAVIGATION_PENDING_SCRIPT, TabPool
+
+
+class FakeDriver:
+    """Chrome driver whose tabs each take load_time seconds to load a page."""
+
+    def __init__(self, load_time=0.3):
+        self.load_time = load_time
+        self.handles = ["tab-0"]
+        self.current_window_handle = "tab-0"
+        self.opened = 1
+        self.ready_at = {}
+        self.log = []
+        self.switch_to = SimpleNamespace(
+            window=self._switch, new_window=self._new_window
+        )
+
+    def _switch(self, handle):
+        assert handle in self.handles
+        self.current_window_handle = handle
+
+    def _new_window(self, kind):
+        handle = f"tab-{self.opened}"
+        self.opened += 1
+        self.handles.append(handle)
+        self.current_window_handle = handle
+
+    def execute_script(self, script, *args):
+        handle = self.current_window_handle
+        if script == NAVIGATE_SCRIPT:
+            self.ready_at[handle] = time.monotonic() + self.load_time
+        elif script == NAVIGATION_PENDING_SCRIPT:
+            return False
+        elif script == READINESS_SCRIPT:
+            return {"ready": time.monotonic() >= self.ready_at.get(handle, 0)}
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Target.closeTarget":
+            self.handles.remove(params["targetId"])
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def get_log(self, kind):
+        entries, self.log = self.log, []
+        return entries
+
+
+@pytest.fixture
+def driver():
+    return FakeDriver()
+
+
+@pytest.fixture
+def tab_pool(driver):
+    session = SimpleNamespace(
+        driver=driver,
+        load_profile=LoadProfile.full(),
+        is_healthy=lambda: True,
+        close=MagicMock(),
+    )
+    return TabPool(tabs=3, session_factory=lambda: session)
+
+
+def test_tabs_are_leased_exclusively(tab_pool, driver):
+    """Test that each lease gets its own tab and waits when none is free."""
+    tabs = [tab_pool.acquire() for _ in range(3)]
+
+    assert len({tab.handle for tab in tabs}) == 3
+    assert set(driver.handles) == {tab.handle for tab in tabs}
+    with pytest.raises(Exception):
+        tab_pool.acquire(timeout=0.1)
+
+    tab_pool.release(tabs[0])
+    assert tab_pool.acquire(timeout=0.1) is tabs[0]
+
+
+def test_acquire_gives_up_after_the_lease_timeout(tab_pool):
+    """Test that waiting for a tab that is never released is bounded."""
+    tab_pool.lease_timeout = 0.1
+    for _ in range(3):
+        tab_pool.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutException):
+        tab_pool.acquire()
+    assert time.monotonic() - started < 1
+
+
+def test_tabs_load_pages_in_parallel(tab_pool):
+    """Test that three tabs load three pages in about the time of one."""
+    tabs = [tab_pool.acquire() for _ in range(3)]
+    threads = [
+        threading.Thread(target=tab.visit, args=(f"https://example.com/{i}",))
+        for i, tab in enumerate(tabs)
+    ]
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started < 0.8
+    assert all(tab.pages_visited == 1 for tab in tabs)
+
+
+def test_network_events_are_split_by_tab(tab_pool, driver):
+    """Test that each tab only sees the network events of its own target."""
+    first, second = tab_pool.acquire(), tab_pool.acquire()
+
+    def loading_finished(target, size):
+        message = {
+            "webview": target,
+            "message": {
+                "method": "Network.loadingFinished",
+                "params": {"encodedDataLength": size},
+            },
+        }
+        return {"message": json.dumps(message)}
+
+    driver.execute_script = lambda script, *args: (
+        {"ready": True} if script == READINESS_SCRIPT else None
+    )
+    original_navigate = first._navigate
+
+    def navigate(url):
+        original_navigate(url)
+        driver.log = [
+            loading_finished(first.handle, 100),
+            loading_finished(second.handle, 7),
+        ]
+
+    first._navigate = navigate
+    first.visit("https://example.com")
+    second.visit("https://example.org")
+
+    assert first.last_page_bytes == 100
+    assert second.last_page_bytes == 0
+
+
+def test_failed_document_load_is_a_navigation_error(tab_pool, driver):
+    """Test that a DNS failure of the page is not taken for a loaded page."""
+    tab = tab_pool.acquire()
+    driver.execute_script = lambda script, *args: (
+        {"ready": True} if script == READINESS_SCRIPT else None
+    )
+    original_navigate = tab._navigate
+
+    def navigate(url):
+        original_navigate(url)
+        message = {
+            "webview": tab.handle,
+            "message": {
+                "method": "Network.loadingFailed",
+                "params": {
+                    "type": "Document",
+                    "errorText": "net::ERR_NAME_NOT_RESOLVED",
+                },
+            },
+        }
+        driver.log = [{"message": json.dumps(message)}]
+
+    tab._navigate = navigate
+
+    with pytest.raises(NavigationError, match="ERR_NAME_NOT_RESOLVED"):
+        tab.visit("https://missing.example")
+    assert tab.pages_visited == 1
+
+
+def test_failed_tab_is_replaced_without_restarting_browser(tab_pool, driver):
+    """Test that a tab failing every attempt is closed and a new one opened."""
+    tab = tab_pool.acquire()
+    old_handle = tab.handle
+    tab._navigate = MagicMock(side_effect=Exception("renderer hung"))
+
+    with pytest.raises(Exception):
+        tab.visit("https://example.com", retries=2)
+
+    assert tab.handle != old_handle
+    assert old_handle not in driver.handles
+    assert len(driver.handles) == 3
+    assert tab_pool.stats()["replaced"] == 1
+    assert tab_pool.stats()["restarts"] == 0
@@ -0,0 +1,49 @@
+import json
+import threading
+
+import pytest
+
+from scraper.tracing import NULL_TRACER, Tracer
+
+
+def test_spans_are_complete_events():
+    """Test that spans become X events with thread names and arguments."""
+    tracer = Tracer()
+    with tracer.span("lookup", url="https://example.com"):
+        pass
+    thread = threading.Thread(target=tracer.add, args=("wait", 1.0, 1.5), name="t")
+    thread.start()
+    thread.join()
+
+    events = tracer.events()
+    names = [event for event in events if event["ph"] == "M"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert {event["args"]["name"] for event in names} == {
+        threading.current_thread().name,
+        "t",
+    }
+    assert spans[0]["name"] == "lookup"
+    assert spans[0]["args"] == {"url": "https://example.com"}
+    assert spans[1]["dur"] == pytest.approx(500_000)
+
+
+def test_span_records_errors(tmp_path):
+    """Test that a failing span is kept with the error and written as JSON."""
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span("download", url="https://example.com"):
+            raise ValueError("no media")
+
+    path = tracer.write(str(tmp_path / "traces" / "job.json"))
+
+    with open(path) as file:
+        trace = json.load(file)
+    assert trace["traceEvents"][-1]["args"]["error"] == "ValueError: no media"
+
+
+def test_null_tracer_records_nothing():
+    """Test that the disabled tracer shares one no-op context manager."""
+    assert not NULL_TRACER.enabled
+    assert NULL_TRACER.span("a", url="x") is NULL_TRACER.span("b")
+    with NULL_TRACER.span("a"):
+        NULL_TRACER.add("b", 0, 1)
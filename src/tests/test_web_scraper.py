@@ -1,9 +1,17 @@
+import queue
+import threading
 import time
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 
-from scraper.web_scraper import WebScraper
+from scraper.browser_session import NavigationError
+from scraper.checkpoint import CheckpointStore
+from scraper.crawl_state import SqliteCrawlState
+from scraper.link_extractor import PageLinks
+from scraper.static_fetcher import StaticPage
+from scraper.tracing import Tracer
+from scraper.web_scraper import WebScraper, _Page
 
 
 @pytest.fixture
@@ -22,6 +30,15 @@ def mock_link_extractor():
         yield mock_extractor
 
 
+@pytest.fixture
+def mock_prefilter():
+    """Fixture to create a mock MediaPrefilter that accepts every page."""
+    with patch("scraper.web_scraper.MediaPrefilter") as MockMediaPrefilter:
+        mock_prefilter = MockMediaPrefilter.return_value
+        mock_prefilter.is_candidate.return_value = True
+        yield mock_prefilter
+
+
 @pytest.fixture
 def mock_audio_downloader():
     """Fixture to create a mock AudioDownloader."""
@@ -31,7 +48,34 @@ def mock_audio_downloader():
 
 
 @pytest.fixture
-def web_scraper(mock_browser_session, mock_link_extractor, mock_audio_downloader):
+def mock_static_fetcher():
+    """Fixture to create a mock StaticFetcher that escalates every page."""
+    with patch("scraper.web_scraper.StaticFetcher") as MockStaticFetcher:
+        mock_fetcher = MockStaticFetcher.return_value
+        mock_fetcher.fetch.return_value = StaticPage(
+            "https://example.com", escalation="few_links"
+        )
+        yield mock_fetcher
+
+
+@pytest.fixture
+def mock_connector():
+    """Fixture to create a mock ConnectorClient that knows no predictions."""
+    with patch("scraper.web_scraper.ConnectorClient") as MockConnectorClient:
+        mock_client = MockConnectorClient.from_env.return_value
+        mock_client.find_predictions.return_value = {}
+        yield mock_client
+
+
+@pytest.fixture
+def web_scraper(
+    mock_browser_session,
+    mock_link_extractor,
+    mock_audio_downloader,
+    mock_static_fetcher,
+    mock_connector,
+    mock_prefilter,
+):
     """Fixture to initialize WebScraper with mocked dependencies."""
     return WebScraper(
         starting_point="https://example.com",
@@ -55,7 +99,7 @@ def test_initialization(web_scraper):
     assert web_scraper.max_time_per_file == 5
     assert web_scraper.max_total_time == 10
     assert web_scraper.download_dir == "./downloads"
-    assert web_scraper.visit_queue == [("https://example.com", 0)]
+    assert list(web_scraper.frontier) == [("https://example.com", 0)]
     assert web_scraper.page_counter == 0
     assert web_scraper.file_counter == 0
 
@@ -71,9 +115,9 @@ def test_scrape_process(
     """Test the scraping process."""
     mock_browser_session.visit.return_value = None
     mock_browser_session.close.return_value = None
-    mock_link_extractor.extract_links.side_effect = [
-        {"https://example.com/page1", "https://example.com/page2"},
-        set(),
+    mock_link_extractor.extract_page.side_effect = [
+        PageLinks({"https://example.com/page1", "https://example.com/page2"}),
+        PageLinks(),
     ]
     mock_audio_downloader.download_audio.side_effect = ["file1.mp3", None]
 
@@ -84,11 +128,39 @@ def test_scrape_process(
     assert extracted_files == [{"filePath": "file1.mp3", "link": "https://example.com"}]
 
     assert mock_browser_session.visit.call_count == 2
-    assert mock_link_extractor.extract_links.call_count == 2
+    assert mock_link_extractor.extract_page.call_count == 2
     assert mock_audio_downloader.download_audio.call_count == 2
     mock_browser_session.close.assert_called_once()
 
 
+def test_scrape_records_trace(
+    mock_browser_session, mock_link_extractor, mock_audio_downloader, web_scraper
+):
+    """Test that a traced scrape records page stages and the whole job."""
+    tracer = Tracer()
+    web_scraper.tracer = tracer
+    mock_browser_session.last_wait_time = 0.0
+    mock_link_extractor.extract_page.return_value = PageLinks()
+    mock_audio_downloader.download_audio.return_value = None
+
+    web_scraper.scrape({}, "traced")
+
+    names = {event["name"] for event in tracer.events() if event["ph"] == "X"}
+    assert {"fetch", "navigate", "wait", "extract", "lookup", "media"} <= names
+    assert "scrape" in names
+
+
+def test_tab_lease_wait_is_bounded_by_the_time_left(web_scraper):
+    """Test that a scraper waits for a browser tab only for the time it has left."""
+    web_scraper.tab_pool = MagicMock()
+    web_scraper._started = time.monotonic() - 4
+
+    web_scraper.ensure_browser()
+
+    timeout = web_scraper.tab_pool.acquire.call_args.kwargs["timeout"]
+    assert 5 < timeout <= 6
+
+
 def test_check_conditions(web_scraper):
     """Test that check_conditions stops the scrape process based on different limits."""
     web_scraper.page_counter = 2
@@ -107,35 +179,496 @@ def test_check_conditions(web_scraper):
     assert web_scraper.check_conditions(current_depth=1)
 
 
-def test_process_page(
+def test_scrape_pages(
     web_scraper, mock_browser_session, mock_link_extractor, mock_audio_downloader
 ):
-    """Test that process_page visits a URL, extracts links, and downloads audio."""
+    """Test that scrape visits pages, extracts links, and downloads audio."""
     mock_browser_session.visit.return_value = None
-    mock_link_extractor.extract_links.return_value = set(
-        ["https://example.com/page1", "https://example.com/page2"]
-    )
-    mock_audio_downloader.download_audio.return_value = "file1.mp3"
+    mock_link_extractor.extract_page.side_effect = [
+        PageLinks({"https://example.com/page1"}),
+        PageLinks(),
+    ]
+    mock_audio_downloader.download_audio.side_effect = ["file1.mp3", None]
     web_scraper.max_pages = 3
 
-    headers = {"User-Agent": "test-agent"}
-    analysis_id = "test-analysis"
+    extracted_files = web_scraper.scrape(headers={}, analysis_id="test-analysis")
+
+    assert web_scraper.page_counter == 2
+    assert web_scraper.file_counter == 1
+    assert extracted_files == [{"filePath": "file1.mp3", "link": "https://example.com"}]
+    assert mock_browser_session.visit.call_args_list == [
+        (("https://example.com",),),
+        (("https://example.com/page1",),),
+    ]
+    mock_link_extractor.extract_page.assert_any_call("https://example.com")
+    assert [c.args for c in mock_audio_downloader.download_audio.call_args_list] == [
+        ("https://example.com",),
+        ("https://example.com/page1",),
+    ]
+
 
-    web_scraper.process_page(
-        "https://example.com", current_depth=0, headers=headers, analysis_id=analysis_id
+def test_enqueue_links(web_scraper):
+    """Test that only new links are enqueued, up to the page budget."""
+    web_scraper.max_pages = 3
+
+    new_links = web_scraper.enqueue_links(
+        ["https://example.com", "https://example.com/page1"], 1
+    )
+
+    assert new_links == ["https://example.com/page1"]
+    assert set(web_scraper.frontier) == {
+        ("https://example.com", 0),
+        ("https://example.com/page1", 1),
+    }
+
+    new_links = web_scraper.enqueue_links(
+        ["https://example.com/page2", "https://example.com/page3"], 1
     )
+
+    assert new_links == ["https://example.com/page2"]
+    assert web_scraper.link_counter == 3
+
+
+def test_priority_order_enqueues_media_links_first(web_scraper):
+    """Test that priority order ranks links and drops those beyond max_depth."""
+    scraper = WebScraper(
+        starting_point="https://example.com",
+        max_depth=2,
+        max_files=2,
+        max_pages=2,
+        model="sample_model",
+        max_time_per_file=5,
+        max_total_time=10,
+        crawl_order="priority",
+    )
+    scraper.frontier.pop()
+    page_links = PageLinks(anchor_text={"https://example.com/x": "Listen"})
+    links = [
+        "https://example.com/terms",
+        "https://example.com/x",
+        "https://example.com/episode/1",
+        "https://example.com/news",
+    ]
+
+    new_links = scraper.enqueue_links(links, 1, page_links)
+
+    assert new_links == links
+    assert [url for url, _ in scraper.frontier] == [
+        "https://example.com/episode/1",
+        "https://example.com/x",
+        "https://example.com/news",
+        "https://example.com/terms",
+    ]
+    assert scraper.enqueue_links(["https://example.com/deep"], 2) == []
+    assert len(scraper.frontier) == 4
+
+
+def test_scrape_static_fast_path(
+    web_scraper, mock_browser_session, mock_static_fetcher, mock_audio_downloader
+):
+    """Test that server-rendered pages are handled without starting a browser."""
+    mock_static_fetcher.fetch.return_value = StaticPage("https://example.com")
+    mock_audio_downloader.download_audio.return_value = None
+
+    web_scraper.scrape(headers={}, analysis_id="test")
+
+    assert web_scraper.page_counter == 1
+    mock_browser_session.visit.assert_not_called()
+    mock_browser_session.close.assert_not_called()
+
+
+def test_scrape_static_client_error_is_final(
+    web_scraper, mock_browser_session, mock_static_fetcher, mock_audio_downloader
+):
+    """Test that a page the static fetch found missing is not rendered again."""
+    mock_static_fetcher.fetch.side_effect = NavigationError("https://example.com")
+
+    assert web_scraper.scrape(headers={}, analysis_id="test") == []
+
+    mock_browser_session.visit.assert_not_called()
+    mock_audio_downloader.download_audio.assert_not_called()
+
+
+def test_scrape_known_prediction(web_scraper, mock_connector, mock_audio_downloader):
+    """Test that a page with a known prediction updates the analysis instead of downloading."""
+    prediction = {"link": "https://example.com", "label": "bonafide"}
+    mock_connector.find_predictions.return_value = {"https://example.com": prediction}
+    web_scraper.max_pages = 1
+
+    assert web_scraper.scrape(headers={}, analysis_id="test") == []
+
     assert web_scraper.file_counter == 1
-    assert web_scraper.extracted_files == [
-        {"filePath": "file1.mp3", "link": "https://example.com"}
+    mock_connector.update_predictions.assert_called_once_with("test", [prediction], {})
+    mock_audio_downloader.download_audio.assert_not_called()
+
+
+def test_scrape_closes_own_connector(web_scraper, mock_connector):
+    """Test that a scraper flushes and closes the connector it created."""
+    web_scraper.scrape(headers={}, analysis_id="test")
+
+    mock_connector.close.assert_called_once()
+
+
+def test_pipeline_respects_max_files(
+    mock_browser_session,
+    mock_link_extractor,
+    mock_audio_downloader,
+    mock_static_fetcher,
+    mock_connector,
+    mock_prefilter,
+):
+    """Test that parallel downloads never produce more than max_files files."""
+    mock_link_extractor.extract_page.side_effect = lambda url: (
+        PageLinks({f"https://example.com/{i}" for i in range(10)})
+        if url == "https://example.com"
+        else PageLinks()
+    )
+
+    def download(url, deadline=None):
+        time.sleep(0.01)
+        return f"{url.rsplit('/', 1)[-1]}.mp3"
+
+    mock_audio_downloader.download_audio.side_effect = download
+    scraper = WebScraper(
+        starting_point="https://example.com",
+        max_depth=3,
+        max_files=3,
+        max_pages=11,
+        model="sample_model",
+        max_time_per_file=5,
+        max_total_time=60,
+        render_workers=3,
+        download_workers=4,
+    )
+
+    extracted_files = scraper.scrape(headers={}, analysis_id="test")
+
+    assert len(extracted_files) == 3
+    assert scraper.file_counter == 3
+    assert extracted_files[0] == {
+        "filePath": "example.com.mp3",
+        "link": "https://example.com",
+    }
+    assert scraper.page_counter <= 11
+
+
+def test_failed_commit_stops_crawl_without_hanging(
+    mock_browser_session,
+    mock_link_extractor,
+    mock_audio_downloader,
+    mock_static_fetcher,
+    mock_connector,
+    mock_prefilter,
+):
+    """Test that an error queueing links stops the crawl instead of hanging it."""
+    mock_link_extractor.extract_page.side_effect = lambda url: PageLinks(
+        {f"{url}/{i}" for i in range(3)}
+    )
+    mock_audio_downloader.download_audio.return_value = None
+    scraper = WebScraper(
+        starting_point="https://example.com",
+        max_depth=3,
+        max_files=3,
+        max_pages=20,
+        model="sample_model",
+        max_time_per_file=5,
+        max_total_time=60,
+        render_workers=3,
+    )
+    pushed = scraper.frontier.push
+
+    def push(url, depth, score=0.0):
+        if url.count("/") > 3:
+            raise OSError("No space left on device")
+        return pushed(url, depth, score)
+
+    scraper.frontier.push = push
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(files=scraper.scrape({}, "test")), daemon=True
+    )
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert result["files"] == []
+    assert scraper.page_counter < 20
+
+
+def test_scrapers_share_crawl_state(
+    tmp_path,
+    mock_browser_session,
+    mock_link_extractor,
+    mock_audio_downloader,
+    mock_static_fetcher,
+    mock_connector,
+    mock_prefilter,
+):
+    """Test that scrapers sharing a crawl state split the pages and the files."""
+    mock_link_extractor.extract_page.side_effect = lambda url: (
+        PageLinks({f"https://example.com/{i}" for i in range(10)})
+        if url == "https://example.com"
+        else PageLinks()
+    )
+    mock_audio_downloader.download_audio.side_effect = (
+        lambda url, deadline=None: "file.mp3"
+    )
+    scrapers = [
+        WebScraper(
+            starting_point="https://example.com",
+            max_depth=3,
+            max_files=3,
+            max_pages=6,
+            model="sample_model",
+            max_time_per_file=5,
+            max_total_time=60,
+            crawl_state=SqliteCrawlState(
+                str(tmp_path / "crawl.sqlite"),
+                "test",
+                max_pages=6,
+                max_files=3,
+                owner=f"worker-{index}",
+                poll_interval=0.01,
+            ),
+        )
+        for index in range(2)
+    ]
+    results = {}
+    threads = [
+        threading.Thread(
+            target=lambda s=scraper: results.update({s: s.scrape({}, "test")})
+        )
+        for scraper in scrapers
     ]
-    assert set(web_scraper.visit_queue) == set(
-        [
-            ("https://example.com", 0),
-            ("https://example.com/page1", 1),
-            ("https://example.com/page2", 1),
-        ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    visited = [call.args[0] for call in mock_link_extractor.extract_page.call_args_list]
+    assert len(visited) == len(set(visited))
+    assert sum(scraper.page_counter for scraper in scrapers) <= 6
+    assert sum(len(files) for files in results.values()) == 3
+    assert scrapers[0].crawl_state.stats()["files"] == 3
+
+
+def test_resume_from_checkpoint(
+    tmp_path,
+    mock_browser_session,
+    mock_link_extractor,
+    mock_audio_downloader,
+    mock_static_fetcher,
+    mock_connector,
+    mock_prefilter,
+):
+    """Test that a scraper resumes the frontier, counters and files of a checkpoint."""
+    store = CheckpointStore(str(tmp_path), interval=1)
+
+    def create_scraper():
+        return WebScraper(
+            starting_point="https://example.com",
+            max_depth=3,
+            max_files=10,
+            max_pages=10,
+            model="sample_model",
+            max_time_per_file=5,
+            max_total_time=60,
+            checkpoint=store.checkpoint("test", {"analysisId": "test"}),
+        )
+
+    scraper = create_scraper()
+    lookup_queue = queue.Queue()
+    root = scraper._claim_page()
+    root.page_links = PageLinks(
+        {"https://example.com/a", "https://example.com/b", "https://example.com/c"}
     )
+    scraper._commit_page(root, lookup_queue)
+    file = {"filePath": "root.mp3", "link": "https://example.com"}
+    scraper._reserve_file(root)
+    scraper._release_file(True, root, file)
+    # Interrupted while the next page is still open.
+    first = scraper._claim_page()
+    scraper._commit_page(first, lookup_queue)
+
+    resumed = create_scraper()
+    assert resumed.page_counter == 1
+    assert resumed.file_counter == 1
+    assert resumed._downloaded_files == [(0, file)]
+    page = resumed._claim_page()
+    assert (page.url, page.sequence) == (first.url, 2)
+    assert resumed.page_counter == 2
+    assert resumed.enqueue_links(["https://example.com", first.url], 1) == []
+    assert len(resumed.frontier) == 2
+
 
-    mock_browser_session.visit.assert_called_once_with("https://example.com")
-    mock_link_extractor.extract_links.assert_called_once_with("https://example.com")
-    mock_audio_downloader.download_audio.assert_called_once_with("https://example.com")
+def test_checkpoint_keeps_undelivered_files(
+    tmp_path,
+    mock_browser_session,
+    mock_link_extractor,
+    mock_audio_downloader,
+    mock_static_fetcher,
+    mock_connector,
+    mock_prefilter,
+):
+    """Test that files the connector did not receive are resent on resume."""
+    store = CheckpointStore(str(tmp_path), interval=1)
+    file = {"filePath": "root.mp3", "link": "https://example.com"}
+
+    def create_scraper():
+        return WebScraper(
+            starting_point="https://example.com",
+            max_depth=3,
+            max_files=10,
+            max_pages=10,
+            model="sample_model",
+            max_time_per_file=5,
+            max_total_time=60,
+            stream_results=True,
+            checkpoint=store.checkpoint("test", {"analysisId": "test"}),
+        )
+
+    scraper = create_scraper()
+    scraper._report_to = ("test", {})
+    scraper._started = time.monotonic()
+    mock_connector.undelivered.return_value = [file]
+    scraper._write_checkpoint()
+    mock_connector.flush.assert_called()
+    mock_connector.undelivered.assert_called_once_with("test", {})
+
+    mock_connector.undelivered.return_value = []
+    mock_link_extractor.extract_page.return_value = PageLinks()
+    mock_audio_downloader.download_audio.return_value = None
+    create_scraper().scrape(headers={}, analysis_id="test")
+
+    mock_connector.stream_files.assert_called_once_with("test", [file], {})
+
+
+def test_scrape_skips_pages_rejected_by_prefilter(
+    web_scraper, mock_prefilter, mock_audio_downloader, mock_link_extractor
+):
+    """Test that pages without media candidates never reach the downloader."""
+    page_links = PageLinks()
+    mock_link_extractor.extract_page.return_value = page_links
+    mock_prefilter.is_candidate.return_value = False
+
+    assert web_scraper.scrape(headers={}, analysis_id="test") == []
+
+    mock_prefilter.is_candidate.assert_called_once_with(
+        "https://example.com", page_links
+    )
+    mock_audio_downloader.download_audio.assert_not_called()
+
+
+def test_scrape_skips_pages_that_failed_to_load(
+    web_scraper, mock_browser_session, mock_connector, mock_audio_downloader
+):
+    """Test that a page that failed to load is neither looked up nor downloaded."""
+    mock_browser_session.visit.side_effect = NavigationError("https://example.com")
+
+    assert web_scraper.scrape(headers={}, analysis_id="test") == []
+
+    assert web_scraper.page_counter == 1
+    mock_connector.find_predictions.assert_not_called()
+    mock_audio_downloader.download_audio.assert_not_called()
+
+
+def test_scrape_streams_downloaded_files(
+    web_scraper, mock_audio_downloader, mock_link_extractor, mock_connector
+):
+    """Test that each downloaded file is reported as soon as it is ready."""
+    mock_link_extractor.extract_page.return_value = PageLinks()
+    mock_audio_downloader.download_audio.return_value = "file.mp3"
+    headers = {"Authorization": "Bearer token"}
+
+    files = web_scraper.scrape(headers=headers, analysis_id="test")
+
+    assert files == [{"filePath": "file.mp3", "link": "https://example.com"}]
+    web_scraper.connector.stream_files.assert_called_once_with("test", files, headers)
+
+
+def test_file_is_reported_before_it_is_checkpointed(
+    web_scraper, mock_audio_downloader, mock_link_extractor
+):
+    """Test that a file is only recorded as found once it has been reported."""
+    mock_link_extractor.extract_page.return_value = PageLinks()
+    mock_audio_downloader.download_audio.return_value = "file.mp3"
+    recorded = []
+    web_scraper.connector.stream_files.side_effect = lambda *args: recorded.append(
+        list(web_scraper._downloaded_files)
+    )
+
+    web_scraper.scrape(headers={}, analysis_id="test")
+
+    assert recorded == [[]]
+    assert len(web_scraper._downloaded_files) == 1
+
+
+def test_scrape_downloads_sniffed_media_directly(
+    web_scraper, mock_browser_session, mock_audio_downloader, mock_link_extractor
+):
+    """Test that media seen on the network is downloaded without the page."""
+    mock_link_extractor.extract_page.return_value = PageLinks()
+    mock_browser_session.last_media_urls = ["https://cdn.example/live.m3u8"]
+    mock_audio_downloader.download_audio.return_value = "file.mp3"
+
+    files = web_scraper.scrape(headers={}, analysis_id="test")
+
+    assert files == [{"filePath": "file.mp3", "link": "https://example.com"}]
+    mock_audio_downloader.download_audio.assert_called_once_with(
+        "https://cdn.example/live.m3u8", deadline=ANY
+    )
+
+
+def test_sniffed_media_falls_back_to_page(web_scraper, mock_audio_downloader):
+    """Test that the page itself is tried when the sniffed URL fails."""
+    page = _Page(0, "https://example.com", 0)
+    page.page_links.sniffed_media = ["https://cdn.example/a.mp3"]
+    mock_audio_downloader.download_audio.side_effect = [None, "file.mp3"]
+
+    assert web_scraper.download_media(page) == "file.mp3"
+    assert mock_audio_downloader.download_audio.call_args.args == (
+        "https://example.com",
+    )
+
+
+def test_media_attempts_share_one_deadline(web_scraper, mock_audio_downloader):
+    """Test that a page's download attempts share one deadline and stop at it."""
+    web_scraper.max_time_per_file = 10
+    page = _Page(0, "https://example.com", 0)
+    page.page_links.sniffed_media = ["https://cdn.example/a.mp3"]
+    clock = iter([100.0, 100.0, 111.0])
+    mock_audio_downloader.download_audio.return_value = None
+
+    with patch("scraper.web_scraper.time.monotonic", lambda: next(clock)):
+        assert web_scraper.download_media(page) is None
+
+    mock_audio_downloader.download_audio.assert_called_once_with(
+        "https://cdn.example/a.mp3", deadline=110.0
+    )
+
+
+def test_sniffed_video_is_a_fallback_for_known_pages(
+    web_scraper, mock_audio_downloader
+):
+    """Test that yt-dlp handles a page it knows before any sniffed video file."""
+    page = _Page(0, "https://www.youtube.com/watch?v=dQw4w9WgXcQ", 0)
+    page.page_links.sniffed_video = ["https://ads.example/preroll.mp4"]
+    mock_audio_downloader.download_audio.side_effect = [None, "file.mp4"]
+
+    assert web_scraper.download_media(page) == "file.mp4"
+    assert [c.args for c in mock_audio_downloader.download_audio.call_args_list] == [
+        ("https://www.youtube.com/watch?v=dQw4w9WgXcQ",),
+        ("https://ads.example/preroll.mp4",),
+    ]
+
+
+def test_sniffed_video_goes_first_on_unknown_pages(web_scraper, mock_audio_downloader):
+    """Test that sniffed video goes first when no extractor knows the page."""
+    page = _Page(0, "https://example.com", 0)
+    page.page_links.sniffed_video = ["https://cdn.example/a.mp4"]
+    mock_audio_downloader.download_audio.return_value = "file.mp4"
+
+    assert web_scraper.download_media(page) == "file.mp4"
+    mock_audio_downloader.download_audio.assert_called_once_with(
+        "https://cdn.example/a.mp4", deadline=ANY
+    )